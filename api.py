@@ -0,0 +1,252 @@
+import argparse
+import gzip
+import json
+import re
+import sys
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import metrics
+from storage import ENTRY_COLUMNS, StorageError, add_storage_arguments, open_storage, split_tags
+
+# ----------------Read-only JSON API over the discoveries store-------------------------------------------
+# Serves the same data as the Streamlit apps without a script rerun per visitor:
+#   GET /discoveries?start_year=&end_year=&tags=Physics,Biology&match=any|all&q=&sort=asc|desc&limit=&after=
+#   GET /discoveries/{id}
+#   GET /stats
+# Every response carries a weak ETag built from the data version, so unchanged data costs a 304.
+# Encoded bodies (plain and gzip) are cached per (data version, URL); a write makes old entries unreachable.
+# gzip is sent to clients whose Accept-Encoding gives it (or "*") a non-zero q-value.
+# Usage: python api.py [--port 8502] [--backend postgres]
+# Load test: python bench.py api --size 10000 --clients 8 --requests 5000 --min-rps 2000
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 500
+RESPONSE_CACHE_SIZE = 1024
+GZIP_MIN_BYTES = 512
+CURSOR_RE = re.compile(r"^(-?\d+):(\d+)$")
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+class ResponseCache:
+    def __init__(self, size=RESPONSE_CACHE_SIZE):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+def etag_matches(etag, if_none_match):
+    # Weak comparison, as If-None-Match requires: whole tags from the comma-separated list, W/ ignored
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    opaque = etag.removeprefix("W/")
+    return "*" in tags or any(tag.removeprefix("W/") == opaque for tag in tags)
+
+def accepts_gzip(accept_encoding):
+    # Content codings with their q-values (default 1); gzip is acceptable when it, its x-gzip alias or, failing
+    # both, "*" has q > 0. "gzip;q=0" explicitly refuses it.
+    qualities = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = [part.strip() for part in item.split(";")]
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[coding.lower()] = quality
+    for coding in ("gzip", "x-gzip", "*"):
+        if coding in qualities:
+            return qualities[coding] > 0
+    return False
+
+def entry_json(row):
+    entry = dict(zip(ENTRY_COLUMNS, row))
+    entry["tags"] = split_tags(entry["tags"])
+    return entry
+
+def int_param(query, name, default=None, minimum=None, maximum=None):
+    values = query.get(name)
+    if not values or values[0] == "":
+        return default
+    try:
+        value = int(values[0])
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer")
+    if minimum is not None and value < minimum:
+        raise ApiError(400, f"{name} must be at least {minimum}")
+    return value if maximum is None else min(value, maximum)
+
+# ----------------Endpoints---------------------------------------------------------------------------------
+class TimelineApi:
+    def __init__(self, storage):
+        self.storage = storage
+        self.cache = ResponseCache()
+
+    def tag_ids(self, names):
+        known = {name.lower(): tag_id for tag_id, name in self.storage.fetch_tags()}
+        unknown = [name for name in names if name.lower() not in known]
+        if unknown:
+            raise ApiError(400, f"Unknown tags: {', '.join(unknown)}")
+        return tuple(known[name.lower()] for name in names)
+
+    def list_discoveries(self, query):
+        descending = query.get("sort", ["asc"])[0] == "desc"
+        limit = int_param(query, "limit", DEFAULT_LIMIT, minimum=1, maximum=MAX_LIMIT)
+        names = split_tags(query.get("tags", [""])[0])
+        after = None
+        if query.get("after"):
+            match = CURSOR_RE.match(query["after"][0])
+            if not match:
+                raise ApiError(400, "after must be a cursor returned as 'next'")
+            after = (int(match[1]), int(match[2]))
+        rows = self.storage.fetch_range(
+            int_param(query, "start_year"), int_param(query, "end_year"),
+            self.tag_ids(names) if names else None, query.get("match", ["any"])[0] == "all",
+            descending, after, limit + 1, columns=ENTRY_COLUMNS, text=query.get("q", [None])[0])
+        page = rows[:limit]
+        next_cursor = f"{page[-1][7]}:{page[-1][0]}" if len(rows) > limit else None
+        return {"items": [entry_json(row) for row in page], "next": next_cursor}
+
+    def get_discovery(self, entry_id):
+        rows = self.storage.fetch_by_ids([entry_id])
+        if not rows:
+            raise ApiError(404, f"No discovery with id {entry_id}")
+        return entry_json(rows[0])
+
+    def stats(self):
+        first_year, last_year = self.storage.year_span()
+        return {
+            "entries": self.storage.entry_count(),
+            "first_year": first_year,
+            "last_year": last_year,
+            "invalid_dates": len(self.storage.invalid_dates()),
+            "tags": dict(self.storage.tag_counts()),
+        }
+
+    def route(self, path, query):
+        if path == "/discoveries":
+            return self.list_discoveries(query)
+        match = re.match(r"^/discoveries/(\d+)$", path)
+        if match:
+            return self.get_discovery(int(match[1]))
+        if path == "/stats":
+            return self.stats()
+        raise ApiError(404, f"Unknown endpoint {path}")
+
+    def respond(self, target):
+        # (status, etag, plain body, gzip body or None) for a request target, served from the cache when possible
+        data_version = self.storage.data_version()
+        etag = f'W/"{data_version}"'
+        key = (data_version, target)
+        cached = self.cache.get(key)
+        if cached is not None:
+            metrics.count("timeline_api_cache_total", result="hit")
+            return cached
+        metrics.count("timeline_api_cache_total", result="miss")
+        url = urlsplit(target)
+        try:
+            status, payload = 200, self.route(url.path.rstrip("/") or "/", parse_qs(url.query))
+            payload["data_version"] = data_version
+        except ApiError as e:
+            status, payload = e.status, {"error": str(e)}
+        body = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        compressed = gzip.compress(body, compresslevel=5) if len(body) >= GZIP_MIN_BYTES else None
+        response = (status, etag, body, compressed)
+        if status == 200:
+            self.cache.put(key, response)
+        return response
+
+# ----------------HTTP plumbing-----------------------------------------------------------------------------
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY keep-alive clients stall on delayed ACKs
+    disable_nagle_algorithm = True
+    api = None
+    quiet = True
+
+    def do_GET(self):
+        with metrics.span("api_request"):
+            try:
+                status, etag, body, compressed = self.api.respond(self.path)
+            except StorageError as e:
+                status, etag, body, compressed = 503, None, json.dumps({"error": str(e)}).encode("utf-8"), None
+            if etag and status == 200 and etag_matches(etag, self.headers.get("If-None-Match")):
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if compressed is not None and accepts_gzip(self.headers.get("Accept-Encoding")):
+                body = compressed
+                encoding = "gzip"
+            else:
+                encoding = None
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Vary", "Accept-Encoding")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            if etag:
+                self.send_header("ETag", etag)
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            self.end_headers()
+            self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+def make_server(storage, host="127.0.0.1", port=8502, quiet=True):
+    handler = type("BoundApiHandler", (ApiHandler,), {"api": TimelineApi(storage), "quiet": quiet})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the discoveries store as a read-only JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.backend, args.db)
+    storage.migrate()
+    server = make_server(storage, args.host, args.port, quiet=not args.verbose)
+    print(f"Serving http://{args.host}:{args.port}/discoveries")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
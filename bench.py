@@ -0,0 +1,320 @@
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+import metrics
+from api import make_server
+from dates import parse_cached, parse_years
+from render import render_timeline
+from snapshot import EntrySnapshot
+from storage import ENTRY_COLUMNS, SQLiteStorage, add_storage_arguments, open_storage
+from synthetic import generate
+
+# ----------------Benchmark suite------------------------------------------------------------------------
+# Times the storage and rendering paths the app depends on against seeded synthetic data and writes a
+# JSON report; `compare` prints the ratio between two reports (e.g. from two commits); `api` load-tests
+# api.py over keep-alive HTTP connections and reports requests per second and latency quantiles.
+# Usage: python bench.py --sizes 1000 10000 100000 --output bench.json [--backend postgres --reset]
+#        python bench.py compare before.json after.json
+#        python bench.py api --size 10000 --clients 8 --requests 5000 --min-rps 2000
+DEFAULT_SIZES = (1000, 10000, 100000)
+BULK_BATCH_SIZE = 5000
+BENCH_TABLES = ("dedup_keys", "change_log", "deleted_entries", "link_status", "rollups", "discovery_tags", "tags",
+                "discoveries", "meta", "schema_migrations")
+
+def summarize(samples, ops=1):
+    median = statistics.median(samples)
+    return {
+        "median_s": median,
+        "min_s": min(samples),
+        "max_s": max(samples),
+        "runs": len(samples),
+        "ops_per_s": ops / median if median else None,
+    }
+
+def timed(work, repeat, ops=1):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        work()
+        samples.append(time.perf_counter() - started)
+    return summarize(samples, ops)
+
+def drop_bench_tables(cursor):
+    for table in BENCH_TABLES:
+        cursor.execute(f"DROP TABLE IF EXISTS {table} CASCADE")
+
+def bench_size(storage, size, seed=0, repeat=5, write_ops=100):
+    results = {}
+    storage.migrate()
+
+    # Rows are generated outside the timed section; only insert_many is measured
+    elapsed, batch = 0.0, []
+    for number, row in enumerate(generate(size, seed), start=1):
+        batch.append(row)
+        if len(batch) == BULK_BATCH_SIZE or number == size:
+            started = time.perf_counter()
+            storage.insert_many(batch)
+            elapsed += time.perf_counter() - started
+            batch = []
+    results["bulk_insert"] = summarize([elapsed], ops=size)
+
+    # Cold columnar snapshot load, as current_snapshot() does on the first run of a process
+    data_version = storage.data_version()
+    results["fetch_entries"] = timed(lambda: EntrySnapshot.empty().refresh(storage, data_version), repeat, ops=size)
+    snapshot = EntrySnapshot.empty().refresh(storage, data_version)
+
+    column = [row[1] for row in storage.iter_entries(("id", "discovery_date"))]
+    def parse_cold():
+        parse_cached.cache_clear()
+        parse_years(column)
+    results["parse_dates_cold"] = timed(parse_cold, repeat, ops=size)
+    results["parse_dates_warm"] = timed(lambda: parse_years(column), repeat, ops=size)
+
+    tag_ids = [tag_id for tag_id, _ in storage.fetch_tags()][:2]
+    results["tag_filter_any"] = timed(lambda: storage.fetch_range(tag_ids=tag_ids, columns=ENTRY_COLUMNS), repeat)
+    results["tag_filter_all"] = timed(lambda: storage.fetch_range(tag_ids=tag_ids, match_all=True,
+                                                                  columns=ENTRY_COLUMNS), repeat)
+    results["snapshot_filter"] = timed(lambda: snapshot.filter(tag_ids=tag_ids, match_all=True), repeat)
+    results["window_page"] = timed(lambda: storage.fetch_range(after=(1500, 0), limit=51, columns=ENTRY_COLUMNS),
+                                   repeat)
+    results["search"] = timed(lambda: storage.search("theory grav"), repeat)
+
+    rows = storage.fetch_range(columns=ENTRY_COLUMNS)
+    results["render_html"] = timed(lambda: render_timeline(rows), repeat, ops=len(rows))
+
+    new_rows = list(generate(write_ops, seed + 1))
+    results["single_insert"] = timed(lambda: [storage.insert_entry(*row) for row in new_rows], 1, ops=write_ops)
+
+    rng = random.Random(seed)
+    targets = [row for row in storage.fetch_by_ids(rng.sample(range(1, size + 1), min(write_ops, size)))]
+    results["update"] = timed(lambda: [storage.update_entry(*row[:7]) for row in targets], 1, ops=len(targets))
+    return results
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmarks(args):
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "sizes": {},
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in args.sizes:
+            if args.backend == "sqlite":
+                storage = SQLiteStorage(os.path.join(tmp_dir, f"bench_{size}.db"))
+            else:
+                storage = open_storage(args.backend, args.db)
+                storage.write(drop_bench_tables)
+            print(f"Benchmarking {size} rows on {args.backend}...", file=sys.stderr)
+            report["sizes"][str(size)] = bench_size(storage, size, args.seed, args.repeat)
+            if hasattr(storage, "close"):
+                storage.close()
+    return report
+
+# ----------------API load test------------------------------------------------------------------------------
+# Clients replay a seeded mix of list pages, single entries and /stats against a server on an ephemeral port
+# in this process: a fixed set of --urls targets, as many visitors asking for the same pages would, half of
+# them accepting gzip and some revalidating with the ETag they were last sent.
+API_URLS = 200
+API_REVALIDATE_SHARE = 0.25
+
+def api_targets(storage, count, rng):
+    tags = [name for _, name in storage.fetch_tags()]
+    first_year, last_year = storage.year_span()
+    entry_ids = [row[0] for row in storage.fetch_range()]
+    targets = ["/stats"]
+    while len(targets) < count:
+        kind = rng.choice(("page", "tags", "years", "entry"))
+        if kind == "entry":
+            targets.append(f"/discoveries/{rng.choice(entry_ids)}")
+            continue
+        query = {"limit": rng.choice((10, 50, 100)), "sort": rng.choice(("asc", "desc"))}
+        if kind == "tags":
+            query.update(tags=",".join(rng.sample(tags, rng.randint(1, 2))), match=rng.choice(("any", "all")))
+        elif kind == "years":
+            query["start_year"] = rng.randint(first_year, last_year)
+            query["end_year"] = query["start_year"] + rng.choice((10, 100, 1000))
+        targets.append("/discoveries?" + urlencode(query))
+    return targets
+
+def api_client(port, targets, requests, rng, start_barrier, samples, statuses):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    etags = {}
+    start_barrier.wait()
+    for _ in range(requests):
+        target = rng.choice(targets)
+        headers = {"Accept-Encoding": "gzip"} if rng.random() < 0.5 else {}
+        if target in etags and rng.random() < API_REVALIDATE_SHARE:
+            headers["If-None-Match"] = etags[target]
+        started = time.perf_counter()
+        connection.request("GET", target, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        samples.append(time.perf_counter() - started)
+        statuses[response.status] += 1
+        etags[target] = response.getheader("ETag")
+    connection.close()
+
+def bench_api(args):
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "size": args.size,
+            "clients": args.clients,
+            "requests": args.requests,
+            "urls": args.urls,
+            "seed": args.seed,
+        },
+    }
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.backend == "sqlite":
+            storage = SQLiteStorage(os.path.join(tmp_dir, "bench_api.db"))
+        else:
+            storage = open_storage(args.backend, args.db)
+            storage.write(drop_bench_tables)
+        print(f"Seeding {args.size} rows on {args.backend}...", file=sys.stderr)
+        storage.migrate()
+        rows = list(generate(args.size, args.seed))
+        for start in range(0, len(rows), BULK_BATCH_SIZE):
+            storage.insert_many(rows[start:start + BULK_BATCH_SIZE])
+        rng = random.Random(args.seed)
+        targets = api_targets(storage, args.urls, rng)
+
+        server = make_server(storage, port=0)
+        threading.Thread(target=server.serve_forever, name="api-server", daemon=True).start()
+        port = server.server_address[1]
+        try:
+            # Every target once first, so the run measures the steady state rather than first requests
+            warm = http.client.HTTPConnection("127.0.0.1", port)
+            for target in targets:
+                for headers in ({}, {"Accept-Encoding": "gzip"}):
+                    warm.request("GET", target, headers=headers)
+                    warm.getresponse().read()
+            warm.close()
+            print(f"Running {args.clients} clients x {args.requests} requests...", file=sys.stderr)
+            samples, statuses = [[] for _ in range(args.clients)], [Counter() for _ in range(args.clients)]
+            barrier = threading.Barrier(args.clients + 1)
+            clients = [threading.Thread(target=api_client, args=(port, targets, args.requests,
+                                                                  random.Random(rng.random()), barrier,
+                                                                  samples[number], statuses[number]))
+                       for number in range(args.clients)]
+            for client in clients:
+                client.start()
+            barrier.wait()
+            started = time.perf_counter()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+            if hasattr(storage, "close"):
+                storage.close()
+
+    latencies = [sample for client_samples in samples for sample in client_samples]
+    report["results"] = {
+        "elapsed_s": elapsed,
+        "requests_per_s": len(latencies) / elapsed if elapsed else None,
+        "statuses": {str(status): count for status, count in sorted(sum(statuses, Counter()).items())},
+        "median_ms": metrics.quantile(latencies, 0.5) * 1000,
+        "p95_ms": metrics.quantile(latencies, 0.95) * 1000,
+        "p99_ms": metrics.quantile(latencies, 0.99) * 1000,
+    }
+    return report
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before, after = json.load(before_file), json.load(after_file)
+    print(f"{'size':>8}  {'benchmark':<18} {'before':>10} {'after':>10} {'ratio':>7}")
+    for size, results in after["sizes"].items():
+        for name, result in results.items():
+            old = before["sizes"].get(size, {}).get(name)
+            ratio = f"{result['median_s'] / old['median_s']:.2f}x" if old and old["median_s"] else "-"
+            old_text = f"{old['median_s'] * 1000:.1f}ms" if old else "-"
+            print(f"{size:>8}  {name:<18} {old_text:>10} {result['median_s'] * 1000:>8.1f}ms {ratio:>7}")
+
+def write_report(report, output):
+    if output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(output, "w") as out:
+            json.dump(report, out, indent=2)
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["compare"]:
+        parser = argparse.ArgumentParser(description="Compare two benchmark reports (ratio < 1 means faster).")
+        parser.add_argument("before")
+        parser.add_argument("after")
+        args = parser.parse_args(argv[1:])
+        compare(args.before, args.after)
+        return 0
+    if argv[:1] == ["api"]:
+        parser = argparse.ArgumentParser(description="Load-test api.py with concurrent keep-alive clients.")
+        parser.add_argument("--size", type=int, default=10000, help="Seeded entries")
+        parser.add_argument("--clients", type=int, default=8, help="Concurrent keep-alive connections")
+        parser.add_argument("--requests", type=int, default=5000, help="Requests per client")
+        parser.add_argument("--urls", type=int, default=API_URLS, help="Distinct request targets in the mix")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="-", help="JSON report path; '-' prints to stdout")
+        parser.add_argument("--min-rps", type=float, help="Exit with status 1 below this many requests per second")
+        parser.add_argument("--reset", action="store_true",
+                            help="Required for PostgreSQL: drops and reseeds the timeline tables in the database")
+        add_storage_arguments(parser)
+        args = parser.parse_args(argv[1:])
+        if args.backend != "sqlite" and not args.reset:
+            parser.error("load-testing PostgreSQL reseeds its timeline tables; pass --reset against a scratch database")
+        report = bench_api(args)
+        write_report(report, args.output)
+        results = report["results"]
+        print(f"{results['requests_per_s']:.0f} requests/s, median {results['median_ms']:.2f} ms, "
+              f"p99 {results['p99_ms']:.2f} ms, statuses {results['statuses']}", file=sys.stderr)
+        return 1 if args.min_rps is not None and results["requests_per_s"] < args.min_rps else 0
+
+    parser = argparse.ArgumentParser(description="Benchmark storage and rendering against synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", default="-", help="JSON report path; '-' prints to stdout")
+    parser.add_argument("--reset", action="store_true",
+                        help="Required for PostgreSQL: drops and recreates the timeline tables in --backend's database")
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.backend != "sqlite" and not args.reset:
+        parser.error("benchmarking PostgreSQL drops its timeline tables; pass --reset against a scratch database")
+
+    write_report(run_benchmarks(args), args.output)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,154 @@
+import argparse
+import csv
+import io
+import json
+import sys
+import time
+
+from dates import parse_year, year_values
+from dedup import batch_duplicates
+from storage import ENTRY_FIELDS, add_storage_arguments, open_storage, split_tags
+
+# ----------------Streaming bulk import for CSV / JSONL----------------------------------------------------
+# Records are read one at a time, validated with the same rules as the sidebar form and inserted
+# in batches through Storage.insert_many (one executemany and one transaction per batch). Batches are
+# staged and published with one data version bump at the end, so caches are invalidated once per import.
+# Likely duplicates, of existing entries or of earlier rows in the file, are rejected with the entry or
+# line they match unless allow_duplicates is set (see dedup.py).
+# Usage: python bulk_import.py discoveries.csv --rejects rejects.csv [--backend postgres]
+BATCH_SIZE = 5000
+REJECT_FIELDS = ["line", "error", "record"]
+
+def detect_format(filename):
+    return "jsonl" if filename.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+
+def iter_records(stream, fmt):
+    if fmt == "csv":
+        for line, record in enumerate(csv.DictReader(stream), start=2):
+            yield line, record
+    else:
+        for line, text in enumerate(stream, start=1):
+            if text.strip():
+                try:
+                    yield line, json.loads(text)
+                except json.JSONDecodeError as e:
+                    yield line, ValueError(f"Invalid JSON: {e}")
+
+def validate_record(record, vocabulary):
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise ValueError("Record must be an object")
+    values = {}
+    for field in ENTRY_FIELDS:
+        value = record.get(field)
+        if field == "tags" and isinstance(value, list):
+            value = ", ".join(str(tag) for tag in value)
+        value = "" if value is None else str(value).strip()
+        if not value:
+            raise ValueError(f"Missing {field}")
+        values[field] = value
+    parse_year(values["discovery_date"])
+    tags = split_tags(values["tags"])
+    unknown = [tag for tag in tags if tag not in vocabulary]
+    if unknown:
+        raise ValueError(f"Unknown tags: {', '.join(unknown)}")
+    values["tags"] = ", ".join(tags)
+    return tuple(values[field] for field in ENTRY_FIELDS)
+
+def duplicate_reasons(storage, batch):
+    # batch: (line, record, row) -> {index: reason} for the rows that look like duplicates
+    rows = [row for _, _, row in batch]
+    reasons = {index: f"Likely duplicate of entry #{matches[0][0]} ({matches[0][1]:.2f})"
+               for index, matches in storage.find_duplicates(rows).items()}
+    entries = [(row[2], row[0], year) for row, year in zip(rows, year_values([row[1] for row in rows]))]
+    for index, matches in batch_duplicates(entries).items():
+        reasons.setdefault(index, f"Likely duplicate of line {batch[matches[0][0]][0]} ({matches[0][1]:.2f})")
+    return reasons
+
+def import_records(storage, records, reject_stream=None, batch_size=BATCH_SIZE, allow_duplicates=False):
+    vocabulary = {name for _, name in storage.fetch_tags()}
+    reject_writer = csv.writer(reject_stream) if reject_stream is not None else None
+    if reject_writer:
+        reject_writer.writerow(REJECT_FIELDS)
+    stats = {"accepted": 0, "rejected": 0, "duplicates": 0, "batches": 0}
+
+    def reject(line, record, reason):
+        stats["rejected"] += 1
+        if reject_writer:
+            raw = record if not isinstance(record, Exception) else None
+            reject_writer.writerow([line, reason, json.dumps(raw, ensure_ascii=False)])
+
+    def flush(batch):
+        reasons = {} if allow_duplicates else duplicate_reasons(storage, batch)
+        for index, reason in sorted(reasons.items()):
+            line, record, _ = batch[index]
+            stats["duplicates"] += 1
+            reject(line, record, reason)
+        rows = [row for index, (_, _, row) in enumerate(batch) if index not in reasons]
+        if rows:
+            storage.insert_many(rows, publish=False)
+            stats["accepted"] += len(rows)
+            stats["batches"] += 1
+
+    batch = []
+    try:
+        for line, record in records:
+            try:
+                batch.append((line, record, validate_record(record, vocabulary)))
+            except ValueError as e:
+                reject(line, record, str(e))
+                continue
+            if len(batch) >= batch_size:
+                flush(batch)
+                batch = []
+        if batch:
+            flush(batch)
+    finally:
+        # Batches already committed are published even when a later one fails
+        if stats["batches"]:
+            storage.publish_changes()
+    return stats
+
+def import_stream(storage, stream, fmt, reject_stream=None, batch_size=BATCH_SIZE, allow_duplicates=False):
+    return import_records(storage, iter_records(stream, fmt), reject_stream, batch_size, allow_duplicates)
+
+def import_upload(storage, uploaded_file, batch_size=BATCH_SIZE, allow_duplicates=False):
+    # Streamlit's UploadedFile is a binary file object; decode it lazily line by line
+    stream = io.TextIOWrapper(uploaded_file, encoding="utf-8-sig", newline="")
+    rejects = io.StringIO()
+    stats = import_stream(storage, stream, detect_format(uploaded_file.name), rejects, batch_size, allow_duplicates)
+    return stats, rejects.getvalue()
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a CSV or JSONL file of discoveries into the database.")
+    parser.add_argument("path", help="CSV (with a header row) or JSONL file; '-' reads stdin")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Defaults to the file extension")
+    parser.add_argument("--rejects", help="Write rejected rows with the reason to this CSV file")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--allow-duplicates", action="store_true",
+                        help="Import rows that look like duplicates instead of rejecting them")
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.backend, args.db)
+    storage.migrate()
+    fmt = args.format or detect_format(args.path)
+    started = time.perf_counter()
+    source = sys.stdin if args.path == "-" else open(args.path, encoding="utf-8-sig", newline="")
+    reject_stream = open(args.rejects, "w", encoding="utf-8", newline="") if args.rejects else None
+    try:
+        stats = import_stream(storage, source, fmt, reject_stream, args.batch_size, args.allow_duplicates)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if reject_stream:
+            reject_stream.close()
+    elapsed = time.perf_counter() - started
+    print(f"Imported {stats['accepted']} rows in {stats['batches']} batches, rejected {stats['rejected']} "
+          f"({stats['duplicates']} likely duplicates, {elapsed:.2f}s)")
+    return 0 if stats["accepted"] or not stats["rejected"] else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+import metrics
+
+# ----------------Date parsing (BC / AD and historical formats)----------------------------------------------
+# Shared by both storage backends (to fill year_value) and the Streamlit UI (to report bad input).
+# Every accepted format maps to a sortable year (negative for BC, the earliest year of a period or range)
+# plus the precision it was written with. Results are memoized by the raw string.
+ParsedDate = namedtuple("ParsedDate", ["year", "precision"])
+
+PRECISIONS = ("day", "month", "year", "circa", "decade", "century", "millennium", "range",
+              "thousand_years", "million_years", "billion_years")
+MEMO_SIZE = 65536
+# Bump whenever the parser starts accepting strings it used to reject: storage re-parses its undated
+# entries once per version (2: abbreviated range ends such as "1914-18")
+PARSER_VERSION = 2
+# "ka" / "Ma" / "Ga" count back from the radiocarbon present, as in the literature
+PRESENT_YEAR = 1950
+
+MONTHS = {name: number for number, names in enumerate([
+    ("jan", "january"), ("feb", "february"), ("mar", "march"), ("apr", "april"), ("may",), ("jun", "june"),
+    ("jul", "july"), ("aug", "august"), ("sep", "sept", "september"), ("oct", "october"),
+    ("nov", "november"), ("dec", "december")], start=1) for name in names}
+
+DEEP_TIME_UNITS = {
+    "ka": (1_000, "thousand_years"), "kya": (1_000, "thousand_years"), "ky": (1_000, "thousand_years"),
+    "ma": (1_000_000, "million_years"), "mya": (1_000_000, "million_years"),
+    "ga": (1_000_000_000, "billion_years"), "gya": (1_000_000_000, "billion_years"),
+}
+
+_ERA = r"(?:\s*(?P<{name}>bce|bc|ce|ad))?"
+_MONTH = r"(?P<month>" + "|".join(sorted(MONTHS, key=len, reverse=True)) + r")\.?"
+
+CIRCA_RE = re.compile(r"^(?:circa|approximately|approx|about|ca|c)\.?\s*(?=\d)|^~\s*")
+PREFIX_ERA_RE = re.compile(r"^(?P<era>ad|ce)\s+(?P<rest>\d.*)$")
+YEAR_RE = re.compile(r"^(?P<year>\d{1,6})" + _ERA.format(name="era") + r"$")
+DECADE_RE = re.compile(r"^(?P<decade>\d{0,4}0)'?s" + _ERA.format(name="era") + r"$")
+PERIOD_RE = re.compile(r"^(?P<ordinal>\d{1,2})(?:st|nd|rd|th)\s+(?P<unit>century|cent\.?|c\.|millennium)"
+                       + _ERA.format(name="era") + r"$")
+RANGE_RE = re.compile(r"^(?P<start>\d{1,6})" + _ERA.format(name="start_era")
+                      + r"\s*(?:-|to|until)\s*(?P<end>\d{1,6})" + _ERA.format(name="end_era") + r"$")
+DEEP_TIME_RE = re.compile(r"^(?P<amount>\d+(?:\.\d+)?)\s*(?P<unit>" + "|".join(DEEP_TIME_UNITS)
+                          + r")(?:\s+(?:ago|bp))?$")
+ISO_DATE_RE = re.compile(r"^(?P<year>\d{1,4})-(?P<month>\d{1,2})(?:-(?P<day>\d{1,2}))?$")
+DAY_MONTH_YEAR_RE = re.compile(r"^(?:(?P<day>\d{1,2})\s+)?" + _MONTH + r",?\s+(?P<year>\d{1,4})"
+                               + _ERA.format(name="era") + r"$")
+MONTH_DAY_YEAR_RE = re.compile(r"^" + _MONTH + r"\s+(?P<day>\d{1,2})(?:st|nd|rd|th)?,?\s+(?P<year>\d{1,4})"
+                               + _ERA.format(name="era") + r"$")
+
+def normalize(date_str):
+    text = (date_str or "").strip().lower()
+    text = re.sub(r"[‒-―−]", "-", text)
+    # "B.C.E." -> "bce", "A.D." -> "ad"
+    text = re.sub(r"\b(b|a|c)\.\s?(c|d|e)\.(?:\s?(e)\.)?", lambda m: "".join(g for g in m.groups() if g), text)
+    return re.sub(r"\s+", " ", text)
+
+def signed_year(year, era):
+    if era in ("bc", "bce"):
+        if year == 0:
+            raise ValueError("There is no year 0 BC")
+        return -year
+    return year
+
+def abbreviated_end(start, end):
+    # "1914-18" -> 1918: a shorter end takes the start's leading digits. It never rolls over into the next
+    # century, so "1998-13" ends in 1913, before its start, and is rejected rather than read as 1998-2013.
+    if len(end) >= len(start):
+        return int(end)
+    scale = 10 ** len(end)
+    return int(start) - int(start) % scale + int(end)
+
+def check_month_day(month, day):
+    if not 1 <= month <= 12 or (day is not None and not 1 <= day <= 31):
+        raise ValueError("Month or day out of range")
+
+def parse_exact(text):
+    match = ISO_DATE_RE.match(text)
+    # With a day it is a date whatever the month ("1905-13-01" has month 13). Without one, 01-12 is a month
+    # ("1998-02" is February 1998) and anything else is left to the range rule ("1914-18" is 1914-1918).
+    if match and (match["day"] or 1 <= int(match["month"]) <= 12):
+        day = int(match["day"]) if match["day"] else None
+        check_month_day(int(match["month"]), day)
+        return ParsedDate(int(match["year"]), "day" if day else "month")
+    for pattern in (DAY_MONTH_YEAR_RE, MONTH_DAY_YEAR_RE):
+        match = pattern.match(text)
+        if match:
+            day = int(match["day"]) if match["day"] else None
+            check_month_day(MONTHS[match["month"]], day)
+            return ParsedDate(signed_year(int(match["year"]), match["era"]), "day" if day else "month")
+
+    match = YEAR_RE.match(text)
+    if match:
+        return ParsedDate(signed_year(int(match["year"]), match["era"]), "year")
+    match = DECADE_RE.match(text)
+    if match:
+        decade = int(match["decade"])
+        # BC decades run backwards: the 340s BC are 349-340 BC
+        return ParsedDate(-(decade + 9) if match["era"] in ("bc", "bce") else decade, "decade")
+    match = PERIOD_RE.match(text)
+    if match:
+        ordinal = int(match["ordinal"])
+        if ordinal == 0:
+            raise ValueError("Ordinal must be at least 1st")
+        span, precision = (1000, "millennium") if match["unit"] == "millennium" else (100, "century")
+        # Same boundaries as the century jump in the windowed view: the 5th century is 400-499
+        return ParsedDate(-ordinal * span if match["era"] in ("bc", "bce") else (ordinal - 1) * span, precision)
+    match = RANGE_RE.match(text)
+    if match:
+        # "300-200 BC": a trailing era applies to both ends unless the start has its own
+        start_era = match["start_era"] or match["end_era"]
+        start = signed_year(int(match["start"]), start_era)
+        ad_range = start >= 0 and match["end_era"] not in ("bc", "bce")
+        end = signed_year(abbreviated_end(match["start"], match["end"]) if ad_range else int(match["end"]),
+                          match["end_era"])
+        if end < start:
+            raise ValueError("Range ends before it starts")
+        return ParsedDate(start, "range")
+    match = DEEP_TIME_RE.match(text)
+    if match:
+        scale, precision = DEEP_TIME_UNITS[match["unit"]]
+        return ParsedDate(PRESENT_YEAR - round(float(match["amount"]) * scale), precision)
+    return None
+
+@lru_cache(maxsize=MEMO_SIZE)
+def parse_cached(date_str):
+    # Returns a ParsedDate or the error message, so invalid strings are memoized too
+    text = normalize(date_str)
+    if not text:
+        return "Date is empty"
+    match = PREFIX_ERA_RE.match(text)
+    if match:
+        text = f"{match['rest']} {match['era']}"
+    circa = CIRCA_RE.match(text)
+    if circa:
+        text = text[circa.end():]
+    try:
+        parsed = parse_exact(text)
+    except ValueError as e:
+        return f"Invalid date {date_str!r}: {e}"
+    if parsed is None:
+        return f"Unrecognized date format: {date_str!r}"
+    return parsed._replace(precision="circa") if circa and parsed.precision in ("year", "decade") else parsed
+
+def ordinal(n):
+    suffix = "th" if 10 <= n % 100 <= 20 else {1: "st", 2: "nd", 3: "rd"}.get(n % 10, "th")
+    return f"{n}{suffix}"
+
+def century_label(century):
+    # century is year_value // 100, the bucket the windowed view and the static export both use
+    return f"{ordinal(century + 1)} century" if century >= 0 else f"{ordinal(-century)} century BC"
+
+def parse_date(date_str):
+    parsed = parse_cached(date_str or "")
+    if isinstance(parsed, str):
+        raise ValueError(parsed)
+    return parsed
+
+def parse_year(date_str):
+    return parse_date(date_str).year
+
+def parse_year_or_none(date_str):
+    parsed = parse_cached(date_str or "")
+    return None if isinstance(parsed, str) else parsed.year
+
+# ----------------Batch API---------------------------------------------------------------------------------
+def parse_years(date_strs):
+    # Parse a whole column at once: (int64 years, bool validity mask); invalid entries hold 0
+    with metrics.span("parse_dates"):
+        parsed = [parse_cached(date_str or "") for date_str in date_strs]
+    valid = np.fromiter((not isinstance(p, str) for p in parsed), dtype=bool, count=len(parsed))
+    years = np.fromiter((0 if isinstance(p, str) else p.year for p in parsed), dtype=np.int64, count=len(parsed))
+    return years, valid
+
+def year_values(date_strs):
+    # parse_years as Python ints with None for invalid dates, ready to bind as query parameters
+    years, valid = parse_years(date_strs)
+    return [year if ok else None for year, ok in zip(years.tolist(), valid.tolist())]
+
+def invalid_summary(date_strs, examples=10):
+    # One summary instead of an error per row: (count, [(date_str, message), ...] for a few distinct strings)
+    count, seen = 0, {}
+    for date_str in date_strs:
+        parsed = parse_cached(date_str or "")
+        if isinstance(parsed, str):
+            count += 1
+            if len(seen) < examples:
+                seen.setdefault(date_str, parsed)
+    return count, list(seen.items())
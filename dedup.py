@@ -0,0 +1,253 @@
+import argparse
+import csv
+import hashlib
+import re
+import sys
+import time
+import unicodedata
+
+import numpy as np
+
+# ----------------Duplicate detection (normalized key + trigram MinHash / LSH)-------------------------------
+# Shared by storage (keys are written with every insert and update) and by the import, UI and report.
+# An entry is compared by the character trigrams of its normalized "title | scientist" text. Each entry
+# stores a handful of integer keys in dedup_keys: one exact key (normalized text + year) and one key per
+# LSH band of its MinHash signature, combined with the decade so only entries from nearby years collide.
+# A lookup probes those keys through the index instead of scanning the table; candidates are confirmed
+# with the exact trigram Jaccard similarity and the year tolerance.
+BANDS = 8
+ROWS_PER_BAND = 3
+YEAR_BUCKET = 10
+YEAR_TOLERANCE = 5
+SIMILARITY_THRESHOLD = 0.6
+# A band key held by more entries than this marks a shared template ("Title 1", "Title 2", ...) rather
+# than near-duplicates; such buckets only match identical normalized text, keeping lookups and the report
+# from degrading into comparing everything with everything.
+BUCKET_CAP = 50
+STOPWORDS = frozenset(("a", "an", "and", "the", "of", "on", "in", "for", "to"))
+HASH_PRIME = (1 << 31) - 1
+SIGNATURE_CHUNK = 2000
+
+def stable_hash(*parts):
+    # Signed 64-bit, identical in every process and on both backends (BIGINT keys)
+    digest = hashlib.blake2b("\x1f".join(str(part) for part in parts).encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+# Fixed MinHash permutations h(x) = (a * x + b) mod p; a * x + b stays below 2**64 for 24-bit x
+PERMUTATIONS = BANDS * ROWS_PER_BAND
+COEFFICIENTS_A = np.array([stable_hash("a", i) % (HASH_PRIME - 1) + 1 for i in range(PERMUTATIONS)], dtype=np.uint64)
+COEFFICIENTS_B = np.array([stable_hash("b", i) % HASH_PRIME for i in range(PERMUTATIONS)], dtype=np.uint64)
+
+# ----------------Normalization------------------------------------------------------------------------------
+def fold(text):
+    # Lowercase ASCII words: accents and punctuation dropped
+    text = text or ""
+    if not text.isascii():
+        text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+def normalize_title(title):
+    return " ".join(word for word in fold(title) if word not in STOPWORDS)
+
+def normalize_name(name):
+    # Word order ignored, so "Newton, Isaac" matches "Isaac Newton"
+    return " ".join(sorted(fold(name)))
+
+def entry_text(title, scientist_name):
+    return f"{normalize_title(title)} | {normalize_name(scientist_name)}"
+
+def trigrams(text):
+    padded = f"  {text} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+def similarity(first, second):
+    # Jaccard similarity of two trigram sets
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+def years_close(first, second):
+    if first is None or second is None:
+        return first is None and second is None
+    return abs(first - second) <= YEAR_TOLERANCE
+
+# ----------------Keys---------------------------------------------------------------------------------------
+def signatures(texts):
+    # MinHash signatures, (len(texts), PERMUTATIONS) uint64, computed a chunk of texts at a time.
+    # Normalized text is ASCII, so a trigram's three bytes are its 24-bit code (no string hashing).
+    result = np.empty((len(texts), PERMUTATIONS), dtype=np.uint64)
+    for start in range(0, len(texts), SIGNATURE_CHUNK):
+        padded = [f"  {text} " for text in texts[start:start + SIGNATURE_CHUNK]]
+        chars = np.frombuffer("".join(padded).encode("ascii") + b"\0\0", dtype=np.uint8).astype(np.uint64)
+        codes = chars[:-2] << np.uint64(16) | chars[1:-1] << np.uint64(8) | chars[2:]
+        ends = np.cumsum([len(text) for text in padded])
+        # The last two positions of each text start trigrams that run into the next one
+        valid = np.ones(len(codes), dtype=bool)
+        valid[ends - 1] = valid[ends - 2] = False
+        codes = codes[valid]
+        offsets = np.concatenate([[0], ends[:-1] - 2 * np.arange(1, len(padded))])
+        permuted = (COEFFICIENTS_A[:, None] * codes[None, :] + COEFFICIENTS_B[:, None]) % HASH_PRIME
+        result[start:start + len(padded)] = np.minimum.reduceat(permuted, offsets, axis=1).T
+    return result
+
+MIX_SHIFTS = (np.uint64(30), np.uint64(27), np.uint64(31))
+MIX_MULTIPLIERS = (np.uint64(0xBF58476D1CE4E5B9), np.uint64(0x94D049BB133111EB))
+
+def mix(values):
+    # splitmix64 finalizer over uint64 arrays (arithmetic wraps mod 2**64)
+    values = (values ^ (values >> MIX_SHIFTS[0])) * MIX_MULTIPLIERS[0]
+    values = (values ^ (values >> MIX_SHIFTS[1])) * MIX_MULTIPLIERS[1]
+    return values ^ (values >> MIX_SHIFTS[2])
+
+BAND_SEEDS = np.array([stable_hash("band", band) for band in range(BANDS)], dtype=np.int64).view(np.uint64)
+UNDATED_BUCKET = stable_hash("undated")
+
+def year_buckets(years, offset=0):
+    return np.array([UNDATED_BUCKET if year is None else (year + offset) // YEAR_BUCKET for year in years],
+                    dtype=np.int64).view(np.uint64)
+
+def band_keys(sigs, buckets):
+    # (len(sigs), BANDS) int64: each band's ROWS_PER_BAND MinHash values mixed with the band and year bucket
+    keys = mix(BAND_SEEDS[None, :] ^ buckets[:, None])
+    for row in range(ROWS_PER_BAND):
+        keys = mix(keys ^ sigs[:, row::ROWS_PER_BAND])
+    return keys.view(np.int64)
+
+def exact_keys(texts, years):
+    return [stable_hash("exact", text, year) for text, year in zip(texts, years)]
+
+def stored_keys(texts, sigs, years):
+    # What dedup_keys holds per entry: its exact key, then one key per band for its own decade
+    bands = band_keys(sigs, year_buckets(years)).tolist()
+    return [[exact] + keys for exact, keys in zip(exact_keys(texts, years), bands)]
+
+def probe_keys(texts, sigs, years):
+    # Keys that can match each entry within YEAR_TOLERANCE years: every decade the tolerance reaches
+    reach = [band_keys(sigs, year_buckets(years, offset)).tolist() for offset in (-YEAR_TOLERANCE, 0, YEAR_TOLERANCE)]
+    return [[exact] + sorted(set(low + own + high)) for exact, low, own, high in zip(exact_keys(texts, years), *reach)]
+
+def entry_signatures(entries):
+    # entries: (title, scientist_name, year_value) -> (normalized texts, MinHash signatures)
+    texts = [entry_text(title, name) for title, name, _ in entries]
+    return texts, signatures(texts)
+
+def best_matches(text, year, candidates, threshold=SIMILARITY_THRESHOLD):
+    # candidates: (id, text, year_value) -> [(id, score), ...] of the likely duplicates, best first
+    grams = trigrams(text)
+    matches = []
+    for candidate_id, candidate_text, candidate_year in candidates:
+        if years_close(year, candidate_year):
+            score = similarity(grams, trigrams(candidate_text))
+            if score >= threshold:
+                matches.append((candidate_id, score))
+    return sorted(matches, key=lambda match: (-match[1], match[0]))
+
+def candidate_ids(probe, holders):
+    # holders: key -> ids holding it; the first probe key is the exact key, which is never capped
+    ids = set(holders.get(probe[0], ()))
+    for key in probe[1:]:
+        if len(holders.get(key, ())) <= BUCKET_CAP:
+            ids.update(holders.get(key, ()))
+    return ids
+
+def batch_duplicates(entries):
+    # Duplicates among the entries themselves: {index: [(earlier index, score), ...]}
+    texts, sigs = entry_signatures(entries)
+    years = [entry[2] for entry in entries]
+    seen, found = {}, {}
+    for index, (text, year, keys, probe) in enumerate(zip(texts, years, stored_keys(texts, sigs, years),
+                                                          probe_keys(texts, sigs, years))):
+        candidates = sorted(candidate_ids(probe, seen))
+        matches = best_matches(text, year, [(other, texts[other], years[other]) for other in candidates])
+        if matches:
+            found[index] = matches
+        for key in keys:
+            seen.setdefault(key, []).append(index)
+    return found
+
+# ----------------Whole-table report---------------------------------------------------------------------------
+# Only entries sharing a key are compared, so the work grows with the number of near-duplicates rather
+# than with the square of the table; matching pairs are merged into clusters with union-find.
+def duplicate_clusters(storage, threshold=SIMILARITY_THRESHOLD):
+    # [[(entry_id, best score), ...], ...], largest clusters first
+    groups = storage.dedup_key_groups()
+    ids = sorted({entry_id for members in groups for entry_id in members})
+    rows = {row[0]: row for row in storage.fetch_by_ids(ids, ("id", "title", "scientist_name", "year_value"))}
+    texts = {entry_id: entry_text(row[1], row[2]) for entry_id, row in rows.items()}
+    grams = {entry_id: trigrams(text) for entry_id, text in texts.items()}
+    parent, best, compared = {}, {}, set()
+
+    def root(entry_id):
+        while entry_id in parent:
+            entry_id = parent[entry_id]
+        return entry_id
+
+    parts = []
+    for members in groups:
+        members = [entry_id for entry_id in members if entry_id in rows]
+        if len(members) <= BUCKET_CAP:
+            parts.append(members)
+        else:
+            same_text = {}
+            for entry_id in members:
+                same_text.setdefault(texts[entry_id], []).append(entry_id)
+            parts += [part for part in same_text.values() if len(part) > 1]
+    for members in parts:
+        members.sort(key=lambda entry_id: (rows[entry_id][3] is None, rows[entry_id][3] or 0))
+        for position, first in enumerate(members):
+            for second in members[position + 1:]:
+                year, other_year = rows[first][3], rows[second][3]
+                if year is not None and other_year is not None and other_year - year > YEAR_TOLERANCE:
+                    break
+                pair = (min(first, second), max(first, second))
+                if pair in compared or not years_close(year, other_year):
+                    continue
+                compared.add(pair)
+                score = similarity(grams[first], grams[second])
+                if score >= threshold:
+                    first_root, second_root = root(first), root(second)
+                    if first_root != second_root:
+                        parent[first_root] = second_root
+                    best[first] = max(best.get(first, 0.0), score)
+                    best[second] = max(best.get(second, 0.0), score)
+    clusters = {}
+    for entry_id in best:
+        clusters.setdefault(root(entry_id), []).append((entry_id, best[entry_id]))
+    return sorted((sorted(cluster) for cluster in clusters.values()), key=lambda cluster: (-len(cluster), cluster[0]))
+
+def write_report(storage, clusters, out_stream):
+    writer = csv.writer(out_stream)
+    writer.writerow(["cluster", "id", "score", "scientist_name", "discovery_date", "title"])
+    for number, cluster in enumerate(clusters, start=1):
+        scores = dict(cluster)
+        for row in storage.fetch_by_ids(list(scores), ("id", "scientist_name", "discovery_date", "title")):
+            writer.writerow([number, row[0], f"{scores[row[0]]:.2f}"] + list(row[1:]))
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    # Imported here because storage imports this module for its keys
+    from storage import add_storage_arguments, open_storage
+
+    parser = argparse.ArgumentParser(description="Report likely duplicate discoveries across the whole table.")
+    parser.add_argument("--output", default="-", help="CSV report path; '-' prints to stdout")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD,
+                        help="Minimum trigram similarity of title and scientist")
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.backend, args.db)
+    storage.migrate()
+    started = time.perf_counter()
+    clusters = duplicate_clusters(storage, args.threshold)
+    out = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8", newline="")
+    try:
+        write_report(storage, clusters, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    print(f"{len(clusters)} clusters, {sum(len(cluster) for cluster in clusters)} entries "
+          f"({time.perf_counter() - started:.2f}s)", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
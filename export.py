@@ -0,0 +1,101 @@
+import argparse
+import csv
+import gzip
+import io
+import json
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+from storage import ENTRY_COLUMNS, add_storage_arguments, open_storage
+
+# ----------------Consistent SQLite backups and streaming exports-------------------------------------------
+# Backups go through the SQLite online backup API, so a snapshot taken while another session is
+# writing is still a consistent database (copying timeline.db directly can tear, and in WAL mode
+# misses pages that are still in timeline.db-wal).
+# Usage: python export.py backup timeline.db.gz | python export.py csv discoveries.csv.gz [--backend postgres]
+BACKUP_PAGES_PER_STEP = 1024
+
+def sqlite_backup(db_path, out_stream, compresslevel=6):
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        snapshot_path = os.path.join(tmp_dir, "timeline.db")
+        source = sqlite3.connect(db_path)
+        target = sqlite3.connect(snapshot_path)
+        try:
+            source.backup(target, pages=BACKUP_PAGES_PER_STEP)
+        finally:
+            target.close()
+            source.close()
+        with open(snapshot_path, "rb") as snapshot, gzip.GzipFile(fileobj=out_stream, mode="wb",
+                                                                   compresslevel=compresslevel) as gz:
+            shutil.copyfileobj(snapshot, gz)
+
+def sqlite_backup_bytes(db_path):
+    buffer = io.BytesIO()
+    sqlite_backup(db_path, buffer)
+    return buffer.getvalue()
+
+def iter_csv(storage, columns=ENTRY_COLUMNS):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in storage.iter_entries(columns):
+        writer.writerow(row)
+        if buffer.tell() > 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+def iter_jsonl(storage, columns=ENTRY_COLUMNS):
+    for row in storage.iter_entries(columns):
+        yield json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n"
+
+EXPORTERS = {"csv": iter_csv, "jsonl": iter_jsonl}
+
+def write_export(storage, fmt, out_stream):
+    for chunk in EXPORTERS[fmt](storage):
+        out_stream.write(chunk.encode("utf-8"))
+
+def export_bytes(storage, fmt):
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb") as gz:
+        write_export(storage, fmt, gz)
+    return buffer.getvalue()
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def open_output(path):
+    if path == "-":
+        return sys.stdout.buffer
+    return gzip.open(path, "wb") if path.endswith(".gz") else open(path, "wb")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Back up the SQLite database or stream discoveries to CSV/JSONL.")
+    parser.add_argument("kind", choices=["backup", "csv", "jsonl"])
+    parser.add_argument("output", help="Output path ('.gz' compresses CSV/JSONL); '-' writes to stdout")
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.kind == "backup":
+        if args.backend != "sqlite":
+            parser.error("backup is only available for the SQLite backend; use pg_dump for PostgreSQL")
+        out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+        try:
+            sqlite_backup(args.db, out)
+        finally:
+            if out is not sys.stdout.buffer:
+                out.close()
+        return 0
+
+    out = open_output(args.output)
+    try:
+        write_export(open_storage(args.backend, args.db), args.kind, out)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,184 @@
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from render import URL_RE
+from storage import LINK_DEAD_AFTER, add_storage_arguments, open_storage
+
+# ----------------Background supporting-link checker------------------------------------------------------
+# Finds the URLs in every entry's links (only entries changed since the last scan are re-read), checks
+# them concurrently over one pooled aiohttp session and stores the outcome in link_status. The timeline
+# only reads link_status, so rendering never waits on the network.
+#   - HEAD first, GET when a server refuses HEAD; redirects are followed and the final URL kept
+#   - per-host spacing between requests and a per-host connection cap, plus a global concurrency cap
+#   - healthy links are rechecked after LINK_TTL_SECONDS; failures retry sooner with exponential backoff
+#     and a link counts as dead after LINK_DEAD_AFTER consecutive failures
+# Usage: python linkcheck.py [--once] [--backend postgres]
+# The Streamlit apps start it in a daemon thread when TIMELINE_LINK_CHECKER=1.
+LINK_TTL_SECONDS = 7 * 24 * 3600
+RETRY_SECONDS = 3600
+REQUEST_TIMEOUT_SECONDS = 10
+MAX_CONCURRENCY = 20
+PER_HOST_CONNECTIONS = 2
+PER_HOST_INTERVAL_SECONDS = 1.0
+BATCH_SIZE = 200
+POLL_SECONDS = 60
+USER_AGENT = "timeline-link-checker/1.0"
+HEAD_REFUSED = (403, 405, 501)
+RATE_LIMITED = 429
+
+background_enabled = os.environ.get("TIMELINE_LINK_CHECKER", "").lower() in ("1", "true", "yes", "on")
+
+def link_urls(links):
+    return URL_RE.findall(links or "")
+
+def next_check(result_ok, failures, now, ttl=LINK_TTL_SECONDS, retry=RETRY_SECONDS):
+    if result_ok:
+        return now + ttl
+    return now + min(ttl, retry * 2 ** max(failures - 1, 0))
+
+class HostThrottle:
+    # Spaces requests to the same host at least `interval` apart; the event loop is single-threaded
+    def __init__(self, interval=PER_HOST_INTERVAL_SECONDS):
+        self.interval = interval
+        self.next_slot = defaultdict(float)
+
+    async def wait(self, host):
+        now = time.monotonic()
+        slot = max(now, self.next_slot[host])
+        self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+class LinkChecker:
+    def __init__(self, storage, timeout=REQUEST_TIMEOUT_SECONDS, concurrency=MAX_CONCURRENCY,
+                 per_host=PER_HOST_CONNECTIONS, host_interval=PER_HOST_INTERVAL_SECONDS, ttl=LINK_TTL_SECONDS,
+                 retry=RETRY_SECONDS, batch_size=BATCH_SIZE):
+        self.storage = storage
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.concurrency = concurrency
+        self.per_host = per_host
+        # The request timeout covers connection-pool waits too, so requests queue for a host here first:
+        # links behind a slow one on the same host would otherwise time out without being sent
+        self.host_slots = defaultdict(lambda: asyncio.Semaphore(per_host))
+        self.throttle = HostThrottle(host_interval)
+        self.ttl = ttl
+        self.retry = retry
+        self.batch_size = batch_size
+
+    def session(self):
+        connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host, ttl_dns_cache=300)
+        return aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers={"User-Agent": USER_AGENT})
+
+    # ----------------Discovering URLs (blocking storage calls, run off the event loop)------------------------
+    def scan_new_urls(self):
+        since = self.storage.meta_value("links_scanned_version")
+        data_version = self.storage.data_version()
+        if data_version <= since:
+            return 0
+        urls = {url for _, links in self.storage.fetch_changed(since, ("id", "links")) for url in link_urls(links)}
+        self.storage.add_link_urls(sorted(urls), data_version)
+        return len(urls)
+
+    # ----------------Checking-----------------------------------------------------------------------------
+    async def fetch_status(self, session, url):
+        # (status, final URL, error); a network failure has no status
+        host = urlsplit(url).hostname
+        async with self.host_slots[host]:
+            await self.throttle.wait(host)
+            try:
+                async with session.head(url, allow_redirects=True) as response:
+                    status, final_url = response.status, str(response.url)
+                if status in HEAD_REFUSED:
+                    async with session.get(url, allow_redirects=True) as response:
+                        status, final_url = response.status, str(response.url)
+                return status, final_url, None
+            except asyncio.TimeoutError:
+                return None, None, "timeout"
+            except (aiohttp.ClientError, ValueError) as e:
+                return None, None, f"{type(e).__name__}: {e}"[:500]
+
+    async def check(self, session, url, failures):
+        status, final_url, error = await self.fetch_status(session, url)
+        now = int(time.time())
+        if status == RATE_LIMITED:
+            # Not the link's fault: keep its failure count and come back later
+            return (url, status, final_url, error, failures, now, now + self.retry), False
+        ok = status is not None and status < 400
+        new_failures = 0 if ok else failures + 1
+        changed = (failures >= LINK_DEAD_AFTER) != (new_failures >= LINK_DEAD_AFTER)
+        return (url, status, final_url, error, new_failures, now,
+                next_check(ok, new_failures, now, self.ttl, self.retry)), changed
+
+    async def run_once(self, session):
+        # Scan for new URLs, then check one batch of due links; returns the number checked
+        await asyncio.to_thread(self.scan_new_urls)
+        due = await asyncio.to_thread(self.storage.due_links, int(time.time()), self.batch_size)
+        if not due:
+            return 0
+        checked = await asyncio.gather(*(self.check(session, url, failures) for url, failures in due))
+        await asyncio.to_thread(self.storage.record_link_checks, [result for result, _ in checked],
+                                any(changed for _, changed in checked))
+        return len(checked)
+
+    async def run_until_idle(self):
+        total = 0
+        async with self.session() as session:
+            while True:
+                checked = await self.run_once(session)
+                total += checked
+                if checked < self.batch_size:
+                    return total
+
+    async def run_forever(self, poll_seconds=POLL_SECONDS):
+        async with self.session() as session:
+            while True:
+                try:
+                    checked = await self.run_once(session)
+                except Exception as e:  # keep the worker alive across database hiccups
+                    print(f"Link check failed: {e}", file=sys.stderr)
+                    checked = 0
+                if checked < self.batch_size:
+                    await asyncio.sleep(poll_seconds)
+
+def start_background(storage):
+    # One daemon thread with its own event loop; the caller keeps it alive (e.g. with st.cache_resource)
+    thread = threading.Thread(target=asyncio.run, args=(LinkChecker(storage).run_forever(),), name="link-checker",
+                              daemon=True)
+    thread.start()
+    return thread
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check the supporting links of every discovery in the background.")
+    parser.add_argument("--once", action="store_true", help="Check every due link, then exit")
+    parser.add_argument("--timeout", type=float, default=REQUEST_TIMEOUT_SECONDS)
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENCY)
+    parser.add_argument("--host-interval", type=float, default=PER_HOST_INTERVAL_SECONDS,
+                        help="Minimum seconds between requests to the same host")
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    storage = open_storage(args.backend, args.db)
+    storage.migrate()
+    checker = LinkChecker(storage, timeout=args.timeout, concurrency=args.concurrency, host_interval=args.host_interval)
+    try:
+        if args.once:
+            checked = asyncio.run(checker.run_until_idle())
+            known, _, dead = storage.link_summary()
+            print(f"Checked {checked} links; {dead} of {known} known links are dead")
+        else:
+            asyncio.run(checker.run_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
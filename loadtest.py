@@ -0,0 +1,377 @@
+import argparse
+import gc
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+import metrics
+from bench import BULK_BATCH_SIZE, drop_bench_tables, git_commit
+from storage import SQLiteStorage, open_storage
+from synthetic import generate
+
+# ----------------Concurrent-session load test for timeline.py / timeline1.py--------------------------------
+# Runs N simulated sessions at once, each a headless streamlit.testing AppTest in its own thread, against
+# a seeded database. All sessions share this process's st.cache_* and storage objects, as browser sessions
+# share one Streamlit server. Viewers toggle tag filters and flip the sort order; editors also log in, open
+# entries in the edit selectbox, submit edits (compare-and-swap, so conflicts are expected) and prepare
+# backups / exports. Every action is one rerun, timed end to end.
+# The JSON report holds p50/p95/p99 rerun latency overall and per action, storage contention from the
+# metrics spans (waits for a read connection, write latencies, edit conflicts) and process memory growth.
+# Thresholds given on the command line (or a --baseline report to compare against) make the exit status 1
+# when breached, so the run can gate a change.
+# Usage: python loadtest.py --size 10000 --sessions 20 --editors 3 --actions 20 --max-p95-ms 1500
+#        python loadtest.py --backend postgres --reset ...   (timeline1.py against DB_* from the environment)
+# Needs the Streamlit release pinned in requirements-dev.txt.
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APPS = {"sqlite": os.path.join(APP_DIR, "timeline.py"), "postgres": os.path.join(APP_DIR, "timeline1.py")}
+PASSCODE = "loadtest"
+RUN_TIMEOUT_SECONDS = 300
+VIEWER_ACTIONS = ("toggle_tag", "sort")
+EDITOR_ACTIONS = ("open_edit", "submit_edit", "backup", "toggle_tag", "sort")
+CONTENTION_SPANS = ("connection", "insert", "update", "fetch_entries", "backup", "export")
+QUANTILES = (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))
+
+def rss_bytes():
+    # Current resident set size; peak RSS where /proc is not available
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def latency_summary(samples):
+    if not samples:
+        return {"count": 0}
+    summary = {"count": len(samples), "mean_ms": sum(samples) / len(samples) * 1000}
+    for name, q in QUANTILES:
+        summary[f"{name}_ms"] = metrics.quantile(samples, q) * 1000
+    summary["max_ms"] = max(samples) * 1000
+    return summary
+
+def histogram_summary(histogram):
+    # Bucketed histograms only bound a quantile: the upper edge of the bucket it falls in
+    summary = {"count": histogram.count, "total_s": histogram.total,
+               "mean_ms": histogram.total / histogram.count * 1000 if histogram.count else None}
+    for name, q in QUANTILES[1:]:
+        target, seen = q * histogram.count, 0
+        for bound, bucket_count in zip(metrics.BUCKETS + (float("inf"),), histogram.counts):
+            seen += bucket_count
+            if seen >= target:
+                summary[f"{name}_le_ms"] = bound * 1000
+                break
+    return summary
+
+# ----------------Seeding----------------------------------------------------------------------------------
+def seed(storage, size, seed_value):
+    storage.migrate()
+    batch = []
+    for number, row in enumerate(generate(size, seed_value), start=1):
+        batch.append(row)
+        if len(batch) == BULK_BATCH_SIZE or number == size:
+            storage.insert_many(batch)
+            batch = []
+    return [name for _, name in storage.fetch_tags()]
+
+# ----------------Simulated sessions-------------------------------------------------------------------------
+# AppTest is built for one test at a time: each run swaps the process-wide st.secrets when given secrets,
+# sets and then clears the global Runtime instance, and patches config.get_option for its duration.
+# Concurrent runs would undo each other's setup mid-script, so secrets come from .streamlit/secrets.toml in
+# the working directory and the runtime and test-mode config are installed once for every session (one media
+# file manager and cache storage manager, as one server would have).
+def write_secrets(directory, backend):
+    lines = ["[app]", f"passcode = {json.dumps(PASSCODE)}"]
+    if backend == "postgres":
+        lines += ["[db]"] + [f"{key} = {json.dumps(os.environ.get(f'DB_{key.upper()}', ''))}"
+                             for key in ("name", "user", "password", "host")]
+        lines.append(f"port = {int(os.environ['DB_PORT'])}")
+    os.makedirs(os.path.join(directory, ".streamlit"), exist_ok=True)
+    with open(os.path.join(directory, ".streamlit", "secrets.toml"), "w") as secrets_file:
+        secrets_file.write("\n".join(lines) + "\n")
+
+def share_runtime():
+    import contextlib
+    from unittest.mock import MagicMock
+
+    import streamlit
+    import streamlit.testing.v1.app_test as app_test
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.testing.v1.util import build_mock_config_get_option
+
+    # These are Streamlit internals, not public API (requirements-dev.txt pins the release they were written against)
+    missing = [name for owner, name in ((Runtime, "_instance"), (app_test, "Runtime"),
+                                        (app_test, "patch_config_options"), (config, "get_option"))
+               if not hasattr(owner, name)]
+    if missing:
+        raise RuntimeError(f"streamlit {streamlit.__version__} lacks {', '.join(missing)}, which the shared "
+                           "runtime patches; install the version pinned in requirements-dev.txt")
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    # AppTest's per-run set / reset now lands on this subclass; Runtime.instance() keeps the shared one
+    app_test.Runtime = type("LoadTestRuntime", (Runtime,), {})
+    config.get_option = build_mock_config_get_option({"global.appTest": True})
+    app_test.patch_config_options = lambda overrides: contextlib.nullcontext()
+
+class Session:
+    def __init__(self, number, app_path, editor, rng, think_seconds):
+        from streamlit.testing.v1 import AppTest
+
+        self.name = f"{'editor' if editor else 'viewer'}-{number}"
+        self.editor = editor
+        self.rng = rng
+        self.think_seconds = think_seconds
+        self.app = AppTest.from_file(app_path, default_timeout=RUN_TIMEOUT_SECONDS)
+        self.samples = []
+        self.errors = []
+        self.conflicts = 0
+
+    def widgets(self, kind, label):
+        # Sidebar widgets of that kind and label in page order (the add and edit forms share labels)
+        return [element for element in getattr(self.app.sidebar, kind) if element.label == label]
+
+    def timed(self, action, step):
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as e:  # a failed rerun is a result, not a reason to stop the session
+            self.errors.append((action, f"{type(e).__name__}: {e}"[:300]))
+            return
+        self.samples.append((action, time.perf_counter() - started))
+        self.errors += [(action, str(exception.value)[:300]) for exception in self.app.exception]
+
+    # ----------------Actions (each ends in exactly one rerun)-------------------------------------------------
+    def open_app(self):
+        self.app.run()
+        if self.editor:
+            self.widgets("text_input", "Enter Passcode")[0].input(PASSCODE).run()
+
+    def toggle_tag(self, tags):
+        tag = self.rng.choice(tags)
+        checkbox = next(element for element in self.app.sidebar.checkbox if element.label == tag)
+        checkbox.set_value(not checkbox.value)
+        next(button for button in self.app.sidebar.button if button.label == "Apply Filter").click().run()
+
+    def sort(self):
+        selectbox = self.widgets("selectbox", "Sort Order")[0]
+        selectbox.set_value("Descending" if selectbox.value == "Ascending" else "Ascending").run()
+
+    def open_edit(self):
+        # Options are shown as "title (date) · #id"; the widget's value is the id
+        selectbox = self.widgets("selectbox", "Select Entry to Edit")[0]
+        selectbox.set_value(int(self.rng.choice(selectbox.options).rsplit("#", 1)[1])).run()
+
+    def submit_edit(self):
+        # The edit form's title input comes after the add form's
+        self.widgets("text_input", "Title of Discovery")[-1].input(f"Edited by {self.name} {self.rng.random():.6f}")
+        self.widgets("button", "Update Entry")[0].click().run()
+        if any("changed by someone else" in error.value for error in self.app.sidebar.error):
+            self.conflicts += 1
+
+    def backup(self):
+        buttons = self.widgets("button", "📥 Prepare database backup") or self.widgets("button", "Prepare export")
+        buttons[0].click().run()
+
+    def run(self, actions, tags, start_barrier):
+        start_barrier.wait()
+        self.timed("open", self.open_app)
+        if self.app.exception:
+            return
+        steps = {"toggle_tag": lambda: self.toggle_tag(tags), "sort": self.sort, "open_edit": self.open_edit,
+                 "submit_edit": self.submit_edit, "backup": self.backup}
+        choices = EDITOR_ACTIONS if self.editor else VIEWER_ACTIONS
+        for number in range(actions):
+            if self.think_seconds:
+                time.sleep(self.rng.uniform(0, self.think_seconds))
+            action = choices[number % len(choices)] if number < len(choices) else self.rng.choice(choices)
+            self.timed(action, steps[action])
+
+# ----------------Run--------------------------------------------------------------------------------------
+def run_load(args):
+    metrics.enable()
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": args.backend,
+            "app": os.path.basename(APPS[args.backend]),
+            "size": args.size,
+            "sessions": args.sessions,
+            "editors": args.editors,
+            "actions": args.actions,
+            "think_ms": args.think_ms,
+            "seed": args.seed,
+        },
+    }
+    work_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # timeline.py opens timeline.db, and both apps read .streamlit/secrets.toml, in the working directory
+        os.chdir(tmp_dir)
+        write_secrets(tmp_dir, args.backend)
+        share_runtime()
+        if args.backend == "sqlite":
+            storage = SQLiteStorage(os.path.join(tmp_dir, "timeline.db"))
+        else:
+            storage = open_storage(args.backend)
+            storage.write(drop_bench_tables)
+        print(f"Seeding {args.size} rows on {args.backend}...", file=sys.stderr)
+        tags = seed(storage, args.size, args.seed)
+        if hasattr(storage, "close"):
+            storage.close()
+
+        rng = random.Random(args.seed)
+        sessions = [Session(number, APPS[args.backend], number < args.editors,
+                            random.Random(rng.random()), args.think_ms / 1000) for number in range(args.sessions)]
+        # One session first, so the shared caches and snapshot are built before the clock starts
+        warmup = Session(-1, APPS[args.backend], False, random.Random(0), 0)
+        warmup.open_app()
+        gc.collect()
+        rss_start = rss_bytes()
+        before = {key: (list(histogram.counts), histogram.count, histogram.total)
+                  for key, histogram in metrics.histograms.items()}
+
+        print(f"Running {args.sessions} sessions ({args.editors} editors) x {args.actions} actions...",
+              file=sys.stderr)
+        barrier = threading.Barrier(len(sessions))
+        threads = [threading.Thread(target=session.run, args=(args.actions, tags, barrier), name=session.name)
+                   for session in sessions]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        gc.collect()
+        rss_end = rss_bytes()
+        os.chdir(work_dir)
+
+    samples = [sample for session in sessions for sample in session.samples]
+    by_action = {}
+    for action, seconds in samples:
+        by_action.setdefault(action, []).append(seconds)
+    reruns = [seconds for action, seconds in samples if action != "open"]
+    errors = [(session.name, action, message) for session in sessions for action, message in session.errors]
+    report["results"] = {
+        "elapsed_s": elapsed,
+        "reruns_per_s": len(samples) / elapsed if elapsed else None,
+        "rerun": latency_summary(reruns),
+        "by_action": {action: latency_summary(values) for action, values in sorted(by_action.items())},
+        "errors": len(errors),
+        "error_samples": [list(error) for error in errors[:10]],
+    }
+    contention = {"edit_conflicts": sum(session.conflicts for session in sessions)}
+    for (name, labels), histogram in metrics.histograms.items():
+        span = dict(labels).get("span")
+        if name == "timeline_span_seconds" and span in CONTENTION_SPANS:
+            # Only what happened during the load, not seeding or warmup
+            counts, count, total = before.get((name, labels), ([0] * len(histogram.counts), 0, 0.0))
+            during = metrics.Histogram()
+            during.counts = [now - then for now, then in zip(histogram.counts, counts)]
+            during.count, during.total = histogram.count - count, histogram.total - total
+            contention[span] = histogram_summary(during)
+    report["results"]["contention"] = contention
+    report["results"]["memory"] = {"rss_start_mb": rss_start / 2 ** 20, "rss_end_mb": rss_end / 2 ** 20,
+                                   "growth_mb": (rss_end - rss_start) / 2 ** 20,
+                                   "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 2 ** 10}
+    return report
+
+# ----------------Regression thresholds-----------------------------------------------------------------------
+def check_thresholds(report, args):
+    # Human-readable failures; empty when every threshold given holds
+    results, failures = report["results"], []
+    rerun = results["rerun"]
+    for name in ("p50", "p95", "p99"):
+        limit = getattr(args, f"max_{name}_ms")
+        if limit is not None and rerun.get(f"{name}_ms") is not None and rerun[f"{name}_ms"] > limit:
+            failures.append(f"rerun {name} {rerun[f'{name}_ms']:.1f} ms > {limit:.1f} ms")
+    if args.max_errors is not None and results["errors"] > args.max_errors:
+        failures.append(f"{results['errors']} failed reruns > {args.max_errors}")
+    growth = results["memory"]["growth_mb"]
+    if args.max_memory_growth_mb is not None and growth > args.max_memory_growth_mb:
+        failures.append(f"memory grew {growth:.1f} MB > {args.max_memory_growth_mb:.1f} MB")
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline_report = json.load(baseline_file)
+        baseline, meta = baseline_report["results"], report["meta"]
+        differing = [key for key in ("backend", "size", "sessions", "editors", "actions", "think_ms")
+                     if baseline_report["meta"].get(key) != meta[key]]
+        if differing:
+            print(f"warning: baseline was run with different {', '.join(differing)}", file=sys.stderr)
+        for name in ("p95", "p99"):
+            old, new = baseline["rerun"].get(f"{name}_ms"), rerun.get(f"{name}_ms")
+            if old and new and new > old * args.max_regression:
+                failures.append(f"rerun {name} {new:.1f} ms is {new / old:.2f}x the baseline's {old:.1f} ms "
+                                f"(allowed {args.max_regression:.2f}x)")
+    return failures
+
+def print_summary(report):
+    results = report["results"]
+    print(f"{'action':<12} {'count':>6} {'p50':>9} {'p95':>9} {'p99':>9}", file=sys.stderr)
+    for action, summary in [("all reruns", results["rerun"])] + list(results["by_action"].items()):
+        if summary["count"]:
+            print(f"{action:<12} {summary['count']:>6} {summary['p50_ms']:>7.1f}ms {summary['p95_ms']:>7.1f}ms "
+                  f"{summary['p99_ms']:>7.1f}ms", file=sys.stderr)
+    memory = results["memory"]
+    print(f"{results['reruns_per_s']:.1f} reruns/s, {results['errors']} errors, "
+          f"{results['contention']['edit_conflicts']} edit conflicts, memory +{memory['growth_mb']:.1f} MB",
+          file=sys.stderr)
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test the timeline app with concurrent simulated sessions.")
+    parser.add_argument("--backend", choices=sorted(APPS), default="sqlite",
+                        help="sqlite runs timeline.py on a temporary database; postgres runs timeline1.py")
+    parser.add_argument("--reset", action="store_true",
+                        help="Required for PostgreSQL: drops and reseeds the timeline tables in DB_NAME")
+    parser.add_argument("--size", type=int, default=10000, help="Seeded entries")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions, editors included")
+    parser.add_argument("--editors", type=int, default=2)
+    parser.add_argument("--actions", type=int, default=10, help="Reruns per session after it opens the app")
+    parser.add_argument("--think-ms", type=float, default=0, help="Random pause of up to this before each action")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="-", help="JSON report path; '-' prints to stdout")
+    parser.add_argument("--max-p50-ms", type=float)
+    parser.add_argument("--max-p95-ms", type=float)
+    parser.add_argument("--max-p99-ms", type=float)
+    parser.add_argument("--max-errors", type=int, default=0)
+    parser.add_argument("--max-memory-growth-mb", type=float)
+    parser.add_argument("--baseline", help="Earlier report; fail when p95/p99 exceed it by --max-regression")
+    parser.add_argument("--max-regression", type=float, default=1.25)
+    args = parser.parse_args(argv)
+    if args.backend != "sqlite" and not args.reset:
+        parser.error("load-testing PostgreSQL reseeds its timeline tables; pass --reset against a scratch database")
+    if not 0 <= args.editors <= args.sessions:
+        parser.error("--editors must be between 0 and --sessions")
+
+    output = args.output if args.output == "-" else os.path.abspath(args.output)
+    report = run_load(args)
+    failures = check_thresholds(report, args)
+    report["thresholds"] = {"failures": failures}
+    if output == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        with open(output, "w") as out:
+            json.dump(report, out, indent=2)
+    print_summary(report)
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
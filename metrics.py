@@ -0,0 +1,215 @@
+import bisect
+import functools
+import os
+import threading
+import time
+from collections import defaultdict, deque
+
+# ----------------Lightweight per-rerun instrumentation-----------------------------------------------------
+# Off unless TIMELINE_METRICS=1 (or enable() is called before the app module is imported): span() then
+# hands back a shared no-op context manager and the counters return immediately.
+# When on, spans feed latency histograms and the current rerun's breakdown, counters track queries,
+# rows and cache hits/misses, and write_prometheus() periodically rewrites a Prometheus text file
+# (TIMELINE_METRICS_FILE, default metrics.prom) that a node_exporter textfile collector can scrape.
+enabled = os.environ.get("TIMELINE_METRICS", "").lower() in ("1", "true", "yes", "on")
+METRICS_FILE = os.environ.get("TIMELINE_METRICS_FILE", "metrics.prom")
+EXPORT_INTERVAL_SECONDS = 15
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+MAX_SESSIONS = 20
+RECENT_RERUNS = 200
+
+lock = threading.Lock()
+counters = defaultdict(float)
+histograms = {}
+session_reruns = {}
+last_breakdown = {}
+local = threading.local()
+last_export = 0.0
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.total += value
+        self.count += 1
+
+def observe(name, value, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with lock:
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = Histogram()
+        histogram.observe(value)
+
+def count(name, amount=1, **labels):
+    if not enabled:
+        return
+    with lock:
+        counters[(name, tuple(sorted(labels.items())))] += amount
+
+# ----------------Spans-------------------------------------------------------------------------------------
+class NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+NOOP_SPAN = NoopSpan()
+
+class Span:
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        observe("timeline_span_seconds", elapsed, span=self.name)
+        breakdown = getattr(local, "breakdown", None)
+        if breakdown is not None:
+            calls, seconds = breakdown.get(self.name, (0, 0.0))
+            breakdown[self.name] = (calls + 1, seconds + elapsed)
+        return False
+
+def span(name):
+    return Span(name) if enabled else NOOP_SPAN
+
+def timed(name):
+    # Decorator form of span()
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def tracked_cache(name, cache):
+    # Wrap a cache decorator (e.g. st.cache_data(...)) so lookups and misses are counted and misses timed
+    def decorate(fn):
+        if not enabled:
+            return cache(fn)
+
+        @functools.wraps(fn)
+        def miss(*args, **kwargs):
+            count("timeline_cache_misses_total", cache=name)
+            with span(name):
+                return fn(*args, **kwargs)
+        cached = cache(miss)
+
+        @functools.wraps(fn)
+        def lookup(*args, **kwargs):
+            count("timeline_cache_lookups_total", cache=name)
+            return cached(*args, **kwargs)
+        lookup.clear = cached.clear
+        return lookup
+    return decorate
+
+# ----------------Reruns------------------------------------------------------------------------------------
+def start_rerun():
+    if enabled:
+        local.breakdown = {}
+        local.rerun_started = time.perf_counter()
+
+def finish_rerun(session):
+    breakdown = getattr(local, "breakdown", None)
+    if not enabled or breakdown is None:
+        return
+    elapsed = time.perf_counter() - local.rerun_started
+    local.breakdown = None
+    observe("timeline_rerun_seconds", elapsed)
+    with lock:
+        if session not in session_reruns and len(session_reruns) >= MAX_SESSIONS:
+            oldest = next(iter(session_reruns))
+            del session_reruns[oldest]
+            last_breakdown.pop(oldest, None)
+        session_reruns.setdefault(session, (Histogram(), deque(maxlen=RECENT_RERUNS)))
+        histogram, recent = session_reruns[session]
+        histogram.observe(elapsed)
+        recent.append(elapsed)
+        last_breakdown[session] = (elapsed, breakdown)
+    maybe_export()
+
+def session_summary(session):
+    # (last rerun seconds, {span: (calls, seconds)}, recent rerun latencies) for the debug panel
+    with lock:
+        elapsed, breakdown = last_breakdown.get(session, (None, {}))
+        recent = list(session_reruns[session][1]) if session in session_reruns else []
+    return elapsed, dict(breakdown), recent
+
+def counter_values():
+    with lock:
+        return {format_series(name, labels): value for (name, labels), value in sorted(counters.items())}
+
+def quantile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+# ----------------Prometheus text export--------------------------------------------------------------------
+def label_value(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_series(name, labels):
+    if not labels:
+        return name
+    rendered = ",".join(f'{key}="{label_value(value)}"' for key, value in labels)
+    return f"{name}{{{rendered}}}"
+
+def histogram_lines(name, labels, histogram):
+    cumulative = 0
+    for bound, bucket_count in zip(BUCKETS + ("+Inf",), histogram.counts):
+        cumulative += bucket_count
+        yield f"{format_series(name + '_bucket', labels + (('le', bound),))} {cumulative}"
+    yield f"{format_series(name + '_sum', labels)} {histogram.total}"
+    yield f"{format_series(name + '_count', labels)} {histogram.count}"
+
+def prometheus_text():
+    lines, typed = [], set()
+    with lock:
+        for (name, labels), value in sorted(counters.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} counter")
+            lines.append(f"{format_series(name, labels)} {value}")
+        for (name, labels), histogram in sorted(histograms.items()):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f"# TYPE {name} histogram")
+            lines.extend(histogram_lines(name, labels, histogram))
+        if session_reruns:
+            lines.append("# TYPE timeline_session_rerun_seconds histogram")
+            for session, (histogram, _) in session_reruns.items():
+                lines.extend(histogram_lines("timeline_session_rerun_seconds", (("session", session),), histogram))
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path=None):
+    # Write to a temporary file and rename so a scraper never sees a half-written file
+    path = path or METRICS_FILE
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as out:
+        out.write(prometheus_text())
+    os.replace(tmp_path, path)
+
+def maybe_export():
+    global last_export
+    now = time.monotonic()
+    if now - last_export < EXPORT_INTERVAL_SECONDS:
+        return
+    last_export = now
+    try:
+        write_prometheus()
+    except OSError:
+        pass
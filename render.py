@@ -0,0 +1,67 @@
+import math
+import re
+from html import escape
+
+# ----------------Single-pass timeline renderer----------------------------------------------------------------
+# Builds the visible timeline as one HTML document (one Streamlit element instead of 2-3 per entry).
+# Entries are native <details> collapsibles; every user-supplied string is HTML-escaped.
+# The spacer above each entry grows with the log of the gap to the previous entry, so a few deep-time
+# entries no longer flatten everything else or open gaps of thousands of pixels.
+MAX_GAP_PX = 100
+URL_RE = re.compile(r"https?://[^\s,;<>\"']+")
+
+RENDER_CSS = """<style>
+.timeline > details { border: 2px solid #00bcd4; border-radius: 10px; margin: 10px 0; background-color: #1e1e1e; }
+.timeline > details > summary { color: #00bcd4; font-weight: 500; padding: 10px 20px; cursor: pointer; }
+.timeline > details[open] > summary { border-bottom: 1px solid #00bcd4; }
+.timeline > details > .event-card { margin: 10px 20px 20px; }
+.timeline a.dead-link { color: #ff6b6b; text-decoration: line-through; }
+</style>"""
+
+def gap_scale(rows):
+    # Log of the largest gap between neighbours; 1 keeps a single entry / equal years from dividing by zero
+    years = [row[7] for row in rows]
+    largest = max((abs(b - a) for a, b in zip(years, years[1:])), default=0)
+    return math.log1p(largest) or 1
+
+def spacer_px(gap, scale):
+    return round(MAX_GAP_PX * math.log1p(abs(gap)) / scale)
+
+def link_html(links, dead_links=frozenset()):
+    # dead_links: URLs the link checker (linkcheck.py) last found unreachable
+    urls = URL_RE.findall(links or "")
+    if not urls:
+        return f"<p>{escape(links or '')}</p>"
+    label = "Supporting Links" if len(urls) == 1 else "Supporting Link {}"
+    return " ".join(
+        f'<a class="dead-link" href="{escape(url)}" target="_blank" rel="noopener" title="Unreachable when last checked">'
+        f"{escape(label.format(number))} (unreachable)</a>" if url in dead_links else
+        f'<a href="{escape(url)}" target="_blank" rel="noopener">{escape(label.format(number))}</a>'
+        for number, url in enumerate(urls, start=1))
+
+def entry_html(entry, margin_px, dead_links=frozenset()):
+    # No blank lines or leading indentation, so st.markdown keeps the whole document as one raw HTML block
+    heading = f"{escape(entry[3])} ({escape(entry[2])})"
+    description = "<br>".join(escape(line) for line in (entry[4] or "").splitlines())
+    # Markup is kept terse because it is repeated for every entry
+    style = f' style="margin-top:{margin_px}px"' if margin_px != 10 else ""
+    return (f"<details{style}>"
+            f"<summary>{heading}</summary>"
+            f'<div class="event-card"><h3>{heading}</h3>'
+            f"<p><b>Scientist:</b> {escape(entry[1])}</p>"
+            f"<p>{description}</p>"
+            f"{link_html(entry[5], dead_links)}"
+            f"<p><b>Tags:</b> {escape(entry[6] or '')}</p>"
+            "</div></details>")
+
+def render_timeline(rows, css="", title="Timeline of Great Thoughts", dead_links=frozenset()):
+    # rows are ENTRY_COLUMNS tuples already in display order (ascending or descending by year_value)
+    scale = gap_scale(rows)
+    parts = [css.strip(), RENDER_CSS, f'<h1 class="glowing-title">{escape(title)}</h1>', '<div class="timeline">']
+    previous = None
+    for entry in rows:
+        margin = 10 if previous is None else 10 + spacer_px(entry[7] - previous, scale)
+        parts.append(entry_html(entry, margin, dead_links))
+        previous = entry[7]
+    parts.append("</div>")
+    return "\n".join(part for part in parts if part)
@@ -0,0 +1,159 @@
+import numpy as np
+
+from storage import split_tags
+
+# ----------------Columnar snapshot of the timeline-----------------------------------------------------------
+# One read-only copy per process, shared by every session: ids and years in NumPy arrays kept in
+# (year_value, id) order, tags as a bitmask matrix, scientist names interned as integer codes, and the short
+# text columns the timeline needs. Descriptions and links are never held; entries() loads them by id for the
+# rows actually shown.
+# Tag bits are dense: tag_positions maps each tag id to its bit (bit p of word p // 64) in the order tags were
+# first seen, so the matrix is as wide as the vocabulary whatever the database ids are.
+# A snapshot is immutable: refresh() applies rows changed since its version and returns a new one.
+SNAPSHOT_COLUMNS = ("id", "scientist_name", "discovery_date", "title", "tags", "year_value")
+TEXT_COLUMNS = ("id", "description", "links")
+WORD_BITS = 64
+WORD_MASK = (1 << WORD_BITS) - 1
+
+def tag_words(positions, words):
+    mask = 0
+    for position in positions:
+        mask |= 1 << position
+    return tuple((mask >> (WORD_BITS * word)) & WORD_MASK for word in range(words))
+
+class EntrySnapshot:
+    def __init__(self, version, ids, years, tag_bits, tag_positions, scientist_codes, scientists, titles, dates,
+                 tags):
+        self.version = version
+        self.ids = ids
+        self.years = years
+        self.tag_bits = tag_bits
+        self.tag_positions = tag_positions
+        self.scientist_codes = scientist_codes
+        self.scientists = scientists
+        self.scientist_names = list(scientists)
+        self.titles = titles
+        self.dates = dates
+        self.tags = tags
+        self.id_order = np.argsort(ids, kind="stable")
+        self.sorted_ids = ids[self.id_order]
+
+    @classmethod
+    def empty(cls):
+        no_text = np.empty(0, dtype=object)
+        return cls(None, np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.zeros((0, 1), dtype=np.uint64),
+                   {}, np.empty(0, dtype=np.int32), {}, no_text, no_text, no_text)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.ids, self.years, self.tag_bits, self.scientist_codes, self.id_order,
+                                               self.sorted_ids, self.titles, self.dates, self.tags))
+
+    # ----------------Refresh (copy-on-write)---------------------------------------------------------------
+    def refresh(self, storage, data_version):
+        if self.version is not None and data_version <= self.version:
+            return self
+        since = -1 if self.version is None else self.version
+        rows = list(storage.fetch_changed(since, SNAPSHOT_COLUMNS))
+        # Changed rows are replaced; deleted ones only leave (a cold load has nothing to drop)
+        deleted = [] if self.version is None else storage.deleted_since(since)
+        changed = np.array([row[0] for row in rows] + deleted, dtype=np.int64)
+        keep = ~np.isin(self.ids, changed)
+        # Entries whose date stopped parsing drop out here; only dated rows are on the timeline
+        rows = [row for row in rows if row[5] is not None]
+
+        tag_ids = {name: tag_id for tag_id, name in storage.fetch_tags()}
+        # Bit positions only ever grow: new tags take the next free bits, existing bits never move
+        tag_positions = dict(self.tag_positions)
+        for tag_id in tag_ids.values():
+            tag_positions.setdefault(tag_id, len(tag_positions))
+        words = max(self.tag_bits.shape[1], (len(tag_positions) - 1) // WORD_BITS + 1)
+        old_bits = self.tag_bits[keep]
+        if old_bits.shape[1] < words:
+            old_bits = np.hstack([old_bits, np.zeros((len(old_bits), words - old_bits.shape[1]), dtype=np.uint64)])
+        # Rows share a few hundred distinct tag strings, so each string is split and masked once
+        positions = {name: tag_positions[tag_id] for name, tag_id in tag_ids.items()}
+        masks = {}
+        for row in rows:
+            if row[4] not in masks:
+                masks[row[4]] = tag_words([positions[name] for name in split_tags(row[4]) if name in positions], words)
+        new_bits = np.array([masks[row[4]] for row in rows], dtype=np.uint64).reshape(len(rows), words)
+
+        # Codes only ever grow, so the previous snapshot's codes stay valid in the new one
+        scientists = dict(self.scientists)
+        new_codes = np.fromiter((scientists.setdefault(row[1] or "", len(scientists)) for row in rows),
+                                dtype=np.int32, count=len(rows))
+
+        # Dates and tag strings repeat heavily; equal values share one string object
+        shared = {}
+
+        def column(old, index, dtype=object, dedupe=False):
+            new = np.empty(len(rows), dtype=dtype)
+            new[:] = [shared.setdefault(row[index], row[index]) if dedupe else row[index] for row in rows]
+            return np.concatenate([old[keep], new])
+
+        ids = column(self.ids, 0, np.int64)
+        years = column(self.years, 5, np.int64)
+        order = np.lexsort((ids, years))
+        return EntrySnapshot(data_version, ids[order], years[order], np.vstack([old_bits, new_bits])[order],
+                             tag_positions, np.concatenate([self.scientist_codes[keep], new_codes])[order], scientists,
+                             column(self.titles, 3)[order], column(self.dates, 2, dedupe=True)[order],
+                             column(self.tags, 4, dedupe=True)[order])
+
+    # ----------------Vectorized filtering--------------------------------------------------------------------
+    def position(self, year, entry_id, side):
+        # Index of (year, entry_id) in the (year_value, id) order
+        start = np.searchsorted(self.years, year, "left")
+        end = np.searchsorted(self.years, year, "right")
+        return start + np.searchsorted(self.ids[start:end], entry_id, side)
+
+    def filter(self, start_year=None, end_year=None, tag_ids=None, match_all=False, descending=False, after=None,
+               limit=None, text_ids=None):
+        # Same result as Storage.fetch_range(...) ids; text_ids are the ids matching the text search
+        if tag_ids is not None and not tag_ids:
+            return []
+        start = 0 if start_year is None else np.searchsorted(self.years, start_year, "left")
+        end = len(self) if end_year is None else np.searchsorted(self.years, end_year, "right")
+        if after is not None:
+            if descending:
+                end = min(end, self.position(after[0], after[1], "left"))
+            else:
+                start = max(start, self.position(after[0], after[1], "right"))
+        if start >= end:
+            return []
+
+        mask = np.ones(end - start, dtype=bool)
+        if tag_ids is not None:
+            # A tag this snapshot has never seen is on no entry
+            positions = [self.tag_positions[tag_id] for tag_id in tag_ids if tag_id in self.tag_positions]
+            if not positions or (match_all and len(positions) < len(tag_ids)):
+                return []
+            query = np.array(tag_words(positions, self.tag_bits.shape[1]), dtype=np.uint64)
+            hits = self.tag_bits[start:end] & query
+            mask &= (hits == query).all(axis=1) if match_all else hits.any(axis=1)
+        if text_ids is not None:
+            mask &= np.isin(self.ids[start:end], text_ids)
+        positions = start + np.flatnonzero(mask)
+        if descending:
+            positions = positions[::-1]
+        return self.ids[positions[:limit]].tolist()
+
+    # ----------------Full rows for the entries being shown-----------------------------------------------------
+    def positions_of(self, ids):
+        return self.id_order[np.searchsorted(self.sorted_ids, np.asarray(ids, dtype=np.int64))]
+
+    def entries(self, storage, ids):
+        # ENTRY_COLUMNS tuples; description and links are read from storage for just these ids. An entry
+        # deleted since this snapshot was taken is left out (the next refresh drops it).
+        if not ids:
+            return []
+        texts = {row[0]: row[1:] for row in storage.fetch_by_ids(ids, TEXT_COLUMNS)}
+        ids = [entry_id for entry_id in ids if entry_id in texts]
+        rows = []
+        for entry_id, position in zip(ids, self.positions_of(ids).tolist()):
+            description, links = texts[entry_id]
+            rows.append((entry_id, self.scientist_names[self.scientist_codes[position]], self.dates[position],
+                         self.titles[position], description, links, self.tags[position], int(self.years[position])))
+        return rows
@@ -0,0 +1,317 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from html import escape
+
+from api import entry_json
+from dates import century_label
+from render import RENDER_CSS, render_timeline
+from storage import add_storage_arguments, open_storage
+
+# ----------------Incremental static-site export-----------------------------------------------------------
+# Writes the timeline as static files that any web server (or object store) can serve without Python:
+#   shards/<tag>/<century>.html   the display_timeline view of one tag in one century, readable without JS
+#   shards/<tag>/<century>.json   the same entries as JSON, loaded on demand by index.html
+#   manifest.json                 tags, shards with entry counts and a digest of their entry ids
+#   index.html                    client-side index: filters by tag, century range and text over the shards
+# A rerun only rebuilds shards whose entry set changed or that hold rows changed since the data version
+# recorded in the manifest; shards are rendered in a process pool, each worker with its own storage.
+# Usage: python static_export.py site/ [--full] [--workers 4] [--backend postgres]
+MANIFEST_FILE = "manifest.json"
+SHARD_DIR = "shards"
+
+PAGE_CSS = """<style>
+body { background-color: #0e1117; color: #ffffff; font-family: 'Montserrat', sans-serif; margin: 0 auto; max-width: 960px; padding: 0 16px; }
+a { color: #4dd0e1; }
+.glowing-title { font-size: 2.5rem; font-weight: 700; color: #00bcd4; text-align: center; text-shadow: 0 0 10px #00bcd4; }
+</style>"""
+
+def tag_slug(tag_id, name):
+    slug = "".join(char if char.isalnum() else "-" for char in name.lower()).strip("-")
+    return f"{tag_id}-{'-'.join(part for part in slug.split('-') if part)}"
+
+def shard_paths(tag_id, tag_name, century):
+    base = f"{SHARD_DIR}/{tag_slug(tag_id, tag_name)}/{century}"
+    return f"{base}.json", f"{base}.html"
+
+def ids_digest(ids):
+    return hashlib.sha1(",".join(map(str, ids)).encode("ascii")).hexdigest()[:16]
+
+def shard_memberships(storage):
+    # {(tag_id, century): sorted entry ids}; century uses floor division, so 1-99 BC is century -1
+    members = defaultdict(list)
+    for tag_id, entry_id, year_value in storage.tag_years():
+        members[(tag_id, year_value // 100)].append(entry_id)
+    return {key: sorted(ids) for key, ids in members.items()}
+
+def write_atomic(path, data):
+    # A server reading the export mid-run sees either the old file or the new one, never half of one
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as out:
+        out.write(data)
+    os.replace(tmp_path, path)
+
+def page_html(title, body, back_link="../../index.html"):
+    return (f'<!DOCTYPE html>\n<html lang="en"><head><meta charset="utf-8">'
+            f'<meta name="viewport" content="width=device-width, initial-scale=1">'
+            f"<title>{escape(title)}</title>{PAGE_CSS}</head><body>\n"
+            f'<p><a href="{back_link}">All discoveries</a></p>\n{body}\n</body></html>\n')
+
+# ----------------Shards (run in worker processes)-----------------------------------------------------------
+worker_storage = None
+
+def init_worker(backend, db):
+    global worker_storage
+    worker_storage = open_storage(backend, db)
+
+def build_shard(storage, out_dir, tag_id, tag_name, century, ids):
+    # Primary-key lookups of the known members are far cheaper than a tag + year range query per shard
+    rows = sorted(storage.fetch_by_ids(ids), key=lambda row: (row[7], row[0]))
+    json_path, html_path = shard_paths(tag_id, tag_name, century)
+    title = f"{tag_name} · {century_label(century)}"
+    payload = {"tag": tag_name, "century": century, "label": century_label(century),
+               "items": [entry_json(row) for row in rows]}
+    write_atomic(os.path.join(out_dir, json_path),
+                 json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    write_atomic(os.path.join(out_dir, html_path), page_html(title, render_timeline(rows, title=title)).encode("utf-8"))
+    return tag_id, century, len(rows)
+
+def build_shard_in_worker(task):
+    return build_shard(worker_storage, *task)
+
+def build_shards(storage, tasks, workers, storage_args):
+    if workers <= 1 or len(tasks) <= 1:
+        return [build_shard(storage, *task) for task in tasks]
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=storage_args) as pool:
+        return list(pool.map(build_shard_in_worker, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+
+# ----------------Export------------------------------------------------------------------------------------
+def load_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST_FILE), encoding="utf-8") as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return None
+
+def stale_shards(storage, previous, members, tag_names):
+    # Keys whose entry set changed, whose tag was renamed, or that hold a row edited since the last export
+    old = {(shard["tag_id"], shard["century"]): shard for shard in previous["shards"]}
+    old_names = {tag["id"]: tag["name"] for tag in previous["tags"]}
+    changed_ids = {row[0] for row in storage.fetch_changed(previous["data_version"], ("id",))}
+    return {key for key, ids in members.items()
+            if key not in old or old[key]["digest"] != ids_digest(ids) or old_names.get(key[0]) != tag_names[key[0]]
+            or not changed_ids.isdisjoint(ids)}
+
+def export_site(backend, db, out_dir, workers=None, full=False):
+    started = time.perf_counter()
+    storage = open_storage(backend, db)
+    storage.migrate()
+    # Read the version first: rows written after it are picked up again by the next run
+    data_version = storage.data_version()
+    tag_names = dict(storage.fetch_tags())
+    members = shard_memberships(storage)
+    previous = None if full else load_manifest(out_dir)
+    stale = set(members) if previous is None else stale_shards(storage, previous, members, tag_names)
+
+    tasks = [(out_dir, tag_id, tag_names[tag_id], century, members[(tag_id, century)])
+             for tag_id, century in sorted(stale)]
+    counts = {(tag_id, century): count
+              for tag_id, century, count in build_shards(storage, tasks, workers or os.cpu_count() or 1, (backend, db))}
+
+    # Shards that no longer have entries (or whose tag was renamed) are removed after the new files exist
+    live_files = {path for key in members for path in shard_paths(key[0], tag_names[key[0]], key[1])}
+    removed = 0
+    for shard in (previous or {}).get("shards", []):
+        for path in (shard["json"], shard["html"]):
+            if path not in live_files and os.path.exists(os.path.join(out_dir, path)):
+                os.remove(os.path.join(out_dir, path))
+                removed += 1
+
+    old = {(shard["tag_id"], shard["century"]): shard for shard in (previous or {}).get("shards", [])}
+    shards = []
+    for tag_id, century in sorted(members):
+        json_path, html_path = shard_paths(tag_id, tag_names[tag_id], century)
+        count = counts.get((tag_id, century), old.get((tag_id, century), {}).get("count"))
+        shards.append({"tag_id": tag_id, "tag": tag_names[tag_id], "century": century, "label": century_label(century),
+                       "count": count, "digest": ids_digest(members[(tag_id, century)]),
+                       "json": json_path, "html": html_path})
+    manifest = {
+        "data_version": data_version,
+        "generated": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "tags": [{"id": tag_id, "name": name} for tag_id, name in sorted(tag_names.items())],
+        "shards": shards,
+    }
+    write_atomic(os.path.join(out_dir, "index.html"), INDEX_HTML.encode("utf-8"))
+    write_atomic(os.path.join(out_dir, MANIFEST_FILE),
+                 json.dumps(manifest, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    if hasattr(storage, "close"):
+        storage.close()
+    return {"built": len(tasks), "unchanged": len(members) - len(tasks), "removed_files": removed,
+            "data_version": data_version, "seconds": round(time.perf_counter() - started, 2)}
+
+# ----------------Client-side index--------------------------------------------------------------------------
+# Loads manifest.json, fetches only the shards the filters need (cache-busted by their digest) and renders
+# the same <details> markup as render.py, a page of entries at a time.
+INDEX_HTML = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>Timeline of Great Thoughts</title>
+""" + PAGE_CSS + "\n" + RENDER_CSS + """
+<style>
+.filters { display: flex; flex-wrap: wrap; gap: 8px 16px; align-items: center; margin: 16px 0; }
+.filters label { white-space: nowrap; }
+#status { color: #aaaaaa; }
+</style>
+</head><body>
+<h1 class="glowing-title">Timeline of Great Thoughts</h1>
+<noscript><p>Browse the pre-rendered pages in <a href="manifest.json">manifest.json</a> (the "html" paths).</p></noscript>
+<div class="filters">
+  <input id="text" type="search" placeholder="Search titles, descriptions and scientists">
+  <label>From <select id="from"></select></label>
+  <label>To <select id="to"></select></label>
+  <label>Sort <select id="sort"><option value="asc">Ascending</option><option value="desc">Descending</option></select></label>
+  <label><input id="match-all" type="checkbox"> Match all selected tags</label>
+</div>
+<div class="filters" id="tags"></div>
+<p id="status">Loading…</p>
+<div class="timeline" id="timeline"></div>
+<p><button id="more" hidden>Show more</button></p>
+<script>
+const PAGE_SIZE = 200, MAX_GAP_PX = 100, URL_RE = /https?:\\/\\/[^\\s,;<>"']+/g;
+const $ = id => document.getElementById(id);
+const shardCache = new Map();
+let manifest = null, matches = [], shown = 0, generation = 0;
+
+function loadShard(shard) {
+  if (!shardCache.has(shard.json)) {
+    shardCache.set(shard.json, fetch(shard.json + "?v=" + shard.digest).then(response => response.json()));
+  }
+  return shardCache.get(shard.json);
+}
+
+function element(tag, text, className) {
+  const node = document.createElement(tag);
+  if (text !== undefined) node.textContent = text;
+  if (className) node.className = className;
+  return node;
+}
+
+function labelled(label, text) {
+  const p = element("p");
+  p.append(element("b", label), " " + text);
+  return p;
+}
+
+function entryNode(entry, marginPx) {
+  const details = element("details");
+  if (marginPx !== 10) details.style.marginTop = marginPx + "px";
+  const heading = entry.title + " (" + entry.discovery_date + ")";
+  const card = element("div", undefined, "event-card");
+  const description = element("p");
+  (entry.description || "").split("\\n").forEach((line, index) => {
+    if (index) description.append(element("br"));
+    description.append(line);
+  });
+  card.append(element("h3", heading), labelled("Scientist:", entry.scientist_name), description);
+  const urls = (entry.links || "").match(URL_RE) || [];
+  if (!urls.length) card.append(element("p", entry.links || ""));
+  urls.forEach((url, index) => {
+    const link = element("a", urls.length === 1 ? "Supporting Links" : "Supporting Link " + (index + 1));
+    link.href = url; link.target = "_blank"; link.rel = "noopener";
+    card.append(link, " ");
+  });
+  card.append(labelled("Tags:", entry.tags.join(", ")));
+  details.append(element("summary", heading), card);
+  return details;
+}
+
+function renderMore() {
+  const years = matches.map(entry => entry.year_value);
+  let largest = 0;
+  for (let i = 1; i < years.length; i++) largest = Math.max(largest, Math.abs(years[i] - years[i - 1]));
+  const scale = Math.log1p(largest) || 1;
+  const end = Math.min(shown + PAGE_SIZE, matches.length);
+  for (let i = shown; i < end; i++) {
+    const gap = i === 0 ? null : Math.abs(years[i] - years[i - 1]);
+    $("timeline").append(entryNode(matches[i], gap === null ? 10 : 10 + Math.round(MAX_GAP_PX * Math.log1p(gap) / scale)));
+  }
+  shown = end;
+  $("more").hidden = shown >= matches.length;
+  $("status").textContent = matches.length ? "Showing " + shown + " of " + matches.length + " entries"
+                                           : "No valid entries found for the selected filters.";
+}
+
+async function update() {
+  const current = ++generation;
+  const tagNames = new Set([...document.querySelectorAll("#tags input:checked")].map(box => box.value));
+  const from = Number($("from").value), to = Number($("to").value);
+  const wanted = manifest.shards.filter(shard => tagNames.has(shard.tag) && shard.century >= from && shard.century <= to);
+  $("status").textContent = "Loading " + wanted.length + " shards…";
+  const shards = await Promise.all(wanted.map(loadShard));
+  if (current !== generation) return;
+
+  const byId = new Map();
+  shards.forEach(shard => shard.items.forEach(entry => byId.set(entry.id, entry)));
+  const terms = $("text").value.toLowerCase().match(/\\w+/g) || [];
+  const matchAll = $("match-all").checked;
+  matches = [...byId.values()].filter(entry => {
+    if (matchAll && ![...tagNames].every(name => entry.tags.includes(name))) return false;
+    const haystack = (entry.title + " " + entry.description + " " + entry.scientist_name).toLowerCase();
+    return terms.every(term => haystack.includes(term));
+  });
+  matches.sort((a, b) => a.year_value - b.year_value || a.id - b.id);
+  if ($("sort").value === "desc") matches.reverse();
+  $("timeline").replaceChildren();
+  shown = 0;
+  renderMore();
+}
+
+async function start() {
+  manifest = await (await fetch("manifest.json", {cache: "no-cache"})).json();
+  const centuries = [...new Map(manifest.shards.map(shard => [shard.century, shard.label])).entries()].sort((a, b) => a[0] - b[0]);
+  centuries.forEach(([century, label]) => {
+    $("from").append(new Option(label, century));
+    $("to").append(new Option(label, century));
+  });
+  $("to").selectedIndex = centuries.length - 1;
+  manifest.tags.forEach(tag => {
+    const box = element("input");
+    box.type = "checkbox"; box.value = tag.name; box.checked = true;
+    const label = element("label");
+    label.append(box, " " + tag.name);
+    $("tags").append(label);
+  });
+  let timer = null;
+  $("text").addEventListener("input", () => { clearTimeout(timer); timer = setTimeout(update, 250); });
+  ["from", "to", "sort", "match-all", "tags"].forEach(id => $(id).addEventListener("change", update));
+  $("more").addEventListener("click", renderMore);
+  update();
+}
+
+start();
+</script>
+</body></html>
+"""
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export the timeline as static HTML/JSON shards by tag and century.")
+    parser.add_argument("output", help="Output directory; rerunning into it only rebuilds changed shards")
+    parser.add_argument("--full", action="store_true", help="Rebuild every shard (e.g. after changing render.py)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: one per CPU)")
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    result = export_site(args.backend, args.db, args.output, args.workers, args.full)
+    print(f"Built {result['built']} shards ({result['unchanged']} unchanged, {result['removed_files']} files removed) "
+          f"at data version {result['data_version']} in {result['seconds']}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
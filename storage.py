@@ -0,0 +1,1455 @@
+import os
+import queue
+import re
+import secrets
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+import metrics
+from dates import PARSER_VERSION, year_values
+from dedup import best_matches, candidate_ids, entry_signatures, entry_text, probe_keys, stored_keys
+
+# ----------------Schema-----------------------------------------------------------------------------------
+ENTRY_FIELDS = ("scientist_name", "discovery_date", "title", "description", "links", "tags")
+ENTRY_COLUMNS = ("id",) + ENTRY_FIELDS + ("year_value",)
+# ENTRY_COLUMNS plus the row version that compare-and-swap updates check
+VERSIONED_COLUMNS = ENTRY_COLUMNS + ("version",)
+
+DEFAULT_TAGS = ["Biology", "Philosophy", "Mathematics", "Physics", "Optics", "Quantum", "Astro", "Classical Mechanics",
+                "Thermodynamics", "Statistical", "Electronics", "Material Science", "Computer Science"]
+
+FETCH_BY_IDS_CHUNK = 500
+# Bucket sizes in years for the overview rollups: decade, century, millennium
+ROLLUP_GRANULARITIES = (10, 100, 1000)
+# tag_id under which rollups count every entry once, tagged or not
+ALL_ENTRIES = 0
+# Consecutive failed checks before a supporting link is shown as dead
+LINK_DEAD_AFTER = 2
+# Schema migrations, applied in order and recorded (SQLite: PRAGMA user_version, PostgreSQL:
+# schema_migrations): (version, description, Storage method, chunked). Chunked steps are backfills run
+# BACKFILL_CHUNK rows per transaction, with the version recorded after the last chunk. Steps stay
+# idempotent: databases from before versioning start at 0 and replay them all.
+MIGRATIONS = (
+    (1, "discoveries, meta and row versions", "migrate_entries", False),
+    (2, "year_value column and index", "migrate_year_value", False),
+    (3, "backfill year_value", "backfill_year_values", True),
+    (4, "tags and discovery_tags", "migrate_tags", False),
+    (5, "full-text search", "migrate_search", False),
+    (6, "overview rollups", "migrate_rollups", False),
+    (7, "link status", "migrate_link_status", False),
+    (8, "entry uids", "migrate_uids", False),
+    (9, "backfill entry uids", "backfill_uids", True),
+    (10, "change log", "migrate_change_log", False),
+    (11, "duplicate detection keys", "migrate_dedup_keys", False),
+    (12, "backfill duplicate detection keys", "backfill_dedup_keys", True),
+    (13, "search index written per insert batch", "migrate_search_inserts", False),
+    (14, "published data version", "migrate_published_version", False),
+    (15, "deleted entries", "migrate_deleted_entries", False),
+)
+BACKFILL_CHUNK = 2000
+# What sync.py ships per change: the change_log stamp, then the entry's ENTRY_FIELDS (NULL for op "delete")
+CHANGE_COLUMNS = ("seq", "uid", "op", "version", "changed_at", "origin") + ENTRY_FIELDS
+
+class StorageError(Exception):
+    pass
+
+class ConflictError(StorageError):
+    # A compare-and-swap update found rows changed since they were read; nothing in the batch was written
+    def __init__(self, conflicts):
+        self.conflicts = conflicts  # [(entry_id, expected_version, current_version or None if deleted)]
+        ids = ", ".join(f"#{entry_id}" for entry_id, _, _ in conflicts[:10])
+        more = f" and {len(conflicts) - 10} more" if len(conflicts) > 10 else ""
+        super().__init__(f"Changed by someone else since it was loaded: {ids}{more}")
+
+def split_tags(tags):
+    return [tag.strip() for tag in tags.split(",") if tag.strip()] if tags else []
+
+def search_query_terms(text):
+    # Only word characters reach the query syntax; every term is matched as a prefix
+    return re.findall(r"\w+", text.lower()) if text else []
+
+def column_list(columns):
+    unknown = [column for column in columns if column not in VERSIONED_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown discoveries columns: {', '.join(unknown)}")
+    return ", ".join(columns)
+
+# ----------------Backend-neutral storage------------------------------------------------------------------
+# SQL is written once with "?" placeholders; backends translate placeholders and supply the
+# few dialect-specific pieces (id column DDL, adding columns, batch execution, scan cursors).
+class Storage:
+    id_column = "id INTEGER PRIMARY KEY"
+    no_limit = None
+    lock_rows = ""
+    scan_batch_size = 2000
+    schema_ready = False
+    migrate_lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        raise NotImplementedError
+
+    def sql(self, query):
+        return query
+
+    def execute(self, cursor, query, params=()):
+        metrics.count("timeline_queries_total")
+        cursor.execute(self.sql(query), params)
+        return cursor
+
+    def execute_many(self, cursor, query, rows):
+        metrics.count("timeline_queries_total")
+        cursor.executemany(self.sql(query), rows)
+
+    def insert_values(self, cursor, table, columns, rows, on_conflict=""):
+        placeholders = ", ".join("?" for _ in columns)
+        self.execute_many(cursor, f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) {on_conflict}",
+                          rows)
+
+    def insert_integers(self, cursor, table, columns, rows, on_conflict=""):
+        # Integer-only rows (join and key tables), sorted so index pages are filled in order
+        self.insert_values(cursor, table, columns, sorted(rows), on_conflict)
+
+    def fetch_all(self, cursor):
+        rows = cursor.fetchall()
+        metrics.count("timeline_rows_fetched_total", len(rows))
+        return rows
+
+    def scan(self, query, params=()):
+        # Yields rows scan_batch_size at a time from a scan cursor, holding the connection until exhausted
+        with self.connection() as conn:
+            cursor = self.execute(self.scan_cursor(conn), query, params)
+            while True:
+                rows = cursor.fetchmany(self.scan_batch_size)
+                if not rows:
+                    return
+                metrics.count("timeline_rows_fetched_total", len(rows))
+                yield from rows
+
+    def add_column(self, cursor, table, column, ddl):
+        raise NotImplementedError
+
+    def write(self, work, *args):
+        # Run work(cursor, *args) in one write transaction and return its result
+        with self.connection() as conn:
+            return work(conn.cursor(), *args)
+
+    def stats(self):
+        return {}
+
+    # ----------------Migrations---------------------------------------------------------------------------
+    # Once per Storage object (one per process in the apps): an up-to-date database costs one version read.
+    # Each step commits on its own, so readers and other writers only wait for one step or chunk at a time.
+    def migrate(self):
+        if self.schema_ready:
+            return
+        with self.migrate_lock:
+            if self.schema_ready:
+                return
+            with metrics.span("migrate"):
+                with self.connection() as conn:
+                    applied = self.schema_version(conn.cursor())
+                for version, description, method, chunked in MIGRATIONS:
+                    if version <= applied:
+                        continue
+                    step = getattr(self, method)
+                    if chunked:
+                        after_id = 0
+                        while after_id is not None:
+                            after_id = self.write(step, after_id, BACKFILL_CHUNK)
+                    self.write(self.apply_migration, version, description, None if chunked else step)
+                self.redate_entries()
+            self.schema_ready = True
+
+    def apply_migration(self, cursor, version, description, step):
+        # Another process may have applied it since we looked
+        self.lock_schema(cursor)
+        if self.schema_version(cursor) >= version:
+            return
+        if step is not None:
+            step(cursor)
+        self.record_migration(cursor, version, description)
+
+    def schema_version(self, cursor):
+        raise NotImplementedError
+
+    def lock_schema(self, cursor):
+        pass
+
+    def record_migration(self, cursor, version, description):
+        raise NotImplementedError
+
+    def migrate_entries(self, cursor):
+        self.execute(cursor, f"""
+        CREATE TABLE IF NOT EXISTS discoveries (
+            {self.id_column},
+            scientist_name TEXT,
+            discovery_date TEXT,
+            title TEXT,
+            description TEXT,
+            links TEXT,
+            tags TEXT
+        )
+        """)
+        self.migrate_data_version(cursor)
+
+    def migrate_data_version(self, cursor):
+        self.execute(cursor, "CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value BIGINT NOT NULL)")
+        self.execute(cursor, "INSERT INTO meta (key, value) VALUES ('data_version', 0) ON CONFLICT (key) DO NOTHING")
+        self.add_column(cursor, "discoveries", "change_seq", "BIGINT NOT NULL DEFAULT 0")
+        self.execute(cursor, "CREATE INDEX IF NOT EXISTS idx_discoveries_change_seq ON discoveries (change_seq)")
+        self.add_column(cursor, "discoveries", "version", "INTEGER NOT NULL DEFAULT 1")
+
+    def migrate_year_value(self, cursor):
+        self.add_column(cursor, "discoveries", "year_value", "BIGINT")
+        self.execute(cursor, "CREATE INDEX IF NOT EXISTS idx_discoveries_year ON discoveries (year_value, id)")
+
+    # Backfills take the last id done and return the next one to resume after, or None when finished
+    def backfill_year_values(self, cursor, after_id, limit):
+        return self.parse_missing_years(cursor, after_id, limit)[0]
+
+    def parse_missing_years(self, cursor, after_id, limit):
+        # (next after_id or None, [(entry_id, year_value)] for undated rows in this chunk that now parse)
+        rows = self.execute(cursor, """
+        SELECT id, discovery_date FROM discoveries WHERE year_value IS NULL AND id > ? ORDER BY id LIMIT ?
+        """, (after_id, limit)).fetchall()
+        updates = zip([entry_id for entry_id, _ in rows], year_values([date_str for _, date_str in rows]))
+        updates = [(entry_id, year_value) for entry_id, year_value in updates if year_value is not None]
+        if updates:
+            change_seq = self.bump_data_version(cursor)
+            self.execute_many(cursor, "UPDATE discoveries SET year_value = ?, change_seq = ? WHERE id = ?",
+                              [(year_value, change_seq, entry_id) for entry_id, year_value in updates])
+        return (rows[-1][0] if len(rows) == limit else None), updates
+
+    # The year_value backfill migration runs once per database, but undated entries may parse after a
+    # dates.py change: they are retried once per PARSER_VERSION, after the migrations
+    def redate_entries(self):
+        with self.connection() as conn:
+            row = self.execute(conn.cursor(), "SELECT value FROM meta WHERE key = 'date_parser_version'").fetchone()
+        if row is not None and row[0] >= PARSER_VERSION:
+            return
+        after_id = 0
+        while after_id is not None:
+            after_id = self.write(self.redate_chunk, after_id, BACKFILL_CHUNK)
+        self.write(self.execute, """
+        INSERT INTO meta (key, value) VALUES ('date_parser_version', ?)
+        ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """, (PARSER_VERSION,))
+
+    def redate_chunk(self, cursor, after_id, limit):
+        # Newly dated entries join the rollups and get the dedup keys of their decade
+        after_id, updates = self.parse_missing_years(cursor, after_id, limit)
+        ids = [entry_id for entry_id, _ in updates]
+        self.adjust_rollups(cursor, ids, 1)
+        entries = []
+        for start in range(0, len(ids), FETCH_BY_IDS_CHUNK):
+            chunk = ids[start:start + FETCH_BY_IDS_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            entries += self.execute(cursor, f"""
+            SELECT id, title, scientist_name, year_value FROM discoveries WHERE id IN ({placeholders})
+            """, chunk).fetchall()
+        self.index_duplicates(cursor, entries)
+        return after_id
+
+    def migrate_tags(self, cursor):
+        self.execute(cursor, f"""
+        CREATE TABLE IF NOT EXISTS tags (
+            {self.id_column},
+            name TEXT NOT NULL UNIQUE
+        )
+        """)
+        self.execute(cursor, """
+        CREATE TABLE IF NOT EXISTS discovery_tags (
+            discovery_id INTEGER NOT NULL REFERENCES discoveries (id) ON DELETE CASCADE,
+            tag_id INTEGER NOT NULL REFERENCES tags (id),
+            PRIMARY KEY (tag_id, discovery_id)
+        )
+        """)
+        self.execute(cursor, "CREATE INDEX IF NOT EXISTS idx_discovery_tags_discovery ON discovery_tags (discovery_id)")
+
+        # Seed the vocabulary only on first run so it can be curated afterwards
+        if self.execute(cursor, "SELECT COUNT(*) FROM tags").fetchone()[0] == 0:
+            self.execute_many(cursor, "INSERT INTO tags (name) VALUES (?)", [(tag,) for tag in DEFAULT_TAGS])
+
+        # Convert comma-joined tag strings that have no join rows yet
+        rows = self.execute(cursor, """
+        SELECT id, tags FROM discoveries
+        WHERE tags IS NOT NULL AND tags <> ''
+          AND NOT EXISTS (SELECT 1 FROM discovery_tags WHERE discovery_id = discoveries.id)
+        """).fetchall()
+        self.set_tags_many(cursor, rows)
+        if rows:
+            self.bump_data_version(cursor)
+
+    def migrate_rollups(self, cursor):
+        self.execute(cursor, """
+        CREATE TABLE IF NOT EXISTS rollups (
+            granularity INTEGER NOT NULL,
+            bucket BIGINT NOT NULL,
+            tag_id INTEGER NOT NULL,
+            count BIGINT NOT NULL,
+            PRIMARY KEY (granularity, bucket, tag_id)
+        )
+        """)
+        # Filled once from the entries (tags and year_value were just backfilled); afterwards writes keep it current
+        self.rebuild_rollups(cursor)
+
+    def migrate_link_status(self, cursor):
+        self.execute(cursor, """
+        CREATE TABLE IF NOT EXISTS link_status (
+            url TEXT PRIMARY KEY,
+            status INTEGER,
+            final_url TEXT,
+            error TEXT,
+            failures INTEGER NOT NULL DEFAULT 0,
+            checked_at BIGINT,
+            next_check_at BIGINT NOT NULL DEFAULT 0
+        )
+        """)
+        self.execute(cursor, "CREATE INDEX IF NOT EXISTS idx_link_status_next_check ON link_status (next_check_at)")
+        self.execute(cursor, """
+        INSERT INTO meta (key, value) VALUES ('link_version', 0), ('links_scanned_version', -1)
+        ON CONFLICT (key) DO NOTHING
+        """)
+
+    def migrate_uids(self, cursor):
+        self.add_column(cursor, "discoveries", "uid", "TEXT")
+        self.execute(cursor, "CREATE UNIQUE INDEX IF NOT EXISTS idx_discoveries_uid ON discoveries (uid)")
+
+    def backfill_uids(self, cursor, after_id, limit):
+        ids = [row[0] for row in self.execute(cursor, """
+        SELECT id FROM discoveries WHERE uid IS NULL AND id > ? ORDER BY id LIMIT ?
+        """, (after_id, limit)).fetchall()]
+        self.execute_many(cursor, "UPDATE discoveries SET uid = ? WHERE id = ?",
+                          [(uuid.uuid4().hex, entry_id) for entry_id in ids])
+        return ids[-1] if len(ids) == limit else None
+
+    def migrate_change_log(self, cursor):
+        self.execute(cursor, """
+        CREATE TABLE IF NOT EXISTS change_log (
+            uid TEXT PRIMARY KEY,
+            entry_id INTEGER NOT NULL REFERENCES discoveries (id) ON DELETE CASCADE,
+            op TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            changed_at BIGINT NOT NULL,
+            origin BIGINT NOT NULL,
+            seq BIGINT NOT NULL
+        )
+        """)
+        self.execute(cursor, "CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_seq ON change_log (seq)")
+        self.execute(cursor, """
+        INSERT INTO meta (key, value) VALUES ('store_id', ?), ('log_seq', 0) ON CONFLICT (key) DO NOTHING
+        """, (secrets.randbits(62),))
+        # Every write logs itself, so only entries written before the log existed need logging, once.
+        # One INSERT ... SELECT with seq = id: row-by-row inserts into the new, foreign-keyed table took
+        # minutes on 100k entries in SQLite.
+        if self.execute(cursor, "SELECT 1 FROM change_log LIMIT 1").fetchone() is None:
+            self.execute(cursor, """
+            INSERT INTO change_log (uid, entry_id, op, version, changed_at, origin, seq)
+            SELECT uid, id, 'insert', version, ?, (SELECT value FROM meta WHERE key = 'store_id'), id FROM discoveries
+            """, (int(time.time() * 1000),))
+            self.execute(cursor, """
+            UPDATE meta SET value = (SELECT COALESCE(MAX(seq), 0) FROM change_log) WHERE key = 'log_seq'
+            """)
+
+    def migrate_deleted_entries(self, cursor):
+        # Tombstones (see record_deletes). entry_id is the local row that was deleted, NULL for a replicated
+        # delete of an entry this store never had.
+        self.execute(cursor, """
+        CREATE TABLE IF NOT EXISTS deleted_entries (
+            seq BIGINT PRIMARY KEY,
+            uid TEXT NOT NULL,
+            entry_id INTEGER,
+            version INTEGER NOT NULL,
+            changed_at BIGINT NOT NULL,
+            origin BIGINT NOT NULL,
+            change_seq BIGINT NOT NULL
+        )
+        """)
+        self.execute(cursor, "CREATE INDEX IF NOT EXISTS idx_deleted_entries_uid ON deleted_entries (uid)")
+        self.execute(cursor, """
+        CREATE INDEX IF NOT EXISTS idx_deleted_entries_change_seq ON deleted_entries (change_seq)
+        """)
+
+    # Backends whose search index is not kept by the database itself index each insert batch in index_search
+    def migrate_search_inserts(self, cursor):
+        pass
+
+    def index_search(self, cursor, change_seq):
+        pass
+
+    def migrate_dedup_keys(self, cursor):
+        self.execute(cursor, """
+        CREATE TABLE IF NOT EXISTS dedup_keys (
+            key BIGINT NOT NULL,
+            entry_id INTEGER NOT NULL REFERENCES discoveries (id) ON DELETE CASCADE,
+            PRIMARY KEY (key, entry_id)
+        )
+        """)
+        self.execute(cursor, "CREATE INDEX IF NOT EXISTS idx_dedup_keys_entry ON dedup_keys (entry_id)")
+
+    def backfill_dedup_keys(self, cursor, after_id, limit):
+        # Every entry has at least its exact key, so entries with none are the ones still to do
+        entries = self.execute(cursor, """
+        SELECT d.id, d.title, d.scientist_name, d.year_value FROM discoveries d
+        WHERE d.id > ? AND NOT EXISTS (SELECT 1 FROM dedup_keys k WHERE k.entry_id = d.id)
+        ORDER BY d.id LIMIT ?
+        """, (after_id, limit)).fetchall()
+        self.index_duplicates(cursor, entries, replace=False)
+        return entries[-1][0] if len(entries) == limit else None
+
+    # ----------------Rollups: entry counts per (bucket, tag) at each granularity------------------------------
+    # Maintained in the same transaction as every insert/update, so the overview never scans discoveries.
+    # Buckets are the first year of a floor-divided range (1-99 BC falls in bucket -100, like century_label).
+    def rollup_selects(self, where="1 = 1"):
+        for granularity in ROLLUP_GRANULARITIES:
+            bucket = (f"(CASE WHEN d.year_value >= 0 THEN d.year_value / {granularity} "
+                      f"ELSE (d.year_value - {granularity - 1}) / {granularity} END) * {granularity}")
+            yield f"""
+            SELECT {granularity}, {bucket}, dt.tag_id, COUNT(*) FROM discoveries d
+            JOIN discovery_tags dt ON dt.discovery_id = d.id
+            WHERE d.year_value IS NOT NULL AND {where} GROUP BY 2, 3
+            """
+            yield f"""
+            SELECT {granularity}, {bucket}, {ALL_ENTRIES}, COUNT(*) FROM discoveries d
+            WHERE d.year_value IS NOT NULL AND {where} GROUP BY 2
+            """
+
+    def rebuild_rollups(self, cursor):
+        self.execute(cursor, "DELETE FROM rollups")
+        for select in self.rollup_selects():
+            self.execute(cursor, f"INSERT INTO rollups (granularity, bucket, tag_id, count) {select}")
+
+    def adjust_rollups(self, cursor, ids, sign):
+        # Add (sign=1) or remove (sign=-1) the current year/tags of these entries from the rollups.
+        # Emptied buckets stay as zero rows (bounded by the number of buckets) and are skipped on read.
+        for start in range(0, len(ids), FETCH_BY_IDS_CHUNK):
+            chunk = ids[start:start + FETCH_BY_IDS_CHUNK]
+            self.adjust_rollups_where(cursor, f"d.id IN ({', '.join('?' for _ in chunk)})", chunk, sign)
+
+    def adjust_rollups_where(self, cursor, where, params, sign):
+        for select in self.rollup_selects(where):
+            self.execute(cursor, f"""
+            INSERT INTO rollups (granularity, bucket, tag_id, count) {select.replace("COUNT(*)", f"{sign} * COUNT(*)")}
+            ON CONFLICT (granularity, bucket, tag_id) DO UPDATE SET count = rollups.count + excluded.count
+            """, params)
+
+    # ----------------Data version---------------------------------------------------------------------------
+    # meta.data_version counts writes and stamps each written row's change_seq; readers key their caches on
+    # published_version instead. Every write advances both, except staged bulk-import batches, which only
+    # take a change_seq: publish_changes() then moves published_version once for the whole import.
+    def meta_value(self, key):
+        with self.connection() as conn:
+            return self.execute(conn.cursor(), "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def data_version(self):
+        return self.meta_value("published_version")
+
+    def advance_meta(self, cursor, key, amount=1):
+        self.execute(cursor, "UPDATE meta SET value = value + ? WHERE key = ?", (amount, key))
+        return self.execute(cursor, "SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def bump_data_version(self, cursor, publish=True):
+        change_seq = self.advance_meta(cursor, "data_version")
+        if publish:
+            self.execute(cursor, "UPDATE meta SET value = ? WHERE key = 'published_version'", (change_seq,))
+        return change_seq
+
+    def migrate_published_version(self, cursor):
+        self.execute(cursor, """
+        INSERT INTO meta (key, value) SELECT 'published_version', value FROM meta WHERE key = 'data_version'
+        ON CONFLICT (key) DO NOTHING
+        """)
+
+    def publish_changes(self):
+        # Publish staged writes; never moves backwards past a write published meanwhile
+        self.write(self.execute, """
+        UPDATE meta SET value = (SELECT value FROM meta WHERE key = 'data_version')
+        WHERE key = 'published_version' AND value < (SELECT value FROM meta WHERE key = 'data_version')
+        """)
+
+    # ----------------Writes---------------------------------------------------------------------------------
+    def set_tags_many(self, cursor, entry_tags, replace=True):
+        entry_tags = [(entry_id, split_tags(tags)) for entry_id, tags in entry_tags]
+        if not entry_tags:
+            return
+        names = sorted({name for _, entry_names in entry_tags for name in entry_names})
+        if replace:
+            self.execute_many(cursor, "DELETE FROM discovery_tags WHERE discovery_id = ?",
+                              [(entry_id,) for entry_id, _ in entry_tags])
+        tag_ids = {name: tag_id for tag_id, name in self.execute(cursor, "SELECT id, name FROM tags").fetchall()}
+        # Only names not seen yet: an INSERT that hits the conflict still draws from the id sequence on
+        # PostgreSQL, and tag ids are bit positions in the snapshot, so they should stay dense
+        missing = [(name,) for name in names if name not in tag_ids]
+        if missing:
+            self.execute_many(cursor, "INSERT INTO tags (name) VALUES (?) ON CONFLICT (name) DO NOTHING", missing)
+            tag_ids = {name: tag_id for tag_id, name in self.execute(cursor, "SELECT id, name FROM tags").fetchall()}
+        self.insert_integers(cursor, "discovery_tags", ("discovery_id", "tag_id"),
+                             [(entry_id, tag_ids[name]) for entry_id, entry_names in entry_tags for name in entry_names],
+                             on_conflict="ON CONFLICT DO NOTHING")
+
+    def insert_entry(self, scientist_name, discovery_date, title, description, links, tags):
+        return self.insert_many([(scientist_name, discovery_date, title, description, links, tags)])[0]
+
+    def insert_many(self, rows, publish=True):
+        # publish=False stages the rows: caches keyed on data_version() only see them after publish_changes()
+        if not rows:
+            return []
+        with metrics.span("insert"):
+            return self.write(self.insert_rows, rows, None, publish)
+
+    def insert_rows(self, cursor, rows, stamps=None, publish=True):
+        # stamps: change_log stamps (uid, version, changed_at, origin) of rows replicated from another store
+        change_seq = self.bump_data_version(cursor, publish)
+        identities = [stamp[:2] for stamp in stamps] if stamps else [(uuid.uuid4().hex, 1) for _ in rows]
+        self.insert_values(cursor, "discoveries", ENTRY_FIELDS + ("year_value", "change_seq", "uid", "version"),
+                           [tuple(row) + (year_value, change_seq) + tuple(identity) for row, year_value, identity
+                            in zip(rows, year_values([row[1] for row in rows]), identities)])
+        # The version bump locks meta until commit, so this change_seq identifies exactly these rows
+        inserted = self.execute(cursor, """
+        SELECT id, tags, uid, version, title, scientist_name, year_value FROM discoveries WHERE change_seq = ?
+        ORDER BY id
+        """, (change_seq,)).fetchall()
+        self.set_tags_many(cursor, [row[:2] for row in inserted], replace=False)
+        # Set-based from here on: whole batches of 5000 rows are one statement per table, not one per row
+        self.index_search(cursor, change_seq)
+        self.adjust_rollups_where(cursor, "d.change_seq = ?", (change_seq,), 1)
+        self.index_duplicates(cursor, [(row[0],) + tuple(row[4:]) for row in inserted], replace=False)
+        if stamps:
+            self.log_changes(cursor, "insert", [(row[0], row[2], row[3]) for row in inserted], stamps)
+        else:
+            self.log_inserts(cursor, change_seq, len(inserted))
+        return [row[0] for row in inserted]
+
+    def update_entry(self, entry_id, scientist_name, discovery_date, title, description, links, tags,
+                     expected_version=None):
+        self.update_many([(entry_id, scientist_name, discovery_date, title, description, links, tags)],
+                         None if expected_version is None else [expected_version])
+
+    def update_many(self, rows, expected_versions=None):
+        # With expected_versions, either every row still has its expected version and all are written in
+        # one transaction (one data version bump), or ConflictError is raised and none are
+        if not rows:
+            return
+        with metrics.span("update"):
+            self.write(self.update_rows, rows, expected_versions)
+
+    def check_versions(self, cursor, ids, expected_versions):
+        current = {}
+        for start in range(0, len(ids), FETCH_BY_IDS_CHUNK):
+            chunk = ids[start:start + FETCH_BY_IDS_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            current.update(self.execute(cursor, f"""
+            SELECT id, version FROM discoveries WHERE id IN ({placeholders}){self.lock_rows}
+            """, chunk).fetchall())
+        conflicts = [(entry_id, expected, current.get(entry_id))
+                     for entry_id, expected in zip(ids, expected_versions) if current.get(entry_id) != expected]
+        if conflicts:
+            raise ConflictError(conflicts)
+
+    def update_rows(self, cursor, rows, expected_versions=None, stamps=None):
+        ids = [row[0] for row in rows]
+        if expected_versions is not None:
+            self.check_versions(cursor, ids, expected_versions)
+        change_seq = self.bump_data_version(cursor)
+        years = year_values([row[2] for row in rows])
+        self.adjust_rollups(cursor, ids, -1)
+        self.execute_many(cursor, """
+        UPDATE discoveries
+        SET scientist_name = ?,
+            discovery_date = ?,
+            title = ?,
+            description = ?,
+            links = ?,
+            tags = ?,
+            year_value = ?,
+            change_seq = ?,
+            version = COALESCE(?, version + 1)
+        WHERE id = ?
+        """, [tuple(row[1:]) + (year_value, change_seq, version, row[0]) for row, year_value, version
+              in zip(rows, years, [stamp[1] for stamp in stamps] if stamps else [None] * len(rows))])
+        self.set_tags_many(cursor, [(row[0], row[6]) for row in rows])
+        self.adjust_rollups(cursor, ids, 1)
+        self.index_duplicates(cursor, [(row[0], row[3], row[1], year) for row, year in zip(rows, years)])
+        self.log_changes(cursor, "update", self.entry_versions(cursor, ids), stamps)
+
+    def entry_versions(self, cursor, ids):
+        entries = []
+        for start in range(0, len(ids), FETCH_BY_IDS_CHUNK):
+            chunk = ids[start:start + FETCH_BY_IDS_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            entries += self.execute(cursor, f"SELECT id, uid, version FROM discoveries WHERE id IN ({placeholders})",
+                                    chunk).fetchall()
+        return entries
+
+    def delete_entry(self, entry_id, expected_version=None):
+        self.delete_many([entry_id], None if expected_version is None else [expected_version])
+
+    def delete_many(self, ids, expected_versions=None):
+        # Compare-and-swap like update_many: all rows still at their expected versions are deleted, or none
+        if not ids:
+            return
+        with metrics.span("delete"):
+            self.write(self.delete_rows, list(ids), expected_versions)
+
+    def delete_rows(self, cursor, ids, expected_versions=None, stamps=None):
+        # stamps: (uid, version, changed_at, origin) of deletes replicated from another store, which may
+        # include entries this store never had
+        if expected_versions is not None:
+            self.check_versions(cursor, ids, expected_versions)
+        change_seq = self.bump_data_version(cursor)
+        entries = self.entry_versions(cursor, ids)
+        if stamps:
+            present = {uid for _, uid, _ in entries}
+            entries += [(None, stamp[0], None) for stamp in stamps if stamp[0] not in present]
+        self.record_deletes(cursor, change_seq, entries, stamps)
+        self.adjust_rollups(cursor, ids, -1)
+        # Tags, duplicate keys and the change log row go with the entry (ON DELETE CASCADE); the search
+        # index follows through its trigger or generated column
+        self.execute_many(cursor, "DELETE FROM discoveries WHERE id = ?", [(entry_id,) for entry_id in ids])
+
+    # ----------------Duplicate detection (keys from dedup.py)---------------------------------------------------
+    # dedup_keys holds each entry's exact and MinHash band keys, rewritten with every insert and update,
+    # so finding likely duplicates is a primary-key lookup of a few dozen keys whatever the table size.
+    def index_duplicates(self, cursor, entries, replace=True):
+        # entries: (id, title, scientist_name, year_value)
+        if not entries:
+            return
+        if replace:
+            self.execute_many(cursor, "DELETE FROM dedup_keys WHERE entry_id = ?", [(entry[0],) for entry in entries])
+        texts, sigs = entry_signatures([entry[1:] for entry in entries])
+        keys = stored_keys(texts, sigs, [entry[3] for entry in entries])
+        self.insert_integers(cursor, "dedup_keys", ("key", "entry_id"),
+                             [(key, entry[0]) for entry, entry_keys in zip(entries, keys) for key in entry_keys],
+                             on_conflict="ON CONFLICT DO NOTHING")
+
+    def find_duplicates(self, rows):
+        # rows: ENTRY_FIELDS tuples -> {row index: [(entry_id, score), ...]} for the existing entries each
+        # row probably duplicates, best first; rows without a likely duplicate are left out
+        if not rows:
+            return {}
+        years = year_values([row[1] for row in rows])
+        texts, sigs = entry_signatures([(row[2], row[0], year) for row, year in zip(rows, years)])
+        probes = probe_keys(texts, sigs, years)
+        keys = sorted({key for probe in probes for key in probe})
+        holders, known = {}, {}
+        with metrics.span("find_duplicates"):
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                for start in range(0, len(keys), FETCH_BY_IDS_CHUNK):
+                    chunk = keys[start:start + FETCH_BY_IDS_CHUNK]
+                    placeholders = ", ".join("?" for _ in chunk)
+                    for key, entry_id, title, scientist_name, year in self.execute(cursor, f"""
+                    SELECT k.key, d.id, d.title, d.scientist_name, d.year_value
+                    FROM dedup_keys k JOIN discoveries d ON d.id = k.entry_id
+                    WHERE k.key IN ({placeholders})
+                    """, chunk).fetchall():
+                        holders.setdefault(key, set()).add(entry_id)
+                        known[entry_id] = (title, scientist_name, year)
+        found = {}
+        for index, (text, year, probe) in enumerate(zip(texts, years, probes)):
+            candidates = [(entry_id, entry_text(*known[entry_id][:2]), known[entry_id][2])
+                          for entry_id in sorted(candidate_ids(probe, holders))]
+            matches = best_matches(text, year, candidates)
+            if matches:
+                found[index] = matches
+        return found
+
+    def dedup_key_groups(self):
+        # Entry ids sharing each key that more than one entry holds: the only pairs the report compares
+        groups = {}
+        for key, entry_id in self.scan("""
+        SELECT k.key, k.entry_id FROM dedup_keys k
+        JOIN (SELECT key FROM dedup_keys GROUP BY key HAVING COUNT(*) > 1) shared ON shared.key = k.key
+        ORDER BY k.key
+        """):
+            groups.setdefault(key, []).append(entry_id)
+        return list(groups.values())
+
+    # ----------------Change log (replication between stores, see sync.py)------------------------------------
+    # One row per entry holding its latest change: a per-store seq that only grows (sync checkpoints),
+    # and the stamp (version, changed_at, origin) that decides conflicts. Local writes stamp this store's
+    # origin; replicated writes keep the stamp they arrived with, so a change is never shipped back to the
+    # store it came from and every store picks the same winner for concurrent edits.
+    # Deletes leave a tombstone in deleted_entries, taking a seq from the same counter. A uid's latest
+    # tombstone is its current state until a newer insert or update brings it back; tombstones are kept
+    # even then, so readers can drop the old local id (deleted_since).
+    def store_id(self, cursor=None):
+        if cursor is None:
+            return self.meta_value("store_id")
+        return self.execute(cursor, "SELECT value FROM meta WHERE key = 'store_id'").fetchone()[0]
+
+    def log_changes(self, cursor, op, entries, stamps=None):
+        # entries: (id, uid, version); stamps: (uid, version, changed_at, origin) of replicated rows
+        if not entries:
+            return
+        last_seq = self.advance_meta(cursor, "log_seq", len(entries))
+        if stamps:
+            stamps = {stamp[0]: stamp for stamp in stamps}
+            times = [stamps[uid][2:] for _, uid, _ in entries]
+        else:
+            local = (int(time.time() * 1000), self.store_id(cursor))
+            times = [local] * len(entries)
+        self.insert_values(cursor, "change_log", ("uid", "entry_id", "op", "version", "changed_at", "origin", "seq"),
+                           [(uid, entry_id, op, version) + tuple(stamp) + (seq,)
+                            for (entry_id, uid, version), stamp, seq
+                            in zip(entries, times, range(last_seq - len(entries) + 1, last_seq + 1))],
+                           on_conflict="""
+                           ON CONFLICT (uid) DO UPDATE SET entry_id = excluded.entry_id, op = excluded.op,
+                               version = excluded.version, changed_at = excluded.changed_at,
+                               origin = excluded.origin, seq = excluded.seq
+                           """)
+
+    def record_deletes(self, cursor, change_seq, entries, stamps=None):
+        # entries: (id or None, uid, version) about to be deleted. A local delete is stamped one version past
+        # the row it removes, so it beats edits made from the same version elsewhere only by its time.
+        if not entries:
+            return
+        last_seq = self.advance_meta(cursor, "log_seq", len(entries))
+        if stamps:
+            stamps = {stamp[0]: stamp for stamp in stamps}
+            times = [stamps[uid][1:] for _, uid, _ in entries]
+        else:
+            now, origin = int(time.time() * 1000), self.store_id(cursor)
+            times = [(version + 1, now, origin) for _, _, version in entries]
+        self.insert_values(cursor, "deleted_entries",
+                           ("seq", "uid", "entry_id", "version", "changed_at", "origin", "change_seq"),
+                           [(seq, uid, entry_id) + tuple(stamp) + (change_seq,)
+                            for (entry_id, uid, _), stamp, seq
+                            in zip(entries, times, range(last_seq - len(entries) + 1, last_seq + 1))])
+
+    def log_inserts(self, cursor, change_seq, count):
+        # log_changes for a batch of local inserts (all stamped change_seq) as one INSERT ... SELECT;
+        # seqs are handed out in id order, as log_changes does
+        last_seq = self.advance_meta(cursor, "log_seq", count)
+        self.execute(cursor, """
+        INSERT INTO change_log (uid, entry_id, op, version, changed_at, origin, seq)
+        SELECT uid, id, 'insert', version, ?, ?, ? + ROW_NUMBER() OVER (ORDER BY id) FROM discoveries
+        WHERE change_seq = ?
+        """, (int(time.time() * 1000), self.store_id(cursor), last_seq - count, change_seq))
+
+    def changes_since(self, since, exclude_origin=None, limit=500):
+        # CHANGE_COLUMNS rows in seq order, skipping changes that came from exclude_origin: live entries
+        # from change_log, then deleted ones whose latest tombstone has not been superseded
+        clauses, params = ["c.seq > ?"], [since]
+        if exclude_origin is not None:
+            clauses.append("c.origin <> ?")
+            params.append(exclude_origin)
+        where = " AND ".join(clauses)
+        with self.connection() as conn:
+            return self.fetch_all(self.execute(conn.cursor(), f"""
+            SELECT {", ".join("c." + column for column in CHANGE_COLUMNS[:6])},
+                   {", ".join("d." + field for field in ENTRY_FIELDS)}
+            FROM change_log c JOIN discoveries d ON d.id = c.entry_id
+            WHERE {where}
+            UNION ALL
+            SELECT c.seq, c.uid, 'delete', c.version, c.changed_at, c.origin, {", ".join("NULL" for _ in ENTRY_FIELDS)}
+            FROM deleted_entries c
+            WHERE {where}
+              AND NOT EXISTS (SELECT 1 FROM discoveries d WHERE d.uid = c.uid)
+              AND NOT EXISTS (SELECT 1 FROM deleted_entries n WHERE n.uid = c.uid AND n.seq > c.seq)
+            ORDER BY 1 LIMIT ?
+            """, params + params + [limit]))
+
+    def sync_checkpoint(self, source_id):
+        # Last seq of source_id's change log applied here; 0 before the first sync
+        with self.connection() as conn:
+            row = self.execute(conn.cursor(), "SELECT value FROM meta WHERE key = ?",
+                               (f"sync_from_{source_id}",)).fetchone()
+        return row[0] if row else 0
+
+    def apply_changes(self, source_id, changes):
+        # Apply one batch of another store's CHANGE_COLUMNS rows and advance its checkpoint in the same
+        # transaction, so an interrupted sync resumes after the last batch that committed.
+        # Returns (inserted, updated, deleted, skipped); a change loses to the local row or tombstone when its
+        # stamp is not newer.
+        if not changes:
+            return 0, 0, 0, 0
+        with metrics.span("apply_changes"):
+            return self.write(self.apply_change_rows, source_id, changes)
+
+    def apply_change_rows(self, cursor, source_id, changes):
+        uids = [change[1] for change in changes]
+        local, deleted = {}, {}
+        for start in range(0, len(uids), FETCH_BY_IDS_CHUNK):
+            chunk = uids[start:start + FETCH_BY_IDS_CHUNK]
+            placeholders = ", ".join("?" for _ in chunk)
+            local.update((row[0], row[1:]) for row in self.execute(cursor, f"""
+            SELECT c.uid, c.entry_id, c.version, c.changed_at, c.origin FROM change_log c
+            WHERE c.uid IN ({placeholders}){self.lock_rows}
+            """, chunk).fetchall())
+            # Latest tombstone last, so it is the one kept
+            for uid, *stamp in self.execute(cursor, f"""
+            SELECT uid, version, changed_at, origin FROM deleted_entries WHERE uid IN ({placeholders}) ORDER BY seq
+            """, chunk).fetchall():
+                if uid not in local:
+                    deleted[uid] = tuple(stamp)
+        inserts, insert_stamps, updates, update_stamps, deletes, delete_stamps = [], [], [], [], [], []
+        for change in changes:
+            stamp, fields = change[1:2] + change[3:6], tuple(change[6:])
+            current = local.get(change[1])
+            if current is None and tuple(stamp[1:]) <= deleted.get(change[1], ()):
+                continue
+            if change[2] == "delete":
+                if current is not None and tuple(stamp[1:]) <= tuple(current[1:]):
+                    continue
+                # With no local row, the tombstone alone keeps older copies from coming back
+                if current is not None:
+                    deletes.append(current[0])
+                delete_stamps.append(stamp)
+            elif current is None:
+                inserts.append(fields)
+                insert_stamps.append(stamp)
+            elif tuple(stamp[1:]) > tuple(current[1:]):
+                updates.append((current[0],) + fields)
+                update_stamps.append(stamp)
+        if inserts:
+            self.insert_rows(cursor, inserts, insert_stamps)
+        if updates:
+            self.update_rows(cursor, updates, stamps=update_stamps)
+        if delete_stamps:
+            self.delete_rows(cursor, deletes, stamps=delete_stamps)
+        self.execute(cursor, """
+        INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """, (f"sync_from_{source_id}", changes[-1][0]))
+        applied = len(inserts), len(updates), len(delete_stamps)
+        return (*applied, len(changes) - sum(applied))
+
+    # ----------------Reads----------------------------------------------------------------------------------
+    def fetch_tags(self):
+        with self.connection() as conn:
+            return self.execute(conn.cursor(), "SELECT id, name FROM tags ORDER BY id").fetchall()
+
+    def fetch_changed(self, since, columns=ENTRY_COLUMNS):
+        # Generator: consume it fully before other storage calls on this thread need the connection back
+        yield from self.scan(f"SELECT {column_list(columns)} FROM discoveries WHERE change_seq > ?", (since,))
+
+    def deleted_since(self, since):
+        # Ids of local entries deleted after data version `since`, the counterpart of fetch_changed
+        with self.connection() as conn:
+            return [row[0] for row in self.execute(conn.cursor(), """
+            SELECT entry_id FROM deleted_entries WHERE change_seq > ? AND entry_id IS NOT NULL
+            """, (since,)).fetchall()]
+
+    def iter_entries(self, columns=ENTRY_COLUMNS, batch_size=2000):
+        # Keyset scan on the primary key: constant memory, one short transaction per batch
+        if "id" not in columns:
+            columns = ("id",) + tuple(columns)
+        id_index = list(columns).index("id")
+        last_id = None
+        while True:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                if last_id is None:
+                    self.execute(cursor, f"SELECT {column_list(columns)} FROM discoveries ORDER BY id LIMIT ?",
+                                 (batch_size,))
+                else:
+                    self.execute(cursor, f"""
+                    SELECT {column_list(columns)} FROM discoveries WHERE id > ? ORDER BY id LIMIT ?
+                    """, (last_id, batch_size))
+                rows = self.fetch_all(cursor)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last_id = rows[-1][id_index]
+
+    def fetch_by_ids(self, ids, columns=ENTRY_COLUMNS):
+        if "id" not in columns:
+            columns = ("id",) + tuple(columns)
+        found = {}
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            ids = list(ids)
+            for start in range(0, len(ids), FETCH_BY_IDS_CHUNK):
+                chunk = ids[start:start + FETCH_BY_IDS_CHUNK]
+                placeholders = ", ".join("?" for _ in chunk)
+                self.execute(cursor, f"SELECT {column_list(columns)} FROM discoveries WHERE id IN ({placeholders})",
+                             chunk)
+                id_index = columns.index("id")
+                for row in self.fetch_all(cursor):
+                    found[row[id_index]] = row
+        return [found[entry_id] for entry_id in ids if entry_id in found]
+
+    def filter_clauses(self, start_year=None, end_year=None, tag_ids=None, match_all=False, text=None,
+                       table=""):
+        clauses, params = [], []
+        if start_year is not None:
+            clauses.append(f"{table}year_value >= ?")
+            params.append(start_year)
+        if end_year is not None:
+            clauses.append(f"{table}year_value <= ?")
+            params.append(end_year)
+        if tag_ids is not None:
+            placeholders = ", ".join("?" for _ in tag_ids)
+            if match_all:
+                clauses.append(f"""{table}id IN (SELECT discovery_id FROM discovery_tags WHERE tag_id IN ({placeholders})
+                                                 GROUP BY discovery_id HAVING COUNT(*) = ?)""")
+                params.extend(list(tag_ids) + [len(tag_ids)])
+            else:
+                clauses.append(f"{table}id IN (SELECT discovery_id FROM discovery_tags WHERE tag_id IN ({placeholders}))")
+                params.extend(tag_ids)
+        query = search_query_terms(text)
+        if query:
+            clause, param = self.text_clause(query, table)
+            clauses.append(clause)
+            params.append(param)
+        return clauses, params
+
+    def fetch_range(self, start_year=None, end_year=None, tag_ids=None, match_all=False, descending=False,
+                    after=None, limit=None, columns=("id",), text=None):
+        if tag_ids is not None and not tag_ids:
+            return []
+        clauses, params = self.filter_clauses(start_year, end_year, tag_ids, match_all, text)
+        clauses.insert(0, "year_value IS NOT NULL")
+        if after is not None:
+            clauses.append(f"(year_value, id) {'<' if descending else '>'} (?, ?)")
+            params.extend(after)
+        direction = "DESC" if descending else "ASC"
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            self.execute(cursor, f"""
+            SELECT {column_list(columns)} FROM discoveries
+            WHERE {" AND ".join(clauses)}
+            ORDER BY year_value {direction}, id {direction}
+            LIMIT ?
+            """, params + [self.no_limit if limit is None else limit])
+            return self.fetch_all(cursor)
+
+    # ----------------Full-text search-----------------------------------------------------------------------
+    def search(self, text, limit=20, start_year=None, end_year=None, tag_ids=None, match_all=False):
+        terms = search_query_terms(text)
+        if not terms or (tag_ids is not None and not tag_ids):
+            return []
+        clauses, params = self.filter_clauses(start_year, end_year, tag_ids, match_all, table="d.")
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            self.execute(cursor, self.ranked_search_sql(" AND ".join(clauses) or "1 = 1"),
+                         [self.text_query(terms)] + params + [limit])
+            return self.fetch_all(cursor)
+
+    def pick_entries(self, text=None, limit=50):
+        # (id, title, discovery_date) for the edit picker, newest first; text matches word prefixes like search()
+        clauses, params = self.filter_clauses(text=text)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self.connection() as conn:
+            return self.fetch_all(self.execute(conn.cursor(), f"""
+            SELECT id, title, discovery_date FROM discoveries {where} ORDER BY id DESC LIMIT ?
+            """, params + [limit]))
+
+    def year_span(self):
+        with self.connection() as conn:
+            return self.execute(conn.cursor(), """
+            SELECT MIN(year_value), MAX(year_value) FROM discoveries WHERE year_value IS NOT NULL
+            """).fetchone()
+
+    def tag_counts(self):
+        with self.connection() as conn:
+            return self.execute(conn.cursor(), """
+            SELECT t.name, COUNT(dt.discovery_id) FROM tags t
+            LEFT JOIN discovery_tags dt ON dt.tag_id = t.id
+            GROUP BY t.id, t.name ORDER BY t.id
+            """).fetchall()
+
+    def rollup_counts(self, granularity, start_year=None, end_year=None):
+        # (bucket, tag_id, count) for buckets overlapping [start_year, end_year]: O(buckets), not O(entries)
+        clauses, params = ["granularity = ?", "count > 0"], [granularity]
+        if start_year is not None:
+            clauses.append("bucket > ?")
+            params.append(start_year - granularity)
+        if end_year is not None:
+            clauses.append("bucket <= ?")
+            params.append(end_year)
+        with self.connection() as conn:
+            return self.fetch_all(self.execute(conn.cursor(), f"""
+            SELECT bucket, tag_id, count FROM rollups WHERE {" AND ".join(clauses)} ORDER BY bucket, tag_id
+            """, params))
+
+    def tag_years(self):
+        # (tag_id, discovery_id, year_value) for every tagged entry that is on the timeline, streamed
+        yield from self.scan("""
+        SELECT dt.tag_id, dt.discovery_id, d.year_value FROM discovery_tags dt
+        JOIN discoveries d ON d.id = dt.discovery_id
+        WHERE d.year_value IS NOT NULL
+        """)
+
+    def entry_count(self):
+        with self.connection() as conn:
+            return self.execute(conn.cursor(), "SELECT COUNT(*) FROM discoveries").fetchone()[0]
+
+    def invalid_dates(self):
+        with self.connection() as conn:
+            rows = self.execute(conn.cursor(), "SELECT discovery_date FROM discoveries WHERE year_value IS NULL")
+            return [row[0] for row in rows.fetchall()]
+
+    # ----------------Link health (written by linkcheck.py, read when rendering)------------------------------
+    # link_version only moves when a link turns dead or alive again, so rendered timelines are re-cached
+    # then and not after every check.
+    def link_version(self):
+        return self.meta_value("link_version")
+
+    def add_link_urls(self, urls, scanned_version):
+        def work(cursor):
+            self.insert_values(cursor, "link_status", ("url",), [(url,) for url in urls],
+                               on_conflict="ON CONFLICT (url) DO NOTHING")
+            self.execute(cursor, "UPDATE meta SET value = ? WHERE key = 'links_scanned_version'", (scanned_version,))
+        self.write(work)
+
+    def due_links(self, now, limit):
+        # (url, failures) for links never checked or past their next check time, most overdue first
+        with self.connection() as conn:
+            return self.fetch_all(self.execute(conn.cursor(), """
+            SELECT url, failures FROM link_status WHERE next_check_at <= ? ORDER BY next_check_at LIMIT ?
+            """, (now, limit)))
+
+    def record_link_checks(self, results, state_changed):
+        # results: (url, status, final_url, error, failures, checked_at, next_check_at)
+        def work(cursor):
+            self.execute_many(cursor, """
+            UPDATE link_status SET status = ?, final_url = ?, error = ?, failures = ?, checked_at = ?, next_check_at = ?
+            WHERE url = ?
+            """, [tuple(result[1:]) + (result[0],) for result in results])
+            if state_changed:
+                self.execute(cursor, "UPDATE meta SET value = value + 1 WHERE key = 'link_version'")
+        self.write(work)
+
+    def dead_links(self, dead_after=LINK_DEAD_AFTER):
+        with self.connection() as conn:
+            return [row[0] for row in self.fetch_all(self.execute(conn.cursor(), """
+            SELECT url FROM link_status WHERE failures >= ?
+            """, (dead_after,)))]
+
+    def link_summary(self, dead_after=LINK_DEAD_AFTER):
+        # (known, checked, dead) link counts for the sidebar
+        with self.connection() as conn:
+            return self.execute(conn.cursor(), """
+            SELECT COUNT(*), COUNT(checked_at), COALESCE(SUM(CASE WHEN failures >= ? THEN 1 ELSE 0 END), 0)
+            FROM link_status
+            """, (dead_after,)).fetchone()
+
+    def scan_cursor(self, conn):
+        return conn.cursor()
+
+# ----------------SQLite backend---------------------------------------------------------------------------
+# Readers check out pooled WAL connections, so viewers never wait on each other or on the writer.
+# All writes go through one writer thread: whatever is queued when it wakes up is committed together
+# (one savepoint per job, one commit per batch). stats() reports how often callers had to wait.
+class SQLiteStorage(Storage):
+    id_column = "id INTEGER PRIMARY KEY AUTOINCREMENT"
+    no_limit = -1
+    max_readers = 8
+    write_batch_size = 64
+    busy_timeout_ms = 5000
+    mmap_size = 256 * 1024 * 1024
+    cache_size_kib = 16000
+
+    def __init__(self, path="timeline.db"):
+        self.path = path
+        self.readers = queue.LifoQueue()
+        self.reader_slots = threading.BoundedSemaphore(self.max_readers)
+        self.local = threading.local()
+        self.writes = queue.Queue()
+        self.writer = None
+        self.writer_cursor = None
+        self.writer_lock = threading.Lock()
+        self.metrics_lock = threading.Lock()
+        self.metrics = dict.fromkeys([
+            "read_connections", "reads", "reader_waits", "reader_wait_seconds",
+            "write_jobs", "write_batches", "max_write_batch", "write_failures", "busy_errors",
+            "write_queue_seconds", "max_write_queue_seconds", "commit_seconds"], 0)
+        # journal_mode is persistent, so switching once here covers every later connection
+        conn = self.connect()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.close()
+
+    def connect(self, read_only=False):
+        conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        conn.execute(f"PRAGMA busy_timeout = {self.busy_timeout_ms}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute(f"PRAGMA cache_size = -{self.cache_size_kib}")
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_size}")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def record(self, **amounts):
+        with self.metrics_lock:
+            for name, amount in amounts.items():
+                if name.startswith("max_"):
+                    self.metrics[name] = max(self.metrics[name], amount)
+                else:
+                    self.metrics[name] += amount
+
+    def stats(self):
+        with self.metrics_lock:
+            stats = dict(self.metrics)
+        stats["write_queue_depth"] = self.writes.qsize()
+        stats["idle_read_connections"] = self.readers.qsize()
+        return stats
+
+    # ----------------Reads: pooled query_only connections, one read transaction per block--------------------
+    def checkout_reader(self):
+        if not self.reader_slots.acquire(blocking=False):
+            started = time.perf_counter()
+            self.reader_slots.acquire()
+            self.record(reader_waits=1, reader_wait_seconds=time.perf_counter() - started)
+        try:
+            return self.readers.get_nowait()
+        except queue.Empty:
+            self.record(read_connections=1)
+            return self.connect(read_only=True)
+
+    @contextmanager
+    def connection(self):
+        # Re-entrant per thread: a nested block shares the outer read transaction
+        conn = getattr(self.local, "conn", None)
+        if conn is not None:
+            yield conn
+            return
+        with metrics.span("connection"):
+            conn = self.checkout_reader()
+        self.local.conn = conn
+        try:
+            conn.execute("BEGIN")
+            yield conn
+        finally:
+            self.local.conn = None
+            conn.rollback()
+            self.readers.put(conn)
+            self.reader_slots.release()
+            self.record(reads=1)
+
+    # ----------------Writes: a single writer thread with group commit-----------------------------------------
+    def write(self, work, *args):
+        if threading.current_thread() is self.writer:
+            return work(self.writer_cursor, *args)
+        with self.writer_lock:
+            if self.writer is None or not self.writer.is_alive():
+                self.writer = threading.Thread(target=self.writer_loop, name="sqlite-writer", daemon=True)
+                self.writer.start()
+        future = Future()
+        self.writes.put((future, work, args, time.perf_counter()))
+        return future.result()
+
+    def writer_loop(self):
+        conn = self.connect()
+        self.writer_cursor = conn.cursor()
+        while True:
+            batch = [self.writes.get()]
+            while len(batch) < self.write_batch_size:
+                try:
+                    batch.append(self.writes.get_nowait())
+                except queue.Empty:
+                    break
+            self.commit_batch(conn, [job for job in batch if job is not None])
+            if None in batch:
+                conn.close()
+                return
+
+    def commit_batch(self, conn, batch):
+        if not batch:
+            return
+        cursor = self.writer_cursor
+        started = time.perf_counter()
+        waited = [started - queued_at for _, _, _, queued_at in batch]
+        results = []
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            for future, work, args, _ in batch:
+                cursor.execute("SAVEPOINT job")
+                try:
+                    results.append((future, work(cursor, *args)))
+                except Exception as e:
+                    cursor.execute("ROLLBACK TO job")
+                    future.set_exception(e)
+                    self.record(write_failures=1)
+                cursor.execute("RELEASE job")
+            cursor.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            if isinstance(e, sqlite3.OperationalError) and "locked" in str(e):
+                self.record(busy_errors=1)
+            for future, _, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self.record(write_jobs=len(batch), write_batches=1, max_write_batch=len(batch),
+                        write_queue_seconds=sum(waited), max_write_queue_seconds=max(waited),
+                        commit_seconds=time.perf_counter() - started)
+        for future, result in results:
+            future.set_result(result)
+
+    def close(self):
+        if self.writer is not None and self.writer.is_alive():
+            self.writes.put(None)
+            self.writer.join()
+        while not self.readers.empty():
+            self.readers.get_nowait().close()
+
+    # BEGIN IMMEDIATE already serializes migrating processes, so lock_schema has nothing to add
+    def schema_version(self, cursor):
+        return self.execute(cursor, "PRAGMA user_version").fetchone()[0]
+
+    def record_migration(self, cursor, version, description):
+        # PRAGMA takes no parameters; version is an int from MIGRATIONS
+        self.execute(cursor, f"PRAGMA user_version = {int(version)}")
+
+    def add_column(self, cursor, table, column, ddl):
+        columns = [row[1] for row in self.execute(cursor, f"PRAGMA table_info({table})").fetchall()]
+        if column not in columns:
+            self.execute(cursor, f"ALTER TABLE {table} ADD COLUMN {column} {ddl}")
+
+    # External-content FTS5 index over discoveries: updates and deletes are kept in sync by triggers, inserts
+    # by index_search (a per-row insert trigger was most of the cost of a bulk import)
+    def migrate_search(self, cursor):
+        exists = self.execute(cursor, """
+        SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'discoveries_fts'
+        """).fetchone()
+        self.execute(cursor, """
+        CREATE VIRTUAL TABLE IF NOT EXISTS discoveries_fts USING fts5(
+            title, description, scientist_name,
+            content = 'discoveries', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+        )
+        """)
+        self.execute(cursor, """
+        CREATE TRIGGER IF NOT EXISTS discoveries_fts_delete AFTER DELETE ON discoveries BEGIN
+            INSERT INTO discoveries_fts (discoveries_fts, rowid, title, description, scientist_name)
+            VALUES ('delete', old.id, old.title, old.description, old.scientist_name);
+        END
+        """)
+        self.execute(cursor, """
+        CREATE TRIGGER IF NOT EXISTS discoveries_fts_update
+        AFTER UPDATE OF title, description, scientist_name ON discoveries BEGIN
+            INSERT INTO discoveries_fts (discoveries_fts, rowid, title, description, scientist_name)
+            VALUES ('delete', old.id, old.title, old.description, old.scientist_name);
+            INSERT INTO discoveries_fts (rowid, title, description, scientist_name)
+            VALUES (new.id, new.title, new.description, new.scientist_name);
+        END
+        """)
+        if not exists:
+            self.execute(cursor, "INSERT INTO discoveries_fts (discoveries_fts) VALUES ('rebuild')")
+
+    def migrate_search_inserts(self, cursor):
+        self.execute(cursor, "DROP TRIGGER IF EXISTS discoveries_fts_insert")
+
+    def index_search(self, cursor, change_seq):
+        self.execute(cursor, """
+        INSERT INTO discoveries_fts (rowid, title, description, scientist_name)
+        SELECT id, title, description, scientist_name FROM discoveries WHERE change_seq = ?
+        """, (change_seq,))
+
+    def text_query(self, terms):
+        return " ".join(f'"{term}"*' for term in terms)
+
+    def text_clause(self, terms, table=""):
+        return f"{table}id IN (SELECT rowid FROM discoveries_fts WHERE discoveries_fts MATCH ?)", self.text_query(terms)
+
+    def ranked_search_sql(self, where):
+        # bm25 weights follow the FTS column order: title, description, scientist_name
+        return f"""
+        SELECT d.id, d.title, d.discovery_date, bm25(discoveries_fts, 10.0, 1.0, 5.0) AS rank
+        FROM discoveries_fts JOIN discoveries d ON d.id = discoveries_fts.rowid
+        WHERE discoveries_fts MATCH ? AND {where}
+        ORDER BY rank
+        LIMIT ?
+        """
+
+# ----------------PostgreSQL backend-----------------------------------------------------------------------
+# Process-wide bounded pool; a semaphore makes callers wait for a free slot instead of failing.
+# Connections idle longer than HEALTH_CHECK_AFTER_SECONDS are pinged and replaced if broken.
+class PostgresStorage(Storage):
+    id_column = "id SERIAL PRIMARY KEY"
+    no_limit = None
+    # Held until commit, so a concurrent editor's update waits and then sees the new version
+    lock_rows = " FOR UPDATE"
+    schema_lock_key = 0x74696D656C696E65  # "timeline"
+    min_connections = 1
+    max_connections = 8
+    health_check_after_seconds = 30
+
+    def __init__(self, **connect_params):
+        import psycopg2
+        from psycopg2 import extras, pool
+
+        self.psycopg2 = psycopg2
+        self.extras = extras
+        # Entries contain non-ASCII text (en dashes in date ranges, accented names) whatever the server default
+        connect_params.setdefault("client_encoding", "UTF8")
+        try:
+            self.pool = pool.ThreadedConnectionPool(self.min_connections, self.max_connections, **connect_params)
+        except psycopg2.Error as e:
+            raise StorageError(f"Database connection failed: {e}") from e
+        self.slots = threading.BoundedSemaphore(self.max_connections)
+        self.last_used = {}
+
+    def sql(self, query):
+        return query.replace("?", "%s")
+
+    def execute_many(self, cursor, query, rows):
+        metrics.count("timeline_queries_total")
+        self.extras.execute_batch(cursor, self.sql(query), rows, page_size=500)
+
+    def insert_values(self, cursor, table, columns, rows, on_conflict=""):
+        # One multi-row INSERT per page instead of one statement per row
+        metrics.count("timeline_queries_total")
+        self.extras.execute_values(cursor, f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s {on_conflict}",
+                                   rows, page_size=1000)
+
+    def insert_integers(self, cursor, table, columns, rows, on_conflict=""):
+        # One statement per batch: each column travels as a single bigint array
+        if not rows:
+            return
+        arrays = [list(column) for column in zip(*sorted(rows))]
+        self.execute(cursor, f"""
+        INSERT INTO {table} ({', '.join(columns)}) SELECT * FROM unnest({', '.join('?::bigint[]' for _ in columns)})
+        {on_conflict}
+        """, arrays)
+
+    def schema_version(self, cursor):
+        # pg_tables, not to_regclass: the catalog cache may not have seen a table another process just created
+        if self.execute(cursor, """
+        SELECT 1 FROM pg_tables WHERE schemaname = current_schema() AND tablename = 'schema_migrations'
+        """).fetchone() is None:
+            return 0
+        return self.execute(cursor, "SELECT COALESCE(MAX(version), 0) FROM schema_migrations").fetchone()[0]
+
+    def lock_schema(self, cursor):
+        # Transaction-scoped advisory lock: migrating processes take turns, one step at a time
+        self.execute(cursor, "SELECT pg_advisory_xact_lock(?)", (self.schema_lock_key,))
+
+    def record_migration(self, cursor, version, description):
+        self.execute(cursor, """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """)
+        self.execute(cursor, "INSERT INTO schema_migrations (version, description) VALUES (?, ?)",
+                     (version, description))
+
+    def add_column(self, cursor, table, column, ddl):
+        self.execute(cursor, f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {column} {ddl}")
+
+    # Generated, weighted tsvector column with a GIN index; PostgreSQL keeps it in sync on every write
+    def migrate_search(self, cursor):
+        self.add_column(cursor, "discoveries", "search_vector", """tsvector GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(scientist_name, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'C')
+        ) STORED""")
+        self.execute(cursor, """
+        CREATE INDEX IF NOT EXISTS idx_discoveries_search ON discoveries USING GIN (search_vector)
+        """)
+
+    def text_query(self, terms):
+        return " & ".join(f"{term}:*" for term in terms)
+
+    def text_clause(self, terms, table=""):
+        return f"{table}search_vector @@ to_tsquery('simple', ?)", self.text_query(terms)
+
+    def ranked_search_sql(self, where):
+        return f"""
+        SELECT d.id, d.title, d.discovery_date, ts_rank(d.search_vector, query) AS rank
+        FROM discoveries d, to_tsquery('simple', ?) query
+        WHERE d.search_vector @@ query AND {where}
+        ORDER BY rank DESC, d.id
+        LIMIT ?
+        """
+
+    def advance_meta(self, cursor, key, amount=1):
+        return self.execute(cursor, "UPDATE meta SET value = value + ? WHERE key = ? RETURNING value",
+                            (amount, key)).fetchone()[0]
+
+    def scan_cursor(self, conn):
+        # Named (server-side) cursor: scan() pulls scan_batch_size rows per round trip, never the whole result
+        return conn.cursor(name=f"scan_{threading.get_ident()}_{time.monotonic_ns()}")
+
+    def connection_is_healthy(self, conn):
+        if conn.closed:
+            return False
+        if time.monotonic() - self.last_used.get(id(conn), 0) < self.health_check_after_seconds:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except self.psycopg2.Error:
+            return False
+
+    def checkout(self):
+        self.slots.acquire()
+        # Try each pooled connection at most once so stale sockets are replaced by fresh connects
+        for _ in range(self.max_connections + 1):
+            try:
+                conn = self.pool.getconn()
+            except self.psycopg2.Error as e:
+                self.slots.release()
+                raise StorageError(f"Database connection failed: {e}") from e
+            if self.connection_is_healthy(conn):
+                return conn
+            self.discard(conn)
+        self.slots.release()
+        raise StorageError("Database connection failed: no healthy connection available")
+
+    def release(self, conn):
+        extensions = self.psycopg2.extensions
+        broken = conn.closed or conn.get_transaction_status() == extensions.TRANSACTION_STATUS_UNKNOWN
+        if not broken and conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+        if broken:
+            self.discard(conn)
+        else:
+            self.last_used[id(conn)] = time.monotonic()
+            self.pool.putconn(conn)
+            # The pool closes returned connections beyond min_connections rather than keeping them
+            if conn.closed:
+                self.last_used.pop(id(conn), None)
+        self.slots.release()
+
+    def discard(self, conn):
+        self.last_used.pop(id(conn), None)
+        self.pool.putconn(conn, close=True)
+
+    @contextmanager
+    def connection(self):
+        with metrics.span("connection"):
+            conn = self.checkout()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+# ----------------Command-line helpers---------------------------------------------------------------------
+# CLI tools pick a backend the same way: SQLite by path, or PostgreSQL from the DB_* variables in .env.
+def add_storage_arguments(parser):
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--db", default="timeline.db", help="SQLite database path")
+
+def open_storage(backend="sqlite", sqlite_path="timeline.db"):
+    if backend == "sqlite":
+        return SQLiteStorage(sqlite_path)
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    return PostgresStorage(
+        dbname=os.environ["DB_NAME"],
+        user=os.environ["DB_USER"],
+        password=os.environ["DB_PASSWORD"],
+        host=os.environ["DB_HOST"],
+        port=os.environ["DB_PORT"]
+    )
@@ -0,0 +1,65 @@
+import argparse
+import sys
+import time
+
+from storage import open_storage
+
+# ----------------Incremental replication between timeline stores------------------------------------------
+# Ships only what changed since the last sync, read from the source's change_log, instead of the whole
+# timeline.db file. Each batch is applied in one target transaction together with the checkpoint (the last
+# source seq applied), so an interrupted sync picks up after the last committed batch.
+# Conflicts resolve the same way on every store: the higher (version, changed_at, origin) stamp wins, so
+# after syncing both ways each entry holds the same winner everywhere. Deletes travel as tombstones and
+# follow the same rule: a newer edit brings a deleted entry back, an older one does not.
+# Stores are told apart by the store_id in their meta table; a file copy of a SQLite database keeps the
+# original's id and must not be synced with it.
+# Usage: python sync.py timeline.db postgres [--both]   (endpoints are "postgres" or a SQLite path)
+BATCH_SIZE = 500
+
+def open_endpoint(endpoint):
+    return open_storage("postgres") if endpoint == "postgres" else open_storage("sqlite", endpoint)
+
+def sync(source, target, batch_size=BATCH_SIZE):
+    # Returns (batches, inserted, updated, deleted, skipped)
+    source_id, target_id = source.store_id(), target.store_id()
+    if source_id == target_id:
+        raise ValueError("Source and target are the same store (a copied database keeps its store_id)")
+    checkpoint = target.sync_checkpoint(source_id)
+    batches, totals = 0, [0, 0, 0, 0]
+    while True:
+        # Changes that came from the target itself are already there
+        changes = source.changes_since(checkpoint, exclude_origin=target_id, limit=batch_size)
+        if not changes:
+            break
+        for index, count in enumerate(target.apply_changes(source_id, changes)):
+            totals[index] += count
+        batches += 1
+        checkpoint = changes[-1][0]
+        if len(changes) < batch_size:
+            break
+    return (batches, *totals)
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Copy entries changed since the last sync from one store to another.")
+    parser.add_argument("source", help='"postgres" or a SQLite database path')
+    parser.add_argument("target", help='"postgres" or a SQLite database path')
+    parser.add_argument("--both", action="store_true", help="Then sync target back to source")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    source, target = open_endpoint(args.source), open_endpoint(args.target)
+    source.migrate()
+    target.migrate()
+    directions = [(args.source, source, args.target, target)]
+    if args.both:
+        directions.append((args.target, target, args.source, source))
+    for source_name, from_store, target_name, to_store in directions:
+        started = time.perf_counter()
+        batches, inserted, updated, deleted, skipped = sync(from_store, to_store, args.batch_size)
+        print(f"{source_name} -> {target_name}: {inserted} inserted, {updated} updated, {deleted} deleted, "
+              f"{skipped} kept local in {batches} batches, {(time.perf_counter() - started) * 1000:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,100 @@
+import argparse
+import csv
+import json
+import random
+import sys
+
+from dates import ordinal
+from storage import DEFAULT_TAGS, ENTRY_FIELDS, add_storage_arguments, open_storage
+
+# ----------------Seeded synthetic discoveries-------------------------------------------------------------
+# Realistic-looking rows for benchmarks and load tests: mostly modern dates with a long BC tail and
+# a few deep-time entries, every date format dates.py accepts, 1-3 of the standard tags and long
+# descriptions. The same seed always produces the same rows.
+# Usage: python synthetic.py 100000 [--seed 1] [--output rows.jsonl] [--backend postgres]
+FIRST_NAMES = ["Ada", "Albert", "Alhazen", "Archimedes", "Carl", "Charles", "Dmitri", "Emmy", "Enrico", "Euclid",
+               "Galileo", "Gregor", "Hypatia", "Isaac", "Johannes", "Lise", "Louis", "Marie", "Max", "Michael",
+               "Niels", "Nikola", "Rosalind", "Srinivasa", "Tycho", "Werner", "Zhang"]
+LAST_NAMES = ["Bohr", "Brahe", "Curie", "Darwin", "Einstein", "Faraday", "Fermi", "Franklin", "Galilei", "Gauss",
+              "Heisenberg", "Heng", "Kepler", "Lovelace", "Meitner", "Mendel", "Mendeleev", "Newton", "Noether",
+              "Pasteur", "Planck", "Ramanujan", "Tesla", "al-Haytham", "of Alexandria", "of Syracuse"]
+SUBJECTS = ["gravitation", "the atom", "electromagnetism", "heredity", "prime numbers", "optics", "the cell",
+            "radioactivity", "planetary motion", "thermodynamics", "the periodic table", "evolution", "entropy",
+            "quantum states", "algorithms", "the human mind", "logic", "plate tectonics", "vaccination"]
+TITLE_TEMPLATES = ["Theory of {}", "Laws of {}", "On {}", "Principles of {}", "A New Account of {}",
+                   "Experiments on {}", "The Nature of {}"]
+WORDS = ("observation experiment measured proposed derived demonstrated theory law motion light energy mass "
+         "particle wave field force orbit element reaction species variation inheritance proof number "
+         "infinite geometry ratio instrument telescope microscope lens crystal current charge heat pressure "
+         "volume temperature model evidence hypothesis calculation constant symmetry structure system").split()
+
+def synthetic_date(rng):
+    era = rng.random()
+    if era < 0.005:
+        return f"{rng.choice([1.8, 2.5, 66, 145, 252, 541])} Ma"
+    if era < 0.01:
+        return f"{rng.randint(10, 300)} ka"
+    if era < 0.2:
+        year = int(rng.triangular(1, 3000, 300))
+        return rng.choice([f"{year} BC", f"{year} BCE", f"c. {year} BC", f"{ordinal(year // 100 + 1)} century BC"])
+    year = int(rng.triangular(1, 2025, 1900))
+    return rng.choice([f"{year}", f"{year}", f"{year} AD", f"c. {year}", f"{year // 10 * 10}s",
+                       f"{year}–{min(year + rng.randint(1, 5), 2025)}",
+                       f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"])
+
+def synthetic_row(rng, number):
+    scientist = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    title = rng.choice(TITLE_TEMPLATES).format(rng.choice(SUBJECTS)) + f" ({number})"
+    description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(40, 250))).capitalize() + "."
+    links = " ".join(f"https://example.org/discoveries/{number}/{n}" for n in range(rng.randint(1, 3)))
+    tags = ", ".join(rng.sample(DEFAULT_TAGS, rng.randint(1, 3)))
+    return (scientist, synthetic_date(rng), title, description, links, tags)
+
+def generate(count, seed=0):
+    rng = random.Random(seed)
+    for number in range(1, count + 1):
+        yield synthetic_row(rng, number)
+
+def populate(storage, count, seed=0, batch_size=5000):
+    batch = []
+    for row in generate(count, seed):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            storage.insert_many(batch)
+            batch = []
+    if batch:
+        storage.insert_many(batch)
+
+def write_rows(rows, out_stream, fmt):
+    if fmt == "csv":
+        writer = csv.writer(out_stream)
+        writer.writerow(ENTRY_FIELDS)
+        writer.writerows(rows)
+    else:
+        for row in rows:
+            out_stream.write(json.dumps(dict(zip(ENTRY_FIELDS, row)), ensure_ascii=False) + "\n")
+
+# ----------------CLI--------------------------------------------------------------------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate seeded synthetic discoveries into the database or a file.")
+    parser.add_argument("count", type=int, help="Number of rows, e.g. 1000 / 10000 / 100000 / 1000000")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write CSV/JSONL (by extension) for bulk_import.py instead of the database")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    add_storage_arguments(parser)
+    args = parser.parse_args(argv)
+
+    if args.output:
+        fmt = "csv" if args.output.endswith(".csv") else "jsonl"
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write_rows(generate(args.count, args.seed), out, fmt)
+        return 0
+
+    storage = open_storage(args.backend, args.db)
+    storage.migrate()
+    populate(storage, args.count, args.seed, args.batch_size)
+    print(f"Inserted {args.count} synthetic rows (seed {args.seed})")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
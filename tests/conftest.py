@@ -0,0 +1,63 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench import drop_bench_tables  # noqa: E402
+from storage import PostgresStorage, SQLiteStorage, StorageError  # noqa: E402
+
+# The PostgreSQL runs drop every timeline table in this database before and after each test, so it must be a
+# scratch database, given explicitly (the DB_* variables in .env are never used here), e.g.
+#   TIMELINE_TEST_POSTGRES_DSN="host=localhost port=5432 dbname=timeline_test user=postgres" python -m pytest
+# Without it they are skipped. CI (.github/workflows/tests.yml) runs them against a service container and
+# sets TIMELINE_TEST_REQUIRE_POSTGRES, which turns a missing or unreachable database into a failure.
+POSTGRES_DSN_VARIABLE = "TIMELINE_TEST_POSTGRES_DSN"
+REQUIRE_POSTGRES_VARIABLE = "TIMELINE_TEST_REQUIRE_POSTGRES"
+
+def skip_postgres(reason):
+    if os.environ.get(REQUIRE_POSTGRES_VARIABLE):
+        pytest.fail(f"{reason} ({REQUIRE_POSTGRES_VARIABLE} is set)")
+    pytest.skip(reason)
+
+def open_test_storage(backend, tmp_path):
+    if backend == "sqlite":
+        return SQLiteStorage(str(tmp_path / "timeline.db"))
+    dsn = os.environ.get(POSTGRES_DSN_VARIABLE)
+    if not dsn:
+        skip_postgres(f"{POSTGRES_DSN_VARIABLE} is not set")
+    try:
+        storage = PostgresStorage(dsn=dsn)
+    except StorageError as e:
+        skip_postgres(f"PostgreSQL is not available: {e}")
+    storage.write(drop_bench_tables)
+    return storage
+
+def close_test_storage(storage):
+    if isinstance(storage, PostgresStorage):
+        storage.write(drop_bench_tables)
+        storage.pool.closeall()
+    else:
+        storage.close()
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def storage(request, tmp_path):
+    # A migrated, empty store on each backend
+    storage = open_test_storage(request.param, tmp_path)
+    storage.migrate()
+    yield storage
+    close_test_storage(storage)
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def store_pair(request, tmp_path):
+    # Two independent migrated stores to sync: the backend under test and a local SQLite store, as sync.py
+    # pairs them (a second PostgreSQL store would need a second scratch database)
+    first = open_test_storage(request.param, tmp_path)
+    (tmp_path / "second").mkdir()
+    second = SQLiteStorage(str(tmp_path / "second" / "timeline.db"))
+    for store in (first, second):
+        store.migrate()
+    yield first, second
+    for store in (first, second):
+        close_test_storage(store)
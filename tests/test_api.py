@@ -0,0 +1,102 @@
+import gzip
+import http.client
+import json
+import threading
+
+import pytest
+
+from api import ResponseCache, TimelineApi, accepts_gzip, etag_matches, make_server
+
+ROWS = [(f"Scientist {n}", str(1800 + n), f"Discovery {n}", "Described at length. " * 20, "", "Physics")
+        for n in range(30)]
+
+@pytest.fixture
+def api_server(storage):
+    storage.insert_many(ROWS)
+    server = make_server(storage, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield storage, server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+def get(port, target, **headers):
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    connection.request("GET", target, headers={name.replace("_", "-"): value for name, value in headers.items()})
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response, body
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    ('W/"5"', True), ('"5"', True), ('W/"4", W/"5"', True), ('"4",W/"5"', True), ("*", True),
+    ('W/"55"', False), ('W/"4"', False), ("", False), (None, False),
+])
+def test_etag_matches(if_none_match, matches):
+    assert etag_matches('W/"5"', if_none_match) is matches
+
+@pytest.mark.parametrize("accept_encoding, gzip_ok", [
+    ("gzip", True), ("GZIP", True), ("x-gzip", True), ("deflate, gzip;q=0.5", True), ("gzip; q=1.0", True),
+    ("*", True), ("br, *;q=0.1", True),
+    ("gzip;q=0", False), ("gzip; q=0.000", False), ("gzip;q=0, *", False), ("*;q=0", False), ("br, deflate", False),
+    ("identity", False), ("gzip;q=junk", False), ("", False), (None, False),
+])
+def test_accepts_gzip(accept_encoding, gzip_ok):
+    assert accepts_gzip(accept_encoding) is gzip_ok
+
+def test_not_modified_until_a_write(api_server):
+    storage, port = api_server
+    response, body = get(port, "/discoveries?limit=5")
+    etag = response.getheader("ETag")
+    assert response.status == 200 and etag == f'W/"{storage.data_version()}"'
+    assert len(json.loads(body)["items"]) == 5
+
+    for if_none_match in (etag, etag.removeprefix("W/"), f'W/"0", {etag}', "*"):
+        response, body = get(port, "/discoveries?limit=5", If_None_Match=if_none_match)
+        assert (response.status, body, response.getheader("ETag")) == (304, b"", etag)
+    # Any write moves the data version, so the old tag no longer matches
+    storage.insert_entry(*ROWS[0])
+    response, body = get(port, "/discoveries?limit=5", If_None_Match=etag)
+    assert response.status == 200 and response.getheader("ETag") != etag
+    # Errors are never 304
+    response, _ = get(port, "/discoveries/999999", If_None_Match="*")
+    assert response.status == 404
+
+def test_gzip_negotiation(api_server):
+    _, port = api_server
+    plain_response, plain = get(port, "/discoveries")
+    assert plain_response.getheader("Content-Encoding") is None
+    assert plain_response.getheader("Vary") == "Accept-Encoding"
+    response, body = get(port, "/discoveries", Accept_Encoding="deflate, gzip;q=0.8")
+    assert response.getheader("Content-Encoding") == "gzip"
+    assert gzip.decompress(body) == plain and len(body) < len(plain)
+    response, body = get(port, "/discoveries", Accept_Encoding="gzip;q=0, identity")
+    assert response.getheader("Content-Encoding") is None and body == plain
+    # Small bodies are not worth compressing
+    response, body = get(port, "/discoveries/999999", Accept_Encoding="gzip")
+    assert response.getheader("Content-Encoding") is None and json.loads(body)["error"]
+
+def test_response_cache_evicts_least_recently_used():
+    cache = ResponseCache(size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    cache.put("a", 4)
+    cache.put("d", 5)
+    assert list(cache.entries) == ["a", "d"]
+
+def test_responses_are_cached_per_data_version(storage):
+    storage.insert_many(ROWS)
+    api = TimelineApi(storage)
+    first = api.respond("/discoveries?limit=5")
+    assert api.respond("/discoveries?limit=5") is first
+    assert api.respond("/discoveries?limit=6") is not first
+    # Errors are rebuilt every time; a write leaves the old entries unreachable
+    assert api.respond("/discoveries/999999")[0] == 404
+    assert "/discoveries/999999" not in {target for _, target in api.cache.entries}
+    storage.insert_entry(*ROWS[0])
+    refreshed = api.respond("/discoveries?limit=5")
+    assert refreshed is not first and refreshed[1] != first[1]
+    assert len(api.cache.entries) == 3
@@ -0,0 +1,69 @@
+import io
+import json
+
+import pytest
+
+from bulk_import import import_stream
+
+LINK = "https://example.org"
+FIELDS = ("scientist_name", "discovery_date", "title", "description", "links", "tags")
+
+def jsonl(records):
+    return io.StringIO("".join(json.dumps(dict(zip(FIELDS, record))) + "\n" for record in records))
+
+def test_import_publishes_once(storage):
+    records = [(f"Scientist {n}", str(1800 + n), f"Discovery number {n}", "Something new.", LINK, "Physics")
+               for n in range(25)]
+    before = storage.data_version()
+    published = []
+    insert_rows = storage.insert_rows
+
+    def watch(cursor, *args):
+        ids = insert_rows(cursor, *args)
+        published.append(storage.execute(cursor, "SELECT value FROM meta WHERE key = 'published_version'")
+                         .fetchone()[0])
+        return ids
+
+    storage.insert_rows = watch
+    stats = import_stream(storage, jsonl(records), "jsonl", batch_size=10, allow_duplicates=True)
+    assert stats == {"accepted": 25, "rejected": 0, "duplicates": 0, "batches": 3}
+    # Batches are staged: readers' data version moves once, after the last one
+    assert published == [before] * 3
+    assert storage.data_version() == before + 3
+    assert len(storage.fetch_range()) == 25
+    assert sorted(row[0] for row in storage.fetch_changed(before, ("id",))) == sorted(
+        row[0] for row in storage.fetch_range())
+
+def test_rejects(storage):
+    rejects = io.StringIO()
+    note = ("Ada Lovelace", "1843", "Analytical engine notes", "The first program.", LINK, "Computer Science")
+    stream = jsonl([note,
+                    ("Nobody", "not a date", "Bad date", "x", LINK, "Physics"),
+                    ("Nobody", "1900", "Bad tag", "x", LINK, "Alchemy"),
+                    note])
+    before = storage.data_version()
+    stats = import_stream(storage, stream, "jsonl", rejects)
+    assert stats == {"accepted": 1, "rejected": 3, "duplicates": 1, "batches": 1}
+    assert storage.data_version() == before + 1
+    lines = [line.split(",", 2)[:2] for line in rejects.getvalue().splitlines()[1:]]
+    assert [line[0] for line in lines] == ["2", "3", "4"]
+    assert lines[1][1].startswith("Unknown tags: Alchemy")
+    assert lines[2][1].startswith("Likely duplicate of line 1")
+
+def test_nothing_accepted_publishes_nothing(storage):
+    before = storage.data_version()
+    stats = import_stream(storage, io.StringIO("scientist_name\n"), "csv")
+    assert stats["accepted"] == 0
+    assert storage.data_version() == before
+
+@pytest.mark.parametrize("publish", [True, False])
+def test_staged_inserts(storage, publish):
+    before = storage.data_version()
+    storage.insert_many([("Tester", "1900", "Staged", "", "", "Physics")], publish=publish)
+    assert storage.data_version() == (before + 1 if publish else before)
+    storage.publish_changes()
+    assert storage.data_version() == before + 1
+    # Publishing again, or after a normal write, never moves the version back
+    storage.insert_entry("Tester", "1901", "Published", "", "", "Physics")
+    storage.publish_changes()
+    assert storage.data_version() == before + 2
@@ -0,0 +1,115 @@
+import numpy as np
+import pytest
+
+from dates import abbreviated_end, century_label, invalid_summary, parse_cached, parse_date, parse_years, year_values
+
+# (written date, year_value, precision): one group per format the parser accepts
+ACCEPTED = [
+    # Plain years and eras, including dotted spellings and a leading AD / CE
+    ("1905", 1905, "year"),
+    ("1600 BCE", -1600, "year"),
+    ("1600 CE", 1600, "year"),
+    ("44 B.C.E.", -44, "year"),
+    ("44 b.c.", -44, "year"),
+    ("1066 A.D.", 1066, "year"),
+    ("A.D. 1066", 1066, "year"),
+    ("AD 1066", 1066, "year"),
+    # Approximate years and decades
+    ("c. 1600", 1600, "circa"),
+    ("c.1600", 1600, "circa"),
+    ("ca. 1600", 1600, "circa"),
+    ("circa 1600", 1600, "circa"),
+    ("~1600", 1600, "circa"),
+    ("c. 300 BC", -300, "circa"),
+    ("c. 1920s", 1920, "circa"),
+    # Decades; BC decades run backwards, so the 340s BC start in 349 BC
+    ("1920s", 1920, "decade"),
+    ("1920's", 1920, "decade"),
+    ("1920s AD", 1920, "decade"),
+    ("340s BC", -349, "decade"),
+    # Ordinal centuries and millennia: the 5th century is 400-499, the 5th century BC 500-401 BC
+    ("5th century", 400, "century"),
+    ("1st century", 0, "century"),
+    ("21st cent.", 2000, "century"),
+    ("5th century BC", -500, "century"),
+    ("3rd c. BCE", -300, "century"),
+    ("2nd millennium", 1000, "millennium"),
+    ("1st millennium BC", -1000, "millennium"),
+    # Ranges sort by their start; a trailing era covers both ends
+    ("1687-1689", 1687, "range"),
+    ("1687–1689", 1687, "range"),
+    ("1687 to 1689", 1687, "range"),
+    ("1914-18", 1914, "range"),
+    ("1905-13", 1905, "range"),
+    ("300-200 BC", -300, "range"),
+    ("300 BC-200 BC", -300, "range"),
+    ("50 BC-30 AD", -50, "range"),
+    # Deep time counts back from 1950
+    ("12 ka", -10050, "thousand_years"),
+    ("10 kya", -8050, "thousand_years"),
+    ("2.5 Ma", -2498050, "million_years"),
+    ("66 mya", -65998050, "million_years"),
+    ("4.5 Ga", -4499998050, "billion_years"),
+    ("4.5 Ga BP", -4499998050, "billion_years"),
+    # ISO and written-out dates
+    ("1905-06-30", 1905, "day"),
+    ("1905-06", 1905, "month"),
+    ("1998-02", 1998, "month"),
+    ("30 June 1905", 1905, "day"),
+    ("June 30, 1905", 1905, "day"),
+    ("Jun. 30th, 1905", 1905, "day"),
+    ("June 1905", 1905, "month"),
+    ("15 March 44 BC", -44, "day"),
+]
+
+REJECTED = [
+    ("", "Date is empty"),
+    ("0 BC", "There is no year 0 BC"),
+    ("200-300 BC", "Range ends before it starts"),
+    ("1918-1914", "Range ends before it starts"),
+    # An abbreviated end never rolls over into the next century
+    ("1998-13", "Range ends before it starts"),
+    ("1905-13-01", "Month or day out of range"),
+    ("1905-06-32", "Month or day out of range"),
+    ("0th century", "Ordinal must be at least 1st"),
+    ("banana", "Unrecognized date format"),
+    ("1905 June 30", "Unrecognized date format"),
+]
+
+@pytest.mark.parametrize("text, year, precision", ACCEPTED)
+def test_accepted(text, year, precision):
+    assert parse_date(text) == (year, precision)
+
+@pytest.mark.parametrize("text, message", REJECTED)
+def test_rejected(text, message):
+    with pytest.raises(ValueError, match=message):
+        parse_date(text)
+
+@pytest.mark.parametrize("start, end, year", [
+    ("1914", "18", 1918), ("1914", "1918", 1918), ("1899", "901", 1901), ("1899", "1901", 1901),
+    ("1998", "13", 1913), ("45", "7", 47),
+])
+def test_abbreviated_end(start, end, year):
+    assert abbreviated_end(start, end) == year
+
+def test_batch_api():
+    dates = ["1905", "nonsense", "340s BC", None, "1914-18"]
+    years, valid = parse_years(dates)
+    assert years.dtype == np.int64
+    assert years.tolist() == [1905, 0, -349, 0, 1914]
+    assert valid.tolist() == [True, False, True, False, True]
+    assert year_values(dates) == [1905, None, -349, None, 1914]
+    count, examples = invalid_summary(dates + ["nonsense"])
+    assert count == 3
+    assert [date for date, _ in examples] == ["nonsense", None]
+
+def test_invalid_results_are_memoized():
+    parse_cached.cache_clear()
+    for _ in range(3):
+        assert isinstance(parse_cached("not a date"), str)
+    assert parse_cached.cache_info().hits == 2
+
+@pytest.mark.parametrize("century, label", [(19, "20th century"), (0, "1st century"), (-1, "1st century BC"),
+                                            (-5, "5th century BC"), (10, "11th century")])
+def test_century_label(century, label):
+    assert century_label(century) == label
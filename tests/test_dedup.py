@@ -0,0 +1,88 @@
+import pytest
+
+from dedup import (BUCKET_CAP, batch_duplicates, candidate_ids, duplicate_clusters, entry_text, fold, normalize_name,
+                   normalize_title, similarity, trigrams, years_close)
+
+ROWS = [
+    ("Albert Einstein", "1905", "Special relativity", "Space and time are relative.", "", "Physics"),
+    ("Isaac Newton", "1687", "Principia Mathematica", "Laws of motion.", "", "Physics"),
+    ("Marie Curie", "1898", "Discovery of polonium", "A new element.", "", "Physics"),
+    ("Ada Lovelace", "1843", "Analytical engine notes", "The first program.", "", "Computer Science"),
+    ("Anonymous", "unknown", "Undated idea", "No date survives.", "", "Philosophy"),
+]
+
+def probe(scientist_name, discovery_date, title):
+    return (scientist_name, discovery_date, title, "", "", "")
+
+# ----------------Normalization and similarity--------------------------------------------------------------
+def test_normalization():
+    assert fold("Schrödinger's Cat!") == ["schrodinger", "s", "cat"]
+    assert normalize_name("Newton, Isaac") == normalize_name("isaac  NEWTON") == "isaac newton"
+    assert normalize_title("The Theory of Everything") == "theory everything"
+    assert entry_text("On the Origin of Species", "Darwin, Charles") == "origin species | charles darwin"
+
+def test_similarity_and_years():
+    same = trigrams(entry_text("Special relativity", "Albert Einstein"))
+    assert similarity(same, same) == 1.0
+    assert similarity(same, frozenset()) == 0.0
+    assert similarity(same, trigrams(entry_text("Spezial relativty", "Albert Einstein"))) >= 0.6
+    assert similarity(same, trigrams(entry_text("Analytical engine notes", "Ada Lovelace"))) < 0.2
+    assert years_close(1905, 1910) and not years_close(1905, 1911)
+    assert years_close(None, None) and not years_close(None, 1905)
+
+def test_capped_buckets_only_match_exact_keys():
+    crowded = list(range(BUCKET_CAP + 1))
+    holders = {"exact": crowded, "band": crowded, "small": [100, 101]}
+    assert candidate_ids(["exact", "band", "small"], holders) == set(crowded) | {100, 101}
+    assert candidate_ids(["missing", "band", "small"], holders) == {100, 101}
+
+def test_batch_duplicates():
+    found = batch_duplicates([("Special relativity", "Albert Einstein", 1905), ("Other work", "Someone Else", 1905),
+                              ("Special Relativity!", "Einstein, Albert", 1906),
+                              ("Special relativity", "Albert Einstein", 1950)])
+    assert found == {2: [(0, 1.0)]}
+
+# ----------------Against a store---------------------------------------------------------------------------
+def test_find_duplicates(storage):
+    ids = storage.insert_many(ROWS)
+    found = storage.find_duplicates([
+        probe("Einstein, Albert", "1905", "The special relativity"),
+        probe("Newton, Isaac", "c. 1687", "Principia mathematica"),
+        probe("Isaac Newton", "1690", "Principia Mathematica"),
+        probe("Isaac Newton", "1700", "Principia Mathematica"),
+        probe("Albert Einstein", "1905", "Spezial relativty"),
+        probe("Anonymous", "unknown", "Undated idea"),
+        probe("Anonymous", "1900", "Undated idea"),
+        probe("Ada Lovelace", "1843", "Something else entirely"),
+    ])
+    assert {index: [entry_id for entry_id, _ in matches] for index, matches in found.items()} == {
+        0: [ids[0]], 1: [ids[1]], 2: [ids[1]], 4: [ids[0]], 5: [ids[4]]}
+    assert found[0][0][1] == 1.0 and 0.6 <= found[4][0][1] < 1.0
+    assert storage.find_duplicates([]) == {}
+
+def test_keys_follow_updates_and_deletes(storage):
+    ids = storage.insert_many(ROWS)
+    storage.update_entry(ids[0], "Albert Einstein", "1915", "General relativity", "", "", "Physics")
+    assert storage.find_duplicates([ROWS[0]]) == {}
+    assert [match[0] for match in storage.find_duplicates([probe("Albert Einstein", "1915",
+                                                                 "General relativity")])[0]] == [ids[0]]
+    storage.delete_entry(ids[1])
+    assert storage.find_duplicates([ROWS[1]]) == {}
+
+@pytest.mark.parametrize("threshold, clusters", [(0.6, [[0, 5, 6], [2, 7]]), (0.9, [[0, 5], [2, 7]])])
+def test_duplicate_clusters(storage, threshold, clusters):
+    ids = storage.insert_many(ROWS + [
+        probe("Albert Einstein", "1903", "Special relativity"),
+        probe("Einstein, Albert", "1905", "Special relativity (revised)"),
+        probe("Marie Curie", "1899", "Discovery of polonium"),
+        # Same text, too many years apart
+        probe("Isaac Newton", "1787", "Principia Mathematica"),
+    ])
+    found = duplicate_clusters(storage, threshold)
+    assert [[entry_id for entry_id, _ in cluster] for cluster in found] == [
+        [ids[index] for index in cluster] for cluster in clusters]
+    assert all(score >= threshold for cluster in found for _, score in cluster)
+
+def test_no_clusters_without_shared_keys(storage):
+    storage.insert_many(ROWS)
+    assert duplicate_clusters(storage) == []
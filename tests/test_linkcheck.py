@@ -0,0 +1,120 @@
+import asyncio
+
+from aiohttp import web
+
+from linkcheck import LinkChecker
+from storage import LINK_DEAD_AFTER
+
+# Checks against a local server with one route per outcome, on each backend (storage fixture: conftest.py).
+# Every request is held HOLD_SECONDS so that overlapping requests to the one host show in the in-flight count.
+HOLD_SECONDS = 0.2
+TIMEOUT_SECONDS = 1.0
+PER_HOST = 2
+
+class LinkServer:
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requests = []
+        self.app = web.Application(middlewares=[self.track])
+        self.app.router.add_route("*", "/ok/{n}", self.ok)
+        self.app.router.add_route("*", "/missing", self.missing)
+        self.app.router.add_route("*", "/moved", self.moved)
+        self.app.router.add_route("*", "/slow", self.slow)
+        self.app.router.add_route("*", "/get-only", self.get_only)
+
+    @web.middleware
+    async def track(self, request, handler):
+        self.requests.append((request.method, request.path))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(HOLD_SECONDS)
+            return await handler(request)
+        finally:
+            self.in_flight -= 1
+
+    async def ok(self, request):
+        return web.Response(text="ok")
+
+    async def missing(self, request):
+        return web.Response(status=404)
+
+    async def moved(self, request):
+        raise web.HTTPFound("/ok/moved")
+
+    async def slow(self, request):
+        await asyncio.sleep(TIMEOUT_SECONDS + 1)
+        return web.Response(text="late")
+
+    async def get_only(self, request):
+        return web.Response(status=405 if request.method == "HEAD" else 200)
+
+async def check_links(storage, server, port=0):
+    # Serve on port (any free one by default), add an entry linking to every route the first time, check
+    # everything due; returns (base URL, links checked)
+    runner = web.AppRunner(server.app, shutdown_timeout=0)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port)
+    await site.start()
+    base = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    if not port:
+        paths = [f"/ok/{n}" for n in range(6)] + ["/missing", "/moved", "/slow", "/get-only"]
+        await asyncio.to_thread(storage.insert_entry, "Tester", "1900", "Links", "",
+                                ", ".join(base + path for path in paths), "")
+    checker = LinkChecker(storage, timeout=TIMEOUT_SECONDS, per_host=PER_HOST, host_interval=0)
+    try:
+        checked = await checker.run_until_idle()
+    finally:
+        await runner.cleanup()
+    return base, checked
+
+def link_rows(storage):
+    with storage.connection() as conn:
+        return {row[0]: row[1:] for row in storage.execute(conn.cursor(), """
+        SELECT url, status, final_url, error, failures, checked_at, next_check_at FROM link_status
+        """).fetchall()}
+
+def test_statuses_are_recorded(storage):
+    server = LinkServer()
+    base, checked = asyncio.run(check_links(storage, server))
+    rows = link_rows(storage)
+    assert checked == len(rows) == 10
+
+    # Including the links queued behind the slow one for a connection to the host
+    for n in range(6):
+        assert rows[f"{base}/ok/{n}"][:4] == (200, f"{base}/ok/{n}", None, 0)
+    checked_at, next_check_at = rows[base + "/ok/0"][4:]
+    assert next_check_at > checked_at
+
+    assert rows[base + "/missing"][:4] == (404, base + "/missing", None, 1)
+    # Redirects are followed and the final URL kept
+    assert rows[base + "/moved"][:4] == (200, base + "/ok/moved", None, 0)
+    # A network failure has no status
+    assert rows[base + "/slow"][:4] == (None, None, "timeout", 1)
+    # HEAD refused, so the link was fetched with GET
+    assert rows[base + "/get-only"][:4] == (200, base + "/get-only", None, 0)
+    assert ("GET", "/get-only") in server.requests
+    assert ("GET", "/ok/0") not in server.requests
+
+    # Failing links are retried sooner than healthy ones are rechecked, and only count as dead after
+    # LINK_DEAD_AFTER consecutive failures
+    assert rows[base + "/missing"][5] < rows[base + "/ok/0"][5]
+    assert storage.link_summary() == (10, 10, 0)
+
+def test_failures_accumulate_until_dead(storage):
+    server = LinkServer()
+    base, _ = asyncio.run(check_links(storage, server))
+    port = int(base.rsplit(":", 1)[1])
+    for _ in range(LINK_DEAD_AFTER - 1):
+        assert storage.dead_links() == []
+        storage.write(storage.execute, "UPDATE link_status SET next_check_at = 0")
+        asyncio.run(check_links(storage, LinkServer(), port))
+    assert set(storage.dead_links()) == {base + "/missing", base + "/slow"}
+    assert storage.link_version() == 1
+
+def test_per_host_connection_limit(storage):
+    server = LinkServer()
+    asyncio.run(check_links(storage, server))
+    # Every link is on one host: never more than PER_HOST requests at once, but that many in parallel
+    assert server.max_in_flight == PER_HOST
@@ -0,0 +1,80 @@
+import itertools
+import random
+
+from snapshot import EntrySnapshot
+
+# EntrySnapshot.filter must return exactly the ids Storage.fetch_range does, on each backend
+SCIENTISTS = ["Ada Lovelace", "Isaac Newton", "Marie Curie", "Euclid", "Hypatia"]
+DATES = ["1905", "1905", "1687", "300 BC", "1920s", "5th century BC", "c. 1600", "1914-18", "June 1843", "12 ka",
+         "unknown"]
+TAGS = ["Physics", "Astro", "Mathematics", "Optics", "Seismology"]
+WORDS = ["comet", "prism", "atom", "tide"]
+UNKNOWN_TAG = 10 ** 6
+
+def generate(count, seed=7):
+    rng = random.Random(seed)
+    return [(rng.choice(SCIENTISTS), rng.choice(DATES), f"{rng.choice(WORDS).title()} study {number}",
+             f"Notes on the {rng.choice(WORDS)}.", "", ", ".join(rng.sample(TAGS, rng.randint(1, 3))))
+            for number in range(count)]
+
+def tag_ids(storage, *names):
+    ids = {name: tag_id for tag_id, name in storage.fetch_tags()}
+    return [ids[name] for name in names]
+
+def snapshot_of(storage, snapshot=None):
+    return (snapshot or EntrySnapshot.empty()).refresh(storage, storage.data_version())
+
+def assert_matches_fetch_range(storage, snapshot):
+    physics, astro, seismology = tag_ids(storage, "Physics", "Astro", "Seismology")
+    dated = storage.fetch_range(columns=("year_value", "id"))
+    keys = [None, tuple(dated[len(dated) // 2]), tuple(dated[1])]
+    tag_choices = [None, [physics], [physics, astro], [seismology], [UNKNOWN_TAG], [astro, UNKNOWN_TAG]]
+    for (start_year, end_year, tags, match_all, descending, after, limit, text) in itertools.product(
+            [None, -500, 1700], [None, 1800], tag_choices, [False, True], [False, True], keys, [None, 7],
+            [None, "comet"]):
+        expected = [row[0] for row in storage.fetch_range(start_year, end_year, tags, match_all, descending, after,
+                                                          limit, text=text)]
+        text_ids = None if text is None else [row[0] for row in storage.fetch_range(text=text)]
+        assert snapshot.filter(start_year, end_year, tags, match_all, descending, after, limit, text_ids) == expected, (
+            start_year, end_year, tags, match_all, descending, after, limit, text)
+
+def test_filter_matches_fetch_range(storage):
+    storage.insert_many(generate(120))
+    assert_matches_fetch_range(storage, snapshot_of(storage))
+    assert snapshot_of(storage).filter(tag_ids=[]) == []
+
+def test_refresh_matches_fetch_range(storage):
+    ids = storage.insert_many(generate(80))
+    snapshot = snapshot_of(storage)
+    # Retag, redate, undate, delete and insert, then refresh the old snapshot
+    rows = generate(80, seed=8)
+    storage.update_many([(ids[number],) + rows[number] for number in range(0, 40, 3)])
+    storage.update_entry(ids[1], *rows[1][:1], "unknown", *rows[1][2:])
+    deleted = ids[40:50]
+    storage.delete_many(deleted)
+    storage.insert_many(generate(20, seed=9))
+    refreshed = snapshot_of(storage, snapshot)
+    assert not set(deleted) & set(refreshed.ids.tolist())
+    assert sorted(refreshed.ids.tolist()) == sorted(row[0] for row in storage.fetch_range())
+    assert_matches_fetch_range(storage, refreshed)
+
+def test_tag_bits_are_dense(storage):
+    # However large the tag ids get, the matrix is only as wide as the vocabulary
+    storage.write(storage.execute, "INSERT INTO tags (id, name) VALUES (?, ?)", (5000, "Glaciology"))
+    entry_id, = storage.insert_many([("Louis Agassiz", "1837", "Ice ages", "", "", "Glaciology, Physics")])
+    snapshot = snapshot_of(storage)
+    assert snapshot.tag_bits.shape == (1, 1)
+    assert snapshot.tag_positions[5000] == len(storage.fetch_tags()) - 1
+    assert snapshot.filter(tag_ids=[5000]) == [entry_id]
+    assert snapshot.filter(tag_ids=[5000] + tag_ids(storage, "Physics"), match_all=True) == [entry_id]
+
+def test_entries_skip_deleted_ids(storage):
+    ids = storage.insert_many(generate(5))
+    snapshot = snapshot_of(storage)
+    shown = snapshot.filter()
+    storage.delete_entry(shown[0])
+    # A snapshot taken before the delete still lists the id; its rows leave it out
+    assert [row[0] for row in snapshot.entries(storage, shown)] == shown[1:]
+    rows = {row[0]: row for row in storage.fetch_by_ids(ids)}
+    assert snapshot.entries(storage, shown[1:]) == [rows[entry_id] for entry_id in shown[1:]]
+    assert snapshot_of(storage, snapshot).filter() == shown[1:]
@@ -0,0 +1,291 @@
+import threading
+
+import pytest
+
+from storage import ALL_ENTRIES, CHANGE_COLUMNS, ROLLUP_GRANULARITIES, ConflictError
+
+# Backend conformance: every test runs against each Storage backend (see the storage fixture in conftest.py)
+ROWS = [
+    ("Albert Einstein", "1905", "Special relativity", "Space and time are relative.", "https://example.org/sr",
+     "Physics"),
+    ("Albert Einstein", "1915", "General relativity", "Gravity as curved spacetime.", "", "Physics, Astro"),
+    ("Isaac Newton", "1687", "Principia", "Laws of motion and universal gravitation.", "",
+     "Physics, Classical Mechanics"),
+    ("Euclid", "300 BC", "Elements", "Geometry from axioms.", "", "Mathematics"),
+    ("Anonymous", "unknown", "Undated idea", "No date survives.", "", "Philosophy"),
+]
+
+def tag_ids(storage, *names):
+    ids = {name: tag_id for tag_id, name in storage.fetch_tags()}
+    return [ids[name] for name in names]
+
+def rollups(storage):
+    return {granularity: storage.rollup_counts(granularity) for granularity in ROLLUP_GRANULARITIES}
+
+def assert_rollups_match_rebuild(storage):
+    incremental = rollups(storage)
+    storage.write(storage.rebuild_rollups)
+    assert incremental == rollups(storage)
+
+def change_log(storage):
+    return {row[1]: row for row in storage.changes_since(0, limit=1000)}
+
+# ----------------Inserts and reads-------------------------------------------------------------------------
+def test_insert_and_fetch_by_ids(storage):
+    ids = storage.insert_many(ROWS)
+    assert len(ids) == len(set(ids)) == len(ROWS)
+    assert storage.entry_count() == len(ROWS)
+
+    # Requested order, unknown ids skipped
+    fetched = storage.fetch_by_ids([ids[2], 10 ** 9, ids[0]])
+    assert [row[0] for row in fetched] == [ids[2], ids[0]]
+    assert fetched[0][1:] == ROWS[2] + (1687,)
+    assert storage.fetch_by_ids([ids[3]], ("id", "year_value", "version")) == [(ids[3], -300, 1)]
+    # A projection without id still gets it, first
+    assert storage.fetch_by_ids([ids[1]], ("title",)) == [(ids[1], "General relativity")]
+    assert storage.invalid_dates() == ["unknown"]
+    assert storage.year_span() == (-300, 1915)
+    assert dict(storage.tag_counts())["Physics"] == 3
+
+def test_fetch_range(storage):
+    ids = storage.insert_many(ROWS)
+    # Dated entries only, by year then id
+    assert [row[0] for row in storage.fetch_range()] == [ids[3], ids[2], ids[0], ids[1]]
+    assert storage.fetch_range(1600, 1910, columns=("id", "year_value")) == [(ids[2], 1687), (ids[0], 1905)]
+    assert [row[0] for row in storage.fetch_range(descending=True, limit=2)] == [ids[1], ids[0]]
+    # Keyset paging continues after the (year_value, id) of the last row seen
+    assert [row[0] for row in storage.fetch_range(after=(1687, ids[2]), limit=1)] == [ids[0]]
+    assert [row[0] for row in storage.fetch_range(descending=True, after=(1687, ids[2]))] == [ids[3]]
+
+    physics, astro, mechanics = tag_ids(storage, "Physics", "Astro", "Classical Mechanics")
+    assert [row[0] for row in storage.fetch_range(tag_ids=[astro, mechanics])] == [ids[2], ids[1]]
+    assert [row[0] for row in storage.fetch_range(tag_ids=[physics, astro], match_all=True)] == [ids[1]]
+    assert storage.fetch_range(tag_ids=[]) == []
+    assert [row[0] for row in storage.fetch_range(text="relativ")] == [ids[0], ids[1]]
+    assert [row[0] for row in storage.fetch_range(end_year=1900, text="gravitation")] == [ids[2]]
+
+    with pytest.raises(ValueError):
+        storage.fetch_range(columns=("id", "password"))
+
+def test_search(storage):
+    ids = storage.insert_many(ROWS)
+    assert {row[0] for row in storage.search("relativity")} == {ids[0], ids[1]}
+    assert [row[0] for row in storage.search("relativity", start_year=1910)] == [ids[1]]
+    assert storage.search("") == []
+
+# ----------------Updates, deletes and compare-and-swap------------------------------------------------------
+def test_update(storage):
+    ids = storage.insert_many(ROWS)
+    before = storage.data_version()
+    storage.update_entry(ids[0], "Albert Einstein", "1906", "Special relativity", "Revised.", "", "Physics, Optics",
+                         expected_version=1)
+    assert storage.data_version() == before + 1
+    assert storage.fetch_by_ids([ids[0]], ("description", "year_value", "version")) == [(ids[0], "Revised.", 1906, 2)]
+    optics, = tag_ids(storage, "Optics")
+    assert [row[0] for row in storage.fetch_range(tag_ids=[optics])] == [ids[0]]
+    assert [row[0] for row in storage.search("revised")] == [ids[0]]
+
+    # Without an expected version the write is unconditional
+    storage.update_entry(ids[0], "Albert Einstein", "1905", "Special relativity", "Again.", "", "Physics")
+    assert storage.fetch_by_ids([ids[0]], ("version",)) == [(ids[0], 3)]
+
+def test_tag_ids_stay_dense(storage):
+    # Writes that reuse known tags draw no ids, so a new tag gets the next one
+    ids = storage.insert_many(ROWS)
+    storage.insert_many(ROWS)
+    storage.update_entry(ids[0], *ROWS[0][:5], "Physics, Astro", expected_version=1)
+    storage.insert_entry(*ROWS[0][:5], "Physics, Seismology")
+    storage.insert_many(ROWS + [ROWS[0][:5] + ("Seismology, Glaciology",)])
+    tag_ids = sorted(tag_id for tag_id, _ in storage.fetch_tags())
+    assert tag_ids == list(range(tag_ids[0], tag_ids[0] + len(tag_ids)))
+
+def test_update_conflict_writes_nothing(storage):
+    ids = storage.insert_many(ROWS)
+    storage.update_entry(ids[1], *ROWS[1][:3], "Changed elsewhere.", "", "Physics", expected_version=1)
+    before = storage.data_version()
+    with pytest.raises(ConflictError) as raised:
+        storage.update_many([(ids[0],) + ROWS[0][:3] + ("Mine.", "", "Physics"),
+                             (ids[1],) + ROWS[1][:3] + ("Mine too.", "", "Physics")], [1, 1])
+    assert raised.value.conflicts == [(ids[1], 1, 2)]
+    # The batch is all or nothing
+    assert storage.data_version() == before
+    assert storage.fetch_by_ids(ids[:2], ("description", "version")) == [
+        (ids[0], ROWS[0][3], 1), (ids[1], "Changed elsewhere.", 2)]
+
+def test_delete(storage):
+    ids = storage.insert_many(ROWS)
+    before = storage.data_version()
+    storage.delete_many([ids[0], ids[4]], [1, 1])
+    assert storage.data_version() == before + 1
+    assert [row[0] for row in storage.fetch_by_ids(ids)] == [ids[1], ids[2], ids[3]]
+    assert storage.search("special") == []
+    assert dict(storage.tag_counts())["Physics"] == 2
+    assert ids[0] not in {row[0] for row in storage.find_duplicates([ROWS[0]]).get(0, [])}
+    # The deleted entries stay in the change log as tombstones, one version past the row they removed
+    log = change_log(storage)
+    assert sorted(row[2:4] for row in log.values()) == [("delete", 2)] * 2 + [("insert", 1)] * 3
+    assert all(row[6:] == (None,) * 6 for row in log.values() if row[2] == "delete")
+    assert sorted(storage.deleted_since(before)) == sorted([ids[0], ids[4]])
+    assert storage.deleted_since(before + 1) == []
+    assert_rollups_match_rebuild(storage)
+
+def test_delete_conflict_deletes_nothing(storage):
+    ids = storage.insert_many(ROWS)
+    storage.update_entry(ids[1], *ROWS[1], expected_version=1)
+    with pytest.raises(ConflictError) as raised:
+        storage.delete_many(ids[:2], [1, 1])
+    assert raised.value.conflicts == [(ids[1], 1, 2)]
+    assert storage.entry_count() == len(ROWS)
+    # Deleting what is already gone conflicts too
+    storage.delete_entry(ids[0], expected_version=1)
+    with pytest.raises(ConflictError) as raised:
+        storage.delete_entry(ids[0], expected_version=1)
+    assert raised.value.conflicts == [(ids[0], 1, None)]
+
+# ----------------Rollups-----------------------------------------------------------------------------------
+def test_rollups_follow_writes(storage):
+    ids = storage.insert_many(ROWS)
+    counts = rollups(storage)
+    assert (1900, ALL_ENTRIES, 2) in counts[100]
+    assert (-300, ALL_ENTRIES, 1) in counts[100]
+    assert sum(count for _, tag_id, count in counts[1000] if tag_id == ALL_ENTRIES) == 4
+    assert_rollups_match_rebuild(storage)
+
+    # Moving between buckets, retagging, dating an undated entry and deleting all adjust incrementally
+    storage.update_many([(ids[0],) + ROWS[0][:2] + ("Moved",) + ROWS[0][3:5] + ("Optics",),
+                         (ids[2], "Isaac Newton", "1704", "Opticks", "", "", "Optics, Physics"),
+                         (ids[4], "Anonymous", "50 BC", "Dated at last", "", "", "Philosophy")])
+    assert_rollups_match_rebuild(storage)
+    storage.delete_many([ids[1], ids[3]])
+    assert_rollups_match_rebuild(storage)
+    assert storage.rollup_counts(100, 1700, 1799) == [(1700, ALL_ENTRIES, 1)] + sorted(
+        (1700, tag_id, 1) for tag_id in tag_ids(storage, "Physics", "Optics"))
+
+def test_rollup_range_filter(storage):
+    storage.insert_many(ROWS)
+    assert [bucket for bucket, tag_id, _ in storage.rollup_counts(100, 1650, 1920) if tag_id == ALL_ENTRIES] == [
+        1600, 1900]
+    # 300 BC opens the -300 bucket (-300 to -201), so a range ending in 301 BC does not reach it
+    assert [bucket for bucket, tag_id, _ in storage.rollup_counts(100, -1000, -301) if tag_id == ALL_ENTRIES] == []
+
+# ----------------Change log--------------------------------------------------------------------------------
+def test_change_log_tracks_latest_change(storage):
+    ids = storage.insert_many(ROWS[:3])
+    log = change_log(storage)
+    assert len(log) == 3
+    seqs = [row[0] for row in storage.changes_since(0)]
+    assert seqs == sorted(seqs) and len(set(seqs)) == 3
+    origin = storage.store_id()
+    assert {row[2:4] + row[5:6] for row in log.values()} == {("insert", 1, origin)}
+
+    storage.update_entry(ids[0], *ROWS[0][:3], "Revised.", "", "Physics")
+    latest = storage.changes_since(seqs[-1])
+    assert [(row[2], row[3], row[9]) for row in latest] == [("update", 2, "Revised.")]
+    # One row per entry: the update replaced the insert
+    assert len(change_log(storage)) == 3
+    assert storage.changes_since(0, exclude_origin=origin) == []
+    assert len(storage.changes_since(0, limit=2)) == 2
+
+def test_apply_changes(storage):
+    source_id = 12345
+    stamp = lambda seq, uid, version, changed_at, title: (  # noqa: E731
+        seq, uid, "insert" if version == 1 else "update", version, changed_at, source_id,
+        "Marie Curie", "1898", title, "", "", "Physics")
+    assert storage.sync_checkpoint(source_id) == 0
+    assert storage.apply_changes(source_id, [stamp(1, "a" * 32, 1, 1000, "Polonium"),
+                                             stamp(2, "b" * 32, 1, 1000, "Radium")]) == (2, 0, 0, 0)
+    assert storage.sync_checkpoint(source_id) == 2
+    by_uid = {row[1]: row for row in storage.changes_since(0)}
+    assert by_uid["a" * 32][2:6] == ("insert", 1, 1000, source_id)
+
+    # Newer stamps win, older or equal ones are kept local
+    storage.update_entry(storage.fetch_range(text="radium")[0][0], "Marie Curie", "1898", "Radium (local)", "", "",
+                         "Physics")
+    assert storage.apply_changes(source_id, [stamp(3, "a" * 32, 2, 2000, "Polonium, revised"),
+                                             stamp(4, "b" * 32, 2, 1, "Radium, older")]) == (0, 1, 0, 1)
+    assert sorted(row[0] for row in storage.fetch_range(columns=("title",))) == ["Polonium, revised",
+                                                                                 "Radium (local)"]
+    assert storage.sync_checkpoint(source_id) == 4
+    # Replicated rows keep their stamps, so they are never shipped back to their origin
+    assert storage.changes_since(0, exclude_origin=source_id)[0][8] == "Radium (local)"
+    assert_rollups_match_rebuild(storage)
+    assert len(CHANGE_COLUMNS) == len(stamp(0, "", 1, 0, ""))
+
+def test_apply_deletes(storage):
+    source_id = 12345
+    change = lambda seq, uid, op, version, changed_at: (  # noqa: E731
+        (seq, uid, op, version, changed_at, source_id)
+        + ((None,) * 6 if op == "delete" else ("Marie Curie", "1898", f"Entry {uid[0]}", "", "", "Physics")))
+    storage.apply_changes(source_id, [change(1, "a" * 32, "insert", 1, 1000), change(2, "b" * 32, "insert", 1, 1000)])
+    a_id, b_id = (row[0] for row in storage.fetch_range(columns=("id",)))
+    before = storage.data_version()
+
+    # A newer delete removes the row; one for an entry never seen here still leaves a tombstone
+    assert storage.apply_changes(source_id, [change(3, "a" * 32, "delete", 2, 2000),
+                                             change(4, "c" * 32, "delete", 2, 2000)]) == (0, 0, 2, 0)
+    assert storage.fetch_range(columns=("title",)) == [("Entry b",)]
+    assert storage.deleted_since(before) == [a_id]
+    # Older copies, say from a third store that has not seen the deletes, stay deleted
+    assert storage.apply_changes(source_id, [change(5, "a" * 32, "insert", 1, 1000),
+                                             change(6, "c" * 32, "insert", 1, 1000)]) == (0, 0, 0, 2)
+    # A local delete loses to a newer edit from elsewhere, which brings the entry back
+    storage.delete_entry(b_id, expected_version=1)
+    assert storage.apply_changes(source_id, [change(7, "b" * 32, "update", 3, 3000),
+                                             change(8, "a" * 32, "delete", 2, 2000)]) == (1, 0, 0, 1)
+    log = {row[1]: row[2:6] for row in storage.changes_since(0)}
+    assert log == {"a" * 32: ("delete", 2, 2000, source_id), "b" * 32: ("insert", 3, 3000, source_id),
+                   "c" * 32: ("delete", 2, 2000, source_id)}
+    assert storage.changes_since(0, exclude_origin=source_id) == []
+    assert storage.fetch_range(columns=("title",)) == [("Entry b",)]
+    assert_rollups_match_rebuild(storage)
+
+# ----------------Concurrent editors------------------------------------------------------------------------
+def test_stale_edit_conflicts(storage):
+    # Two editors load version 1; the second to save must reload first
+    entry_id, = storage.insert_many(ROWS[:1])
+    storage.update_entry(entry_id, *ROWS[0][:3], "First editor.", "", "Physics", expected_version=1)
+    with pytest.raises(ConflictError) as raised:
+        storage.update_entry(entry_id, *ROWS[0][:3], "Second editor.", "", "Physics", expected_version=1)
+    assert raised.value.conflicts == [(entry_id, 1, 2)]
+    assert storage.fetch_by_ids([entry_id], ("description", "version")) == [(entry_id, "First editor.", 2)]
+    storage.update_entry(entry_id, *ROWS[0][:3], "Second editor.", "", "Physics", expected_version=2)
+    assert storage.fetch_by_ids([entry_id], ("description", "version")) == [(entry_id, "Second editor.", 3)]
+
+def test_concurrent_edit_and_delete(storage):
+    # An edit and a delete of the same row, both expecting the version they loaded, race from two threads:
+    # exactly one wins and the other gets ConflictError, whichever goes first
+    rounds = 10
+    ids = storage.insert_many([ROWS[1]] * rounds)
+    outcomes = []
+    for entry_id in ids:
+        start = threading.Barrier(2)
+        results = {}
+
+        def attempt(name, write):
+            start.wait()
+            try:
+                write()
+                results[name] = "ok"
+            except ConflictError as e:
+                results[name] = e.conflicts
+
+        writers = [threading.Thread(target=attempt, args=("edit", lambda: storage.update_entry(
+                       entry_id, *ROWS[1][:3], "Edited.", "", "Physics", expected_version=1))),
+                   threading.Thread(target=attempt, args=("delete", lambda: storage.delete_entry(
+                       entry_id, expected_version=1)))]
+        for writer in writers:
+            writer.start()
+        for writer in writers:
+            writer.join()
+
+        if results["edit"] == "ok":
+            assert results["delete"] == [(entry_id, 1, 2)]
+            assert storage.fetch_by_ids([entry_id], ("description", "version")) == [(entry_id, "Edited.", 2)]
+        else:
+            assert results == {"delete": "ok", "edit": [(entry_id, 1, None)]}
+            assert storage.fetch_by_ids([entry_id]) == []
+        outcomes.append(results["edit"] == "ok")
+    assert storage.entry_count() == sum(outcomes)
+    assert sorted(row[2] for row in change_log(storage).values()) == sorted(
+        ["update" if edited else "delete" for edited in outcomes])
+    assert_rollups_match_rebuild(storage)
@@ -0,0 +1,109 @@
+import pytest
+
+from storage import ROLLUP_GRANULARITIES
+from sync import sync
+
+# Replication between two stores (store_pair fixture: conftest.py): the backend under test and SQLite
+def entry(title, date="1900", tags="Physics"):
+    return ("Tester", date, title, f"About {title.lower()}.", "", tags)
+
+def contents(store):
+    # {uid: (version, changed_at, origin) + ENTRY_FIELDS}: what must match everywhere after syncing both ways
+    return {row[1]: tuple(row[3:]) for row in store.changes_since(0, limit=10 ** 6)}
+
+def rollups(store):
+    return {granularity: store.rollup_counts(granularity) for granularity in ROLLUP_GRANULARITIES}
+
+def edit(store, title, new_title, new_date="1900"):
+    entry_id, version = store.fetch_range(text=title, columns=("id", "version"))[0]
+    store.update_entry(entry_id, *entry(new_title, new_date), expected_version=version)
+
+@pytest.mark.parametrize("first_direction", ["forward", "backward"])
+def test_sync_both_ways_converges(store_pair, first_direction):
+    first, second = store_pair
+    first.insert_many([entry("Alpha", "1850"), entry("Beta"), entry("Gamma", "300 BC", "Mathematics")])
+    second.insert_many([entry("Delta", "1920", "Astro"), entry("Epsilon", "unknown")])
+    directions = [(first, second), (second, first)]
+    if first_direction == "backward":
+        directions.reverse()
+    for source, target in directions:
+        sync(source, target)
+    assert contents(first) == contents(second)
+    assert len(contents(first)) == 5
+
+    # Both edit Beta (the same version number on each side: the stamp decides), each edits one more entry
+    edit(first, "Beta", "Beta on first", "1901")
+    edit(second, "Beta", "Beta on second", "1902")
+    edit(first, "Alpha", "Alpha revised", "1851")
+    edit(second, "Delta", "Delta revised", "1921")
+    for source, target in directions:
+        sync(source, target)
+    assert contents(first) == contents(second)
+    titles = {fields[5] for fields in contents(first).values()}
+    assert {"Alpha revised", "Gamma", "Delta revised", "Epsilon"} < titles
+    assert len(titles & {"Beta on first", "Beta on second"}) == 1
+    assert rollups(first) == rollups(second)
+    assert [name for name, _ in first.tag_counts()] == [name for name, _ in second.tag_counts()]
+
+    # Nothing left to ship either way
+    for source, target in directions:
+        assert sync(source, target) == (0, 0, 0, 0, 0)
+
+def test_winner_is_independent_of_direction(store_pair):
+    first, second = store_pair
+    first.insert_many([entry("Beta")])
+    sync(first, second)
+    edit(first, "Beta", "Beta on first")
+    edit(second, "Beta", "Beta on second")
+    first_stamp, = (fields[:3] for fields in contents(first).values())
+    second_stamp, = (fields[:3] for fields in contents(second).values())
+    expected = "Beta on first" if first_stamp > second_stamp else "Beta on second"
+    sync(second, first)
+    sync(first, second)
+    assert {fields[5] for fields in contents(first).values()} == {expected}
+    assert contents(first) == contents(second)
+
+def test_deletes_replicate(store_pair):
+    first, second = store_pair
+    first.insert_many([entry("Alpha", "1850"), entry("Beta"), entry("Gamma", "300 BC", "Mathematics")])
+    sync(first, second)
+    alpha_id, version = first.fetch_range(text="Alpha", columns=("id", "version"))[0]
+    first.delete_entry(alpha_id, expected_version=version)
+    gamma_id, version = second.fetch_range(text="Gamma", columns=("id", "version"))[0]
+    second.delete_entry(gamma_id, expected_version=version)
+    # An edit and a delete of the same version race on the two stores: the stamp decides, as for two edits
+    edit(first, "Beta", "Beta on first")
+    beta_id, version = second.fetch_range(text="Beta", columns=("id", "version"))[0]
+    second.delete_entry(beta_id, expected_version=version)
+    beta_uid, first_stamp = next((row[1], row[3:6]) for row in first.changes_since(0) if row[8] == "Beta on first")
+    second_stamp, = (row[3:6] for row in second.changes_since(0) if row[1] == beta_uid)
+    sync(first, second)
+    sync(second, first)
+    assert contents(first) == contents(second)
+    assert len(contents(first)) == 3
+    for store in (first, second):
+        assert [row[0] for row in store.fetch_range(columns=("title",))] == (
+            ["Beta on first"] if first_stamp > second_stamp else [])
+    assert rollups(first) == rollups(second)
+    for source, target in [(first, second), (second, first)]:
+        assert sync(source, target) == (0, 0, 0, 0, 0)
+
+def test_reapplying_a_batch_changes_nothing(store_pair):
+    first, second = store_pair
+    first.insert_many([entry(f"Entry {n}", str(1800 + n)) for n in range(10)])
+    edit(first, "Entry 3", "Entry 3 revised", "1803")
+    source_id = first.store_id()
+    changes = first.changes_since(0)
+    assert second.apply_changes(source_id, changes) == (10, 0, 0, 0)
+    applied = contents(second), rollups(second), second.data_version(), second.sync_checkpoint(source_id)
+
+    # A retried batch (say the checkpoint write was lost with the connection) is skipped entry by entry
+    assert second.apply_changes(source_id, changes) == (0, 0, 0, 10)
+    assert (contents(second), rollups(second), second.data_version(),
+            second.sync_checkpoint(source_id)) == applied
+    assert second.entry_count() == 10
+    # sync() finds nothing past the checkpoint; restarted from scratch, everything it ships is skipped
+    assert sync(first, second) == (0, 0, 0, 0, 0)
+    second.write(second.execute, "DELETE FROM meta WHERE key = ?", (f"sync_from_{source_id}",))
+    assert sync(first, second) == (1, 0, 0, 0, 10)
+    assert contents(second) == applied[0]
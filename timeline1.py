@@ -1,6 +1,7 @@
-import datetime
 import streamlit as st
-import psycopg2
+
+from storage import PostgresStorage, StorageError
+from timeline_app import run_app
 
 # ----------------Access secrets----------------------------------------------------------------------------
 DB_NAME = st.secrets["db"]["name"]
@@ -10,167 +11,19 @@ DB_HOST = st.secrets["db"]["host"]
 DB_PORT = st.secrets["db"]["port"]
 PASSCODE = st.secrets["app"]["passcode"]
 
-# ----------------Authenticate and connect----------------------------------------------------------------------------
-def authenticate():
-    passcode = st.sidebar.text_input("Enter Passcode", type="password")
-    return passcode == PASSCODE
-
-def get_connection():
-    try:
-        conn = psycopg2.connect(
-            dbname=DB_NAME,
-            user=DB_USER,
-            password=DB_PASSWORD,
-            host=DB_HOST,
-            port=DB_PORT
-        )
-        return conn
-    except Exception as e:
-        st.error(f"Database connection failed: {e}")
-        return None
-
-# Create table if it doesn't exist
-def create_table():
-    conn = get_connection()
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS discoveries (
-            id SERIAL PRIMARY KEY,
-            scientist_name TEXT,
-            discovery_date TEXT,
-            title TEXT,
-            description TEXT,
-            links TEXT,
-            tags TEXT
-        )
-        """)
-        conn.commit()
-        conn.close()
-
-# ---------------------------Data entry and access------------------------------------------------------------
-def insert_entry(scientist_name, discovery_date, title, description, links, tags):
-    conn = get_connection()
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-        INSERT INTO discoveries (scientist_name, discovery_date, title, description, links, tags)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """, (scientist_name, discovery_date, title, description, links, tags))
-        conn.commit()
-        conn.close()
-
-def fetch_entries():
-    conn = get_connection()
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM discoveries")
-        data = cursor.fetchall()
-        conn.close()
-        return data
-    return []
-
-def update_entry(entry_id, scientist_name, discovery_date, title, description, links, tags):
-    conn = get_connection()
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-        UPDATE discoveries
-        SET scientist_name = %s,
-            discovery_date = %s,
-            title = %s,
-            description = %s,
-            links = %s,
-            tags = %s
-        WHERE id = %s
-        """, (scientist_name, discovery_date, title, description, links, tags, entry_id))
-        conn.commit()
-        conn.close()
-
-# Function to parse the date (handling BC and AD dates)
-def parse_date(date_str):
-    try:
-        # Strip any leading or trailing spaces from the input
-        date_str = date_str.strip()
-
-        # Check if the date contains "BC"
-        if 'BC' in date_str:
-            # Handle BC dates by removing 'BC' and converting the year into a negative number
-            date_str = date_str.replace('BC', '').strip()
-            if date_str.isdigit():
-                return -int(date_str)  # Make BC years negative (e.g., 250 BC -> -250)
-            else:
-                st.error(f"Invalid BC year format: {date_str}")
-                return None
-        elif 'AD' in date_str:
-            # Handle AD dates (convert it normally)
-            date_str = date_str.replace('AD', '').strip()
-            if date_str.isdigit():
-                return int(date_str)  # For AD years (e.g., 1905 AD -> 1905)
-            else:
-                st.error(f"Invalid AD year format: {date_str}")
-                return None
-        else:
-            # Handle simple years (e.g., 1905, 300) as AD years
-            if date_str.isdigit():
-                return int(date_str)  # AD dates are positive numbers (e.g., 1905 -> 1905)
-            else:
-                st.error(f"Invalid year format: {date_str}")
-                return None
-    except Exception as e:
-        st.error(f"Error parsing date '{date_str}': {e}")
-        return None
-
-
-# ----------------MAKING TIMELINE-----------------------------------------------
-def display_timeline():
-    entries = fetch_entries()
-
-    # Parse all dates and filter out None values
-    valid_entries = []
-    for entry in entries:
-        parsed_date = parse_date(entry[2])
-        if parsed_date is not None:
-            valid_entries.append((parsed_date, entry))
-
-    # Add sorting options
-    sort_order = st.sidebar.selectbox("Sort Order", ["Ascending", "Descending"], index=0)
-    if sort_order == "Ascending":
-        valid_entries.sort(key=lambda x: x[0])
-    else:
-        valid_entries.sort(key=lambda x: x[0], reverse=True)
-
-    # Add tag filtering with checkboxes
-    all_tags = ["Biology", "Philosophy", "Mathematics", "Physics", "Optics", "Quantum", "Astro", "Classical Mechanics", "Thermodynamics","Statistical","Electronics","Material Science","Computer Science"]
-    st.sidebar.subheader("Filter by Tags")
-    selected_tags = []
-    with st.sidebar.form("tag_filter_form"):
-        for tag in all_tags:
-            if st.checkbox(tag, value=True, key=tag):
-                selected_tags.append(tag)
-        filter_button = st.form_submit_button("Apply Filter")
-
-    # Filter entries based on selected tags
-    filtered_entries = []
-    for parsed_date, entry in valid_entries:
-        tags = entry[6].split(", ")
-        if any(tag in selected_tags for tag in tags):
-            filtered_entries.append((parsed_date, entry))
-
-    # Ensure there are valid dates to compute min and max
-    if not filtered_entries:
-        st.error("No valid entries found for the selected tags.")
-        return
-
-    # Extract min and max dates from filtered entries
-    min_date = filtered_entries[0][0]
-    max_date = filtered_entries[-1][0]
-
-    # Calculate the total time span
-    total_time_span = max_date - min_date
-
-    # Add custom CSS for a modern tech look
-    st.markdown("""
+# ----------------Storage (PostgreSQL, pooled connections shared by every session)-------------------------
+@st.cache_resource
+def get_storage():
+    return PostgresStorage(
+        dbname=DB_NAME,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        host=DB_HOST,
+        port=DB_PORT
+    )
+
+# Add custom CSS for a modern tech look
+TIMELINE_CSS = """
         <style>
             /* Modern font */
             @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@400;500;700&family=Montserrat:wght@400;500;700&display=swap');
@@ -269,96 +122,10 @@ def display_timeline():
                 text-decoration: underline;
             }
         </style>
-    """, unsafe_allow_html=True)
-
-    # Display the glowing title
-    st.markdown('<h1 class="glowing-title">Timeline of Great Thoughts</h1>', unsafe_allow_html=True)
-
-    # Loop through the filtered entries and display them on the timeline
-    for parsed_date, entry in filtered_entries:
-        # Calculate the position of the event on the timeline
-        position_ratio = (parsed_date - min_date) / total_time_span
-
-        # Add spacing based on the position ratio
-        st.markdown(f'<div style="margin-top: {position_ratio * 100}px;"></div>', unsafe_allow_html=True)
-
-        # Display the event as an expander
-        with st.expander(f"{entry[3]} ({entry[2]})"):
-            event_html = """
-                <div class="event-card">
-                    <h3>{title} ({date})</h3>
-                    <p><strong>Scientist:</strong> {scientist}</p>
-                    <p>{description}</p>
-                    <a href="{links}" target="_blank">Supporting Links</a>
-                    <p><strong>Tags:</strong> {tags}</p>
-                </div>
-            """.format(
-                title=entry[3],
-                date=entry[2],
-                scientist=entry[1],
-                description=entry[4],
-                links=entry[5],
-                tags=entry[6]
-            )
-            st.markdown(event_html, unsafe_allow_html=True)
+"""
 
 # ---------------------MAIN--------------------------------------------------------
-
-# Add some space after the timeline
-st.markdown("<br>", unsafe_allow_html=True)
-
-create_table()
-
-# Show form if authenticated
-if authenticate():
-    # Add new entry form
-    with st.sidebar.form("add_entry_form",clear_on_submit=True):
-        st.subheader("Add New Entry")
-        scientist_name = st.text_input("Scientist Name")
-        discovery_date = st.text_input("Date of Discovery (e.g., 300 BC, 1905 AD, or 1905)")
-        title = st.text_input("Title of Discovery")
-        description = st.text_area("Description")
-        links = st.text_input("Supporting Links (comma-separated)")
-        tags = st.multiselect("Tags (IMPORTANT**)", ["Biology", "Philosophy", "Mathematics", "Physics", "Optics", "Quantum", "Astro", "Classical Mechanics", "Thermodynamics","Statistical","Electronics","Material Science","Computer Science"])
-        submit_button = st.form_submit_button("Add Entry")
-        reset_button = st.form_submit_button("Reset form")
-    if submit_button:
-        tags_str = ", ".join(tags)
-        insert_entry(scientist_name, discovery_date, title, description, links, tags_str)
-        st.sidebar.success("Entry added successfully!")
-    
-    
-    # Edit existing entries
-    st.sidebar.subheader("Edit Existing Entry")
-    entries = fetch_entries()
-    entry_options = {f"{entry[3]} ({entry[2]})": entry for entry in entries}
-    selected_entry_key = st.sidebar.selectbox("Select Entry to Edit", list(entry_options.keys()))
-    
-    if selected_entry_key:
-        selected_entry = entry_options[selected_entry_key]
-        with st.sidebar.form("edit_entry_form"):
-            st.subheader("Edit Entry")
-            scientist_name = st.text_input("Scientist Name", value=selected_entry[1])
-            discovery_date = st.text_input("Date of Discovery", value=selected_entry[2])
-            title = st.text_input("Title of Discovery", value=selected_entry[3])
-            description = st.text_area("Description", value=selected_entry[4])
-            links = st.text_input("Supporting Links", value=selected_entry[5])
-    
-            # Handle empty or None tags
-            tags_str = selected_entry[6] if selected_entry[6] else ""
-            tags_list = tags_str.split(", ") if tags_str else []
-    
-            tags = st.multiselect(
-                "Tags",
-                options=["Biology", "Philosophy", "Mathematics", "Physics", "Optics", "Quantum", "Astro", "Classical Mechanics", "Thermodynamics", "Statistical", "Electronics", "Material Science", "Computer Science"],
-                default=tags_list  # Use the processed tags list
-            )
-    
-            update_button = st.form_submit_button("Update Entry")  # Add submit button
-    
-        if update_button:
-            tags_str = ", ".join(tags)
-            update_entry(selected_entry[0], scientist_name, discovery_date, title, description, links, tags_str)
-            st.sidebar.success("Entry updated successfully!")
-# Display the timeline
-display_timeline()
+try:
+    run_app(get_storage(), PASSCODE, TIMELINE_CSS)
+except StorageError as e:
+    st.error(str(e))
@@ -0,0 +1,534 @@
+import io
+import re
+import sys
+import threading
+import uuid
+
+import numpy as np
+import streamlit as st
+
+import linkcheck
+import metrics
+from bulk_import import import_upload
+from dates import century_label, invalid_summary
+from dedup import duplicate_clusters, write_report
+from export import export_bytes
+from render import render_timeline
+from snapshot import EntrySnapshot
+from storage import ALL_ENTRIES, ROLLUP_GRANULARITIES, VERSIONED_COLUMNS, ConflictError, split_tags
+
+# ----------------Shared Streamlit UI for timeline.py (SQLite) and timeline1.py (PostgreSQL)-----------------
+# The entry points build a storage backend and pass it in; everything here only talks to that interface.
+
+# Entry text goes into Markdown-rendering widgets as literal text: "[x](javascript:...)" stays text, and so do
+# Streamlit's ":red[...]" directives and ":emoji:" shortcodes
+MARKDOWN_SPECIAL_RE = re.compile(r"([\\`*_{}\[\]()#+\-.!|<>~$:])")
+
+def markdown_text(text):
+    return MARKDOWN_SPECIAL_RE.sub(r"\\\1", str(text or ""))
+
+# ----------------Authenticate----------------------------------------------------------------------------
+def authenticate(passcode):
+    entered = st.sidebar.text_input("Enter Passcode", type="password")
+    return entered == passcode
+
+# ----------------Versioned data cache----------------------------------------------------------------------
+# Every write bumps the storage data version and stamps the row's change_seq in the same transaction.
+# Cached query results are keyed by the version. The timeline itself is filtered over one shared columnar
+# snapshot (snapshot.py) that only pulls rows changed since the version it holds; sessions read it in
+# place instead of unpickling their own copy, and descriptions/links are loaded only for rows shown.
+@st.cache_resource
+def snapshot_holder():
+    return {"snapshot": EntrySnapshot.empty(), "lock": threading.Lock()}
+
+def current_snapshot(storage, data_version, holder=None):
+    holder = holder or snapshot_holder()
+    snapshot = holder["snapshot"]
+    if snapshot.version is not None and data_version <= snapshot.version:
+        return snapshot
+    with metrics.span("fetch_entries"), holder["lock"]:
+        holder["snapshot"] = holder["snapshot"].refresh(storage, data_version)
+        return holder["snapshot"]
+
+# ----------------Startup (once per process, not per session)-------------------------------------------------
+# Sessions share the cached storage object, so migrate() only does work for the first one; the snapshot
+# then loads in the background while that session renders its sidebar.
+@st.cache_resource
+def prepare_storage(_storage):
+    _storage.migrate()
+    # The holder is looked up here: Streamlit caches expect to be called from a script thread
+    warmer = threading.Thread(target=current_snapshot, args=(_storage, _storage.data_version(), snapshot_holder()),
+                              name="cache-warmer", daemon=True)
+    warmer.start()
+    return warmer
+
+@metrics.tracked_cache("tags", st.cache_data(max_entries=8))
+def fetch_tags(_storage, data_version):
+    return _storage.fetch_tags()
+
+@metrics.tracked_cache("text_ids", st.cache_data(max_entries=32))
+def fetch_text_ids(_storage, data_version, text):
+    return np.array([row[0] for row in _storage.fetch_range(text=text)], dtype=np.int64)
+
+def fetch_timeline_ids(storage, data_version, sort_order="Ascending", start_year=None, end_year=None, tag_ids=None,
+                       match_all=False, text=None, after=None, limit=None):
+    snapshot = current_snapshot(storage, data_version)
+    text_ids = fetch_text_ids(storage, data_version, text) if text else None
+    with metrics.span("filter"):
+        return snapshot.filter(start_year, end_year, tag_ids, match_all, sort_order == "Descending", after, limit,
+                               text_ids)
+
+@metrics.tracked_cache("search", st.cache_data(max_entries=32))
+def search_entries(_storage, data_version, text, start_year=None, end_year=None, tag_ids=None, match_all=False):
+    return _storage.search(text, 10, start_year, end_year, tag_ids, match_all)
+
+def fetch_timeline_entries(storage, data_version, *filter_args, **window_args):
+    snapshot = current_snapshot(storage, data_version)
+    ids = fetch_timeline_ids(storage, data_version, *filter_args, **window_args)
+    with metrics.span("entry_text"):
+        return snapshot.entries(storage, ids)
+
+# The edit picker only ever loads PICKER_LIMIT (id, title, date) rows plus the one full row being edited
+PICKER_LIMIT = 50
+
+@metrics.tracked_cache("pick_options", st.cache_data(max_entries=32))
+def fetch_pick_options(_storage, data_version, text):
+    return _storage.pick_entries(text, PICKER_LIMIT)
+
+@metrics.tracked_cache("entry", st.cache_data(max_entries=8))
+def fetch_entry(_storage, data_version, entry_id):
+    rows = _storage.fetch_by_ids([entry_id], VERSIONED_COLUMNS)
+    return rows[0] if rows else None
+
+@metrics.tracked_cache("year_span", st.cache_data(max_entries=8))
+def fetch_year_span(_storage, data_version):
+    return _storage.year_span()
+
+@metrics.tracked_cache("invalid_dates", st.cache_data(max_entries=8))
+def fetch_invalid_dates(_storage, data_version):
+    return invalid_summary(_storage.invalid_dates())
+
+@metrics.tracked_cache("duplicate_report", st.cache_data(max_entries=2))
+def fetch_duplicate_report(_storage, data_version):
+    # (cluster count, CSV report) of likely duplicates across the whole table
+    clusters = duplicate_clusters(_storage)
+    report = io.StringIO()
+    write_report(_storage, clusters, report)
+    return len(clusters), report.getvalue()
+
+# ----------------Invalid dates (one summary per data version, not one error per row)------------------------
+def invalid_dates_notice(storage, data_version):
+    count, examples = fetch_invalid_dates(storage, data_version)
+    if not count:
+        return
+    with st.expander(f"⚠️ {count} entries have dates that could not be parsed and are not on the timeline"):
+        for _, message in examples:
+            st.caption(message)
+        st.caption("Accepted: 1905, 300 BC, AD 79, 500 BCE, c. 1600, 1920s, 5th century BC, 1687–1689, "
+                   "65 Ma, 10 ka, 1687-07-05, 5 July 1687")
+
+# ----------------Windowed view (keyset pagination on (year_value, id))-------------------------------------
+def century_options(storage, data_version, first_year, last_year):
+    # Only centuries holding entries, from the century rollups: one deep-time entry ("65 Ma") makes the span
+    # millions of centuries long without adding more than one option
+    if first_year is None:
+        return {}
+    counts = fetch_rollups(storage, data_version, 100, first_year, last_year)
+    return {century_label(bucket // 100): bucket for bucket, tag_id, _ in counts if tag_id == ALL_ENTRIES}
+
+def jump_to(target_year, descending):
+    # A cursor just before the target year: the next page starts at target_year (or ends there, descending)
+    st.session_state.window_cursors = [(target_year, sys.maxsize) if descending else (target_year, 0)]
+
+def jump_from_form(centuries, descending):
+    century = st.session_state.get("jump_century", "-")
+    if century != "-":
+        jump_to(centuries[century] + (99 if descending else 0), descending)
+    else:
+        jump_to(int(st.session_state.jump_year), descending)
+
+def timeline_window(storage, data_version, filter_args, first_year, last_year):
+    descending = filter_args[0] == "Descending"
+    page_size = st.sidebar.selectbox("Entries per page", [25, 50, 100, 200], index=1)
+    if st.session_state.get("window_filters") != (filter_args, page_size):
+        st.session_state.window_filters = (filter_args, page_size)
+        st.session_state.window_cursors = [None]
+
+    centuries = century_options(storage, data_version, first_year, last_year)
+    with st.sidebar.form("jump_form"):
+        st.number_input("Jump to year (negative for BC)", value=first_year or 0, step=1, key="jump_year")
+        if centuries:
+            st.selectbox("Or jump to century", ["-"] + list(centuries), key="jump_century")
+        st.form_submit_button("Jump", on_click=jump_from_form, args=(centuries, descending))
+
+    cursors = st.session_state.window_cursors
+    rows = fetch_window_entries(storage, data_version, filter_args, cursors[-1], page_size)
+    has_next = len(rows) > page_size
+    rows = rows[:page_size]
+
+    prev_col, page_col, next_col = st.sidebar.columns(3)
+    prev_col.button("◀ Prev", disabled=len(cursors) == 1, on_click=cursors.pop)
+    page_col.caption(f"Page {len(cursors)}")
+    next_col.button("Next ▶", disabled=not has_next, on_click=cursors.append, args=((rows[-1][7], rows[-1][0]) if rows else None,))
+    return cursors[-1], page_size
+
+def fetch_window_entries(storage, data_version, filter_args, after=None, page_size=None):
+    # One extra row tells the windowed view whether there is a next page
+    limit = None if page_size is None else page_size + 1
+    return fetch_timeline_entries(storage, data_version, *filter_args, after=after, limit=limit)
+
+# ----------------Overview (rollup counts per bucket and tag, independent of the number of entries)-----------
+# Millennia first; zooming into a bucket shows its centuries, then its decades, and limits the timeline
+# below to that range, so detail rows are only loaded for the zoomed range.
+OVERVIEW_LEVELS = tuple(sorted(ROLLUP_GRANULARITIES, reverse=True))
+
+@metrics.tracked_cache("rollups", st.cache_data(max_entries=32))
+def fetch_rollups(_storage, data_version, granularity, start_year=None, end_year=None):
+    return _storage.rollup_counts(granularity, start_year, end_year)
+
+def year_label(year):
+    return f"{-year} BC" if year < 0 else str(year)
+
+def bucket_label(granularity, bucket):
+    if granularity == 100:
+        return century_label(bucket // 100)
+    return f"{year_label(bucket)} – {year_label(bucket + granularity - 1)}"
+
+def overview_chart(counts, granularity, tag_names):
+    values = [{"bucket": bucket, "period": bucket_label(granularity, bucket), "tag": tag_names[tag_id], "entries": count}
+              for bucket, tag_id, count in counts if tag_id in tag_names]
+    st.vega_lite_chart({
+        "data": {"values": values},
+        "mark": "bar",
+        "height": 220,
+        "encoding": {
+            "x": {"field": "period", "type": "ordinal", "sort": {"field": "bucket", "op": "min"}, "title": None},
+            "y": {"field": "entries", "type": "quantitative", "title": "Entries per tag"},
+            "color": {"field": "tag", "type": "nominal", "title": "Tag"},
+            "tooltip": [{"field": "period"}, {"field": "tag"}, {"field": "entries"}],
+        },
+    })
+
+def overview_panel(storage, data_version):
+    # Returns the zoomed (start_year, end_year), or None at the top level
+    zoom = st.session_state.setdefault("overview_zoom", [])
+    zoom_range = (zoom[-1][1], zoom[-1][1] + zoom[-1][0] - 1) if zoom else None
+    with st.expander("Overview" + (f" › {' › '.join(bucket_label(*step) for step in zoom)}" if zoom else ""),
+                     expanded=bool(zoom)):
+        if len(zoom) < len(OVERVIEW_LEVELS):
+            granularity = OVERVIEW_LEVELS[len(zoom)]
+            counts = fetch_rollups(storage, data_version, granularity, *(zoom_range or (None, None)))
+            overview_chart(counts, granularity, dict(fetch_tags(storage, data_version)))
+            totals = {bucket: count for bucket, tag_id, count in counts if tag_id == ALL_ENTRIES}
+            if totals:
+                choice_col, zoom_col = st.columns([3, 1])
+                choice = choice_col.selectbox("Zoom into", list(totals), key=f"overview_choice_{len(zoom)}",
+                                              format_func=lambda bucket: f"{bucket_label(granularity, bucket)} "
+                                                                         f"({totals[bucket]} entries)")
+                zoom_col.button("Zoom in", on_click=zoom.append, args=((granularity, choice),))
+        if zoom:
+            st.button("Zoom out", on_click=zoom.pop)
+    return zoom_range
+
+# ----------------Link health (checked in the background by linkcheck.py, never during a rerun)--------------
+@st.cache_resource
+def background_link_checker(_storage):
+    return linkcheck.start_background(_storage)
+
+@metrics.tracked_cache("dead_links", st.cache_data(max_entries=4))
+def fetch_dead_links(_storage, link_version):
+    return frozenset(_storage.dead_links())
+
+# ----------------Rendered timeline (one HTML document, cached per data/link version, filters and window)-----
+@metrics.tracked_cache("render", st.cache_data(max_entries=16))
+def rendered_timeline(_storage, data_version, link_version, css, filter_args, after=None, page_size=None):
+    rows = fetch_window_entries(_storage, data_version, filter_args, after, page_size)[:page_size]
+    return render_timeline(rows, css, dead_links=fetch_dead_links(_storage, link_version)) if rows else None
+
+# ----------------MAKING TIMELINE---------------------------------------------------------------------------
+def display_timeline(storage, data_version, css):
+    invalid_dates_notice(storage, data_version)
+
+    search_text = st.sidebar.text_input("Search titles, descriptions and scientists").strip()
+    sort_order = st.sidebar.selectbox("Sort Order", ["Ascending", "Descending"], index=0)
+    windowed = st.sidebar.checkbox("Windowed view", value=False)
+
+    first_year, last_year = fetch_year_span(storage, data_version)
+    if first_year is not None:
+        zoom_range = overview_panel(storage, data_version)
+        if zoom_range is not None:
+            first_year, last_year = zoom_range
+    start_year, end_year = first_year, last_year
+    if first_year is not None and first_year < last_year:
+        start_year, end_year = st.sidebar.slider("Year Range", first_year, last_year, (first_year, last_year))
+
+    st.sidebar.subheader("Filter by Tags")
+    selected_tag_ids = []
+    with st.sidebar.form("tag_filter_form"):
+        for tag_id, tag in fetch_tags(storage, data_version):
+            if st.checkbox(tag, value=True, key=tag):
+                selected_tag_ids.append(tag_id)
+        match_mode = st.radio("Match", ["Any selected tag", "All selected tags"], index=0)
+        st.form_submit_button("Apply Filter")
+
+    filter_args = (sort_order, start_year, end_year, tuple(selected_tag_ids), match_mode == "All selected tags",
+                   search_text or None)
+    if search_text:
+        best_matches = search_entries(storage, data_version, search_text, *filter_args[1:5])
+        with st.sidebar.expander(f"Best matches ({len(best_matches)})", expanded=True):
+            for _, title, discovery_date, _ in best_matches:
+                st.markdown(f"- {markdown_text(title)} ({markdown_text(discovery_date)})")
+    window = timeline_window(storage, data_version, filter_args, first_year, last_year) if windowed else ()
+    document = rendered_timeline(storage, data_version, storage.link_version(), css, filter_args, *window)
+
+    if document is None:
+        st.error("No valid entries found for the selected tags.")
+        return
+
+    st.markdown(document, unsafe_allow_html=True)
+
+# ----------------Batch edit (one transaction, one data version bump for the whole selection)----------------
+# Every selected row is re-read with its version and written back with a compare-and-swap update, so an
+# edit that lands in between fails the whole batch instead of being overwritten.
+BATCH_LIMIT = 1000
+BATCH_FIELDS = {"Scientist Name": 1, "Date of Discovery": 2, "Supporting Links": 5}
+
+@metrics.tracked_cache("batch_options", st.cache_data(max_entries=8))
+def fetch_batch_options(_storage, data_version, text):
+    return _storage.pick_entries(text, BATCH_LIMIT)
+
+def batch_rows(rows, add_tags, remove_tags, field_index=None, value=None):
+    # Edited ENTRY_FIELDS rows (id first) and their expected versions; rows that would not change are skipped
+    edited, versions = [], []
+    for row in rows:
+        tags = [tag for tag in split_tags(row[6]) if tag not in remove_tags]
+        tags += [tag for tag in add_tags if tag not in tags]
+        new = list(row[:7])
+        new[6] = ", ".join(tags)
+        if field_index is not None:
+            new[field_index] = value
+        if tuple(new) != tuple(row[:7]):
+            edited.append(tuple(new))
+            versions.append(row[-1])
+    return edited, versions
+
+def batch_edit_panel(storage, data_version):
+    with st.sidebar.expander("Batch edit"):
+        text = st.text_input("Find entries (title, scientist or description)", key="batch_find").strip()
+        options = {entry_id: f"{title} ({discovery_date}) · #{entry_id}"
+                   for entry_id, title, discovery_date in fetch_batch_options(storage, data_version, text)}
+        if not options:
+            st.caption("No matching entries.")
+            return data_version
+        if st.checkbox(f"Select all {len(options)} matches" + (" (first shown)" if len(options) == BATCH_LIMIT else ""),
+                       key="batch_all"):
+            selected = list(options)
+        else:
+            selected = st.multiselect("Entries", list(options), format_func=options.get, key="batch_selected")
+
+        tag_names = [name for _, name in fetch_tags(storage, data_version)]
+        with st.form("batch_edit_form"):
+            add_tags = st.multiselect("Add tags", tag_names)
+            remove_tags = st.multiselect("Remove tags", tag_names)
+            field = st.selectbox("Set field", ["(none)"] + list(BATCH_FIELDS))
+            value = st.text_input("New value").strip()
+            apply_button = st.form_submit_button(f"Apply to {len(selected)} entries")
+
+        if not apply_button:
+            return data_version
+        if not selected:
+            st.error("Select at least one entry.")
+        elif field != "(none)" and not value:
+            st.error(f"{field} cannot be empty.")
+        else:
+            rows = storage.fetch_by_ids(selected, VERSIONED_COLUMNS)
+            edited, versions = batch_rows(rows, add_tags, set(remove_tags), BATCH_FIELDS.get(field), value)
+            try:
+                storage.update_many(edited, versions)
+            except ConflictError as e:
+                st.error(f"Nothing was changed. {e}. Apply again to use their latest values.")
+                return data_version
+            st.success(f"Updated {len(edited)} of {len(selected)} entries." if edited else "Nothing to change.")
+            return storage.data_version()
+        return data_version
+
+# ----------------Exports (built lazily, cached per data version)------------------------------------------
+@metrics.tracked_cache("export", st.cache_data(max_entries=2, show_spinner="Preparing export..."))
+def cached_export(_storage, data_version, fmt):
+    return export_bytes(_storage, fmt)
+
+def export_panel(storage, data_version):
+    with st.sidebar.expander("Export discoveries"):
+        fmt = st.radio("Format", ["csv", "jsonl"], horizontal=True, key="export_format")
+        if st.button("Prepare export") or st.session_state.get("export_requested") == fmt:
+            st.session_state.export_requested = fmt
+            st.download_button(
+                label=f"Download {fmt.upper()} (gzip)",
+                data=cached_export(storage, data_version, fmt),
+                file_name=f"discoveries.{fmt}.gz",
+                mime="application/gzip",
+                on_click=st.session_state.pop,
+                args=("export_requested", None)
+            )
+
+# ----------------Storage contention (backends that track it, e.g. SQLite's reader pool and writer queue)----
+def storage_stats_panel(storage):
+    stats = storage.stats()
+    if stats:
+        with st.sidebar.expander("Storage contention"):
+            st.json(stats)
+
+# ----------------Performance debug panel (only when metrics are enabled, opt-in per session)----------------
+def debug_panel(session):
+    if not metrics.enabled or not st.sidebar.checkbox("Performance debug panel"):
+        return
+    elapsed, breakdown, recent = metrics.session_summary(session)
+    with st.sidebar.expander("Performance", expanded=True):
+        if elapsed is None:
+            st.caption("No completed rerun yet.")
+            return
+        st.caption(f"Last rerun {elapsed * 1000:.1f} ms · p50 {metrics.quantile(recent, 0.5) * 1000:.1f} ms · "
+                   f"p95 {metrics.quantile(recent, 0.95) * 1000:.1f} ms over {len(recent)} reruns")
+        st.table([{"span": name, "calls": calls, "ms": round(seconds * 1000, 2)}
+                  for name, (calls, seconds) in sorted(breakdown.items(), key=lambda item: -item[1][1])])
+        st.json(metrics.counter_values())
+
+# ---------------------MAIN--------------------------------------------------------------------------------
+def run_app(storage, passcode, css):
+    metrics.start_rerun()
+    session = st.session_state.setdefault("metrics_session", uuid.uuid4().hex[:8])
+    prepare_storage(storage)
+    if linkcheck.background_enabled:
+        background_link_checker(storage)
+
+    data_version = storage.data_version()
+
+    st.markdown("<br>", unsafe_allow_html=True)
+
+    if authenticate(passcode):
+        with st.sidebar.form("add_entry_form", clear_on_submit=True):
+            st.subheader("Add New Entry")
+            scientist_name = st.text_input("Scientist Name")
+            discovery_date = st.text_input("Date of Discovery (e.g., 300 BC, 1905 AD, or 1905)")
+            title = st.text_input("Title of Discovery")
+            description = st.text_area("Description")
+            links = st.text_input("Supporting Links")
+            tags = st.multiselect("Tags (IMPORTANT**)", [name for _, name in fetch_tags(storage, data_version)])
+
+            submit_button = st.form_submit_button("Add Entry")
+
+        # ✅ Handle submission RIGHT AFTER the form
+        if submit_button:
+            if not scientist_name.strip():
+                st.sidebar.error("Scientist name is required.")
+            elif not discovery_date.strip():
+                st.sidebar.error("Discovery date is required.")
+            elif not title.strip():
+                st.sidebar.error("Title is required.")
+            elif not description.strip():
+                st.sidebar.error("Description is required.")
+            elif not links.strip():
+                st.sidebar.error("At least one supporting link is required.")
+            elif not tags:
+                st.sidebar.error("You must select at least one tag.")
+            else:
+                tags_str = ", ".join(tags)
+                row = (scientist_name.strip(), discovery_date.strip(), title.strip(), description.strip(),
+                       links.strip(), tags_str)
+                # The form clears on submit, so a likely duplicate is held here until confirmed or dropped
+                matches = storage.find_duplicates([row]).get(0)
+                if matches:
+                    st.session_state.pending_entry = (row, matches)
+                else:
+                    storage.insert_entry(*row)
+                    st.sidebar.success("Entry added successfully!")
+                    st.rerun()
+
+        if st.session_state.get("pending_entry"):
+            row, matches = st.session_state.pending_entry
+            scores = dict(matches)
+            similar = "\n".join(f"- {markdown_text(title)} ({markdown_text(discovery_date)}, {markdown_text(name)}) "
+                                 f"· #{entry_id}, {scores[entry_id]:.0%} similar"
+                                 for entry_id, name, discovery_date, title in storage.fetch_by_ids(
+                                     list(scores), ("id", "scientist_name", "discovery_date", "title")))
+            st.sidebar.warning(f"'{markdown_text(row[2])}' looks like an existing entry:\n{similar}")
+            add_column, discard_column = st.sidebar.columns(2)
+            if add_column.button("Add anyway"):
+                storage.insert_entry(*row)
+                del st.session_state.pending_entry
+                st.rerun()
+            if discard_column.button("Discard"):
+                del st.session_state.pending_entry
+                st.rerun()
+
+        with st.sidebar.expander("Bulk import (CSV/JSONL)"):
+            uploaded_file = st.file_uploader("Discoveries file", type=["csv", "jsonl", "ndjson"])
+            if uploaded_file is not None and st.button("Import file"):
+                stats, rejects = import_upload(storage, uploaded_file)
+                data_version = storage.data_version()
+                st.success(f"Imported {stats['accepted']} entries, rejected {stats['rejected']} "
+                           f"({stats['duplicates']} likely duplicates).")
+                if stats["rejected"]:
+                    st.download_button("Download reject report", rejects, file_name="rejects.csv", mime="text/csv")
+
+        with st.sidebar.expander("Likely duplicates"):
+            if st.button("Find duplicates"):
+                clusters, report = fetch_duplicate_report(storage, data_version)
+                st.write(f"{clusters} groups of likely duplicates.")
+                if clusters:
+                    st.download_button("Download duplicate report", report, file_name="duplicates.csv",
+                                       mime="text/csv")
+
+        st.sidebar.subheader("Edit Existing Entry")
+        pick_text = st.sidebar.text_input("Find entry to edit (title, scientist or description)").strip()
+        entry_options = {entry_id: f"{title} ({discovery_date}) · #{entry_id}"
+                         for entry_id, title, discovery_date in fetch_pick_options(storage, data_version, pick_text)}
+
+        if entry_options:
+            selected_entry_id = st.sidebar.selectbox("Select Entry to Edit", list(entry_options),
+                                                     format_func=entry_options.get)
+            selected_entry = fetch_entry(storage, data_version, selected_entry_id)
+            # Compare-and-swap against the version the form showed on the previous rerun, not whatever is current
+            # when it comes back, so an edit saved by someone else in between is reported, not overwritten
+            base = st.session_state.get("edit_base")
+            expected_version = base[1] if base and base[0] == selected_entry_id else selected_entry[-1]
+
+            with st.sidebar.form("edit_entry_form"):
+                scientist_name = st.text_input("Scientist Name", value=selected_entry[1])
+                discovery_date = st.text_input("Date of Discovery", value=selected_entry[2])
+                title = st.text_input("Title of Discovery", value=selected_entry[3])
+                description = st.text_area("Description", value=selected_entry[4])
+                links = st.text_input("Supporting Links", value=selected_entry[5])
+
+                tags_list = split_tags(selected_entry[6])
+                tags = st.multiselect("Tags", [name for _, name in fetch_tags(storage, data_version)], default=tags_list)
+
+                update_button = st.form_submit_button("Update Entry")
+
+            if update_button:
+                tags_str = ", ".join(tags)
+                try:
+                    storage.update_entry(selected_entry[0], scientist_name, discovery_date, title, description, links,
+                                         tags_str, expected_version)
+                except ConflictError:
+                    st.sidebar.error("This entry was changed by someone else while you were editing it; your changes "
+                                     "were not saved. Reload it to see their version.")
+                else:
+                    # Rebuilt from the saved row: fields left showing the old values would drop the next edit
+                    st.session_state.edit_base = (selected_entry_id, expected_version + 1)
+                    st.session_state.edit_saved = True
+                    st.rerun()
+            if st.session_state.pop("edit_saved", False):
+                st.sidebar.success("Entry updated successfully!")
+            # The form's fields are keyed by their values, so an entry someone else changed is shown at its new
+            # version on this rerun: the next save is checked against that version, not the one first loaded
+            st.session_state.edit_base = (selected_entry_id, selected_entry[-1])
+
+        data_version = batch_edit_panel(storage, data_version)
+        storage_stats_panel(storage)
+
+    display_timeline(storage, data_version, css)
+    export_panel(storage, data_version)
+    debug_panel(session)
+    metrics.finish_rerun(session)
+    return data_version